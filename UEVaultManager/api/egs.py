@@ -21,6 +21,7 @@ from requests.utils import dict_from_cookiejar
 from selenium.webdriver.remote.command import Command
 
 from UEVaultManager.models.exceptions import InvalidCredentialsError
+from UEVaultManager.models.UCBrowserPool import UCBrowserPool
 from UEVaultManager.models.UCRequest import UCRequest
 from UEVaultManager.models.UCResponse import UCResponse
 from UEVaultManager.tkgui.modules.types import GrabResult, UCRequestType
@@ -192,7 +193,10 @@ class EPCAPI:
 
         self.timeout = timeout
         self._uc_browser = None
+        self._uc_pool: UCBrowserPool = None  # pool of tabs of a single browser, shared by all the requests using Nodriver
         self._uc_request = UCRequest()
+        self.uc_max_tabs = 4  # maximum number of tabs opened at the same time when using Nodriver
+        self.uc_max_uses_per_tab = 20  # number of pages loaded in a tab before it's recycled
         self.debug_mode = False  # TODO: make it a setting or use the gui_g.settings.debug_mode (not imported here)
         # set to true to use "NoDriver" object instead of a usual session object to bypass captcha on marketplace pages
         self.bypass_captcha = False
@@ -593,8 +597,8 @@ class EPCAPI:
 
         NOTES:
             When using Nodriver,
-            The parameters for the browser and the request are stored in self._uc_request.params
-            The response will be stored in self._uc_request.response.
+            The parameters for the browser are stored in self._uc_request.params
+            Each request has its own response object. The last one is also stored in self._uc_request.response.
         """
         if not timeout:
             timeout = self.timeout
@@ -630,11 +634,10 @@ class EPCAPI:
             del self.session.cookies['EPIC_CLIENT_SESSION']  # this data cause a http 400 error because its value is too big
             # noinspection GrazieInspection
             # has_captcha = response.content.find(b"Please complete a security check to continue") != -1
-            if not self._uc_browser:
+            if not self._uc_pool:
                 self.init_uc_browser()
-            uc.loop().run_until_complete(self.uc_get_content(url))
-            # note that self._uc_request is updated by the uc_get_content method
-            return self._uc_request.response
+            self.uc_get_content(url, uc_response)
+            return uc_response
         elif method_for_get_session == 2:
             # test reqdriver
             # install by: pip install reqdriver
@@ -661,11 +664,11 @@ class EPCAPI:
 
     def init_uc_browser(self) -> None:
         """
-        Initialize the undetected Chrome Browser.
+        Initialize the pool of tabs used with the undetected Chrome Browser.
 
         NOTES:
-            The parameters for the browser and the request are stored in self._uc_request.params
-            The response will be stored in self._uc_request.response.
+            The parameters for the browser are stored in self._uc_request.params
+            The browser is only started when the first page is requested.
         """
         window_width = 1024 if self.debug_mode else 100
         window_height = 768 if self.debug_mode else 100
@@ -699,42 +702,47 @@ class EPCAPI:
             # '--silent-launch',
         ]
         self._uc_request.params = params
-
-        response = self._uc_request.response
-        response.request = self.session.request
-        # get the connection object from the current session
-        # we use self._url_marketplace as default url for the connection
-        adapter = cast(HTTPAdapter, self.session.get_adapter(self._url_marketplace))
-        connection = adapter.get_connection(self._url_marketplace)
-        response.connection = connection
-        self._uc_request.response = response
+        self._uc_pool = UCBrowserPool(
+            start_browser=lambda: uc.start(**params), max_tabs=self.uc_max_tabs, max_uses_per_tab=self.uc_max_uses_per_tab
+        )
         uc_logger = logging.getLogger('nodriver.core.browser')
         uc_logger.setLevel(logging.WARNING)  # disable info level because too verbose
 
-    async def uc_get_content(self, url) -> None:
+    def uc_get_content(self, url: str, response: UCResponse) -> None:
         """
         Get the content of a page using the undetected Chrome driver.
         :param url: url to get the content from.
+        :param response: response object to fill.
 
         NOTES:
-            The response will be stored in self._uc_request.response.
-        """
-        self._uc_browser = await uc.start(**self._uc_request.params)
-        page = await self._uc_browser.get(url)
-        await page.activate()
-        # add a delai to let the page load
-        # await page.wait(1)
-        raw_content = await page.get_content()
-        await page.close()
-        response = self._uc_request.response
-        response.headers = self.session.headers
+            The page is loaded in a tab of the browser pool, so this method can be called from several threads.
+        """
+        try:
+            raw_content = self._uc_pool.fetch(url)
+        except (Exception, ) as error:
+            self.logger.warning(f'Error when getting the content of {url} using Nodriver: {error!r}')
+            raw_content = ''
+        self.fill_uc_response(response, raw_content, url, headers=self.session.headers)
+        self._uc_request.request_type = UCRequestType.USING_UD
+        self._uc_request.response = response
+
+    @staticmethod
+    def fill_uc_response(response: UCResponse, raw_content: str, url: str, headers=None) -> UCResponse:
+        """
+        Fill a response object with the raw content of a page loaded by the undetected Chrome driver.
+        :param response: response object to fill.
+        :param raw_content: raw content (html) of the page.
+        :param url: url of the page.
+        :param headers: headers to set in the response.
+        :return: the response object.
+        """
+        if headers is not None:
+            response.headers = headers
         response.raw = raw_content
         response.url = url
         response.status_code = 200 if raw_content else 403
-        self._uc_request.request_type = UCRequestType.USING_UD
-        self._uc_request.response = response
         if response.status_code == 403:
-            return
+            return response
 
         soup = BeautifulSoup(raw_content, 'html.parser')
         if soup:
@@ -742,7 +750,7 @@ class EPCAPI:
             captcha_tag = soup.find('div', class_='cf_challenge_container')
             if captcha_tag:
                 response.status_code = 403
-                return
+                return response
 
             # get the charset value from the header of raw_content
             charset_tag = soup.find('meta', charset=True)
@@ -755,7 +763,15 @@ class EPCAPI:
             # convert content to bytes because it's needed for the json decoding in response.json()
             response.content = response.content.encode(response.encoding)
             response.status_code = 200
-        self._uc_request.response = response
+        return response
+
+    def close_uc_browser(self) -> None:
+        """
+        Close the browser used with the undetected Chrome driver and all its tabs.
+        """
+        if self._uc_pool:
+            self._uc_pool.close()
+            self._uc_pool = None
 
     def get_last_request_type(self) -> UCRequestType:
         """
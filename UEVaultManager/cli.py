@@ -26,7 +26,7 @@ import UEVaultManager.tkgui.modules.globals as gui_g  # using the shortest varia
 from UEVaultManager import __codename__ as UEVM_codename, __version__ as UEVM_version
 from UEVaultManager.api.uevm import UpdateSeverity
 from UEVaultManager.core import AppCore
-from UEVaultManager.lfs.utils import copy_folder, path_join
+from UEVaultManager.lfs.utils import copy_folder, path_join, path_join_resolved
 from UEVaultManager.models.exceptions import InvalidCredentialsError
 from UEVaultManager.models.UEAssetScraperClass import UEAssetScraper
 from UEVaultManager.tkgui.main import init_gui
@@ -920,8 +920,9 @@ class UEVaultManagerCLI:
             # not connected => offline mode
             args.offline = True
 
+        incremental_sync = getattr(args, 'incremental_sync', False)
         # not refresh forced or offline mode => load_from_files is true
-        load_from_files = not args.force_refresh or args.offline
+        load_from_files = (not args.force_refresh and not incremental_sync) or args.offline
 
         if load_from_files:
             self.core.uevmlfs.invalidate_library_catalog_ids()
@@ -951,10 +952,12 @@ class UEVaultManagerCLI:
             progress_window=pw,
             core=self.core,  # VERY IMPORTANT: pass the code object to the scraper to keep the same session
             filter_category=args.filter_category,
+            incremental_sync=incremental_sync,
+            collect_data=not use_database,  # the list_assets command needs the data to display them
         )
         scraped_data = []
         result_count = 0
-        if not load_from_files:
+        if not load_from_files and not incremental_sync:
             result_count = scraper.gather_all_assets_urls(empty_list_before=True)  # return -1 if interrupted or error
         if result_count != -1:
             if scraper.save(owned_assets_only=False, save_to_format=save_to_format):
@@ -1133,7 +1136,7 @@ class UEVaultManagerCLI:
             args.clean_dowloaded_data = False
             # in the vaultCache, the data is in a subfolder named like the release of the Asset
             sub_folder = gui_g.s.ue_plugin_vaultcache_subfolder
-            download_path = path_join(self.core.egl.vault_cache_folder, release_name, sub_folder)
+            download_path = path_join_resolved(self.core.egl.vault_cache_folder, release_name, sub_folder)
             self._log_and_gui_display('Use the vault cache folder to store the downloaded asset.\nOther download options will be ignored.\n')
         else:
             # the downloaded data should always have a "Content" inside
@@ -1143,7 +1146,7 @@ class UEVaultManagerCLI:
             # to avoid copying the sub_folder folder inside the sub_folder
             if os.path.basename(download_path).lower() == sub_folder.lower():  # MUST BE LOWERCASE for comparison
                 download_path = os.path.dirname(download_path)
-            download_path = path_join(download_path, sub_folder)
+            download_path = path_join_resolved(download_path, sub_folder)
 
         # normpath is usefull for future comparisons
         download_path = os.path.normpath(download_path)
@@ -1183,6 +1186,12 @@ class UEVaultManagerCLI:
         self._log_and_gui_display(
             f'Reusable size: {analysis.reuse_size / 1024 / 1024:.02f} MiB (chunks) / {analysis.unchanged / 1024 / 1024:.02f} MiB (unchanged / skipped)'
         )
+        if analysis.num_chunks_stored:
+            self._log_and_gui_display(f'Chunks copied from the chunk store: {analysis.num_chunks_stored}')
+        if analysis.disk_cache_size:
+            self._log_and_gui_display(
+                f'Disk cache size: {analysis.disk_cache_size / 1024 / 1024:.02f} MiB ({analysis.num_chunks_spilled} chunks cached on disk)'
+            )
         self._log_and_gui_display(
             message='Downloads are resumable, you can interrupt the download with CTRL-C and resume it using the same command later on.'
         )
@@ -1228,9 +1237,23 @@ class UEVaultManagerCLI:
             )
         else:
             end_t = time.time()
+            if dlm.exitcode:
+                self._log_and_gui_display(
+                    f'Installation failed after {end_t - start_t:.02f} seconds: the download process ended with the exit code {dlm.exitcode}.\n'
+                    'Some chunks could not be downloaded. Run the command again to resume the download.', 'error'
+                )
+                return False
             download_path = dlm.download_dir  # it could have been changed by the dlm
             message = f'Finished download process in {end_t - start_t:.02f} seconds.\nFiles has been downloaded in {dlm.download_dir}'
             self._log_and_gui_display(message)
+            if args.verify_files:
+                self._log_and_gui_display('Verifying downloaded files...')
+                result = dlm.verify_files(max_processes=max_workers)
+                if not result.is_ok:
+                    self._log_and_gui_display(self._get_verification_message(result), level='warning')
+                    self._log_and_gui_display('Installation is aborted. Use the "verify --repair" command to download the bad files again.', 'error')
+                    return False
+                self._log_and_gui_display(f'All the {result.checked} downloaded files are valid.')
             start_t = time.time()
             message = ''
             if not args.no_install:
@@ -1294,6 +1317,75 @@ class UEVaultManagerCLI:
         #     dw.close_window()
         return True
 
+    @staticmethod
+    def _get_verification_message(result) -> str:
+        """
+        Get a message describing the bad files found by a verification.
+        :param result: VerificationResult object.
+        :return: message.
+        """
+        message_list = [f'{len(result.bad_files)} of the {result.checked} files are not valid:']
+        message_list.extend(f' - Missing: {filename}' for filename in sorted(result.missing))
+        message_list.extend(f' - Invalid hash or size: {filename}' for filename in sorted(result.mismatched))
+        message_list.extend(f' - Unreadable: {filename}' for filename in sorted(result.failed))
+        return '\n'.join(message_list)
+
+    def verify(self, args) -> bool:
+        """
+        Verifies the files of an installed asset against its manifest, and repairs them if asked.
+        :param args: options passed to the command.
+        :return: True if all the files are valid (or have been repaired), False otherwise.
+        """
+        uewm_gui_exists = False
+        if UEVaultManagerCLI.is_gui:
+            uewm_gui_exists, _ = init_display_window(self.logger)
+        start_t = time.time()
+        try:
+            result, folder = self.core.verify_asset(args.app_name, folder=args.folder, max_processes=args.max_processes)
+        except ValueError as error:
+            self._log_and_gui_message(f'Verification failed: {error}', level='error', quit_on_error=not uewm_gui_exists)
+            return False
+        self._log_and_gui_display(f'Verification done in {time.time() - start_t:.02f} seconds.')
+        if result.is_ok:
+            self._log_and_gui_display(f'All the {result.checked} files are valid.')
+            return True
+        self._log_and_gui_display(self._get_verification_message(result), level='warning')
+        if not args.repair:
+            self._log_and_gui_display('Use the "--repair" option to download the bad files again.')
+            return False
+
+        if not self.core.login(raise_error=True):
+            self._log_and_gui_message(
+                level='error',
+                message='You are not connected or log in failed.\nYou MUST log first or check your credential to continue.\n',
+                quit_on_error=not uewm_gui_exists
+            )
+            return False
+        try:
+            dlm, analysis = self.core.prepare_repair(args.app_name, files_to_repair=result.bad_files, folder=folder)
+        except ValueError as error:
+            self._log_and_gui_display(f'Repair failed: {error!r}')
+            return False
+        self._log_and_gui_display(f'Download size: {analysis.dl_size / 1024 / 1024:.02f} MiB')
+        start_t = time.time()
+        try:
+            dlm.logging_queue = self.logging_queue
+            dlm.start()
+            dlm.join()
+        except Exception as error:
+            self._log_and_gui_display(f'Repair failed after {time.time() - start_t:.02f} seconds: {error!r}', 'warning')
+            return False
+        if dlm.exitcode:
+            self._log_and_gui_display(f'Repair failed after {time.time() - start_t:.02f} seconds: some chunks could not be downloaded.', 'error')
+            return False
+        # check only the repaired files
+        result = dlm.verify_files(max_processes=args.max_processes)
+        if not result.is_ok:
+            self._log_and_gui_display(self._get_verification_message(result), level='warning')
+            return False
+        self._log_and_gui_display(f'{result.checked} files have been repaired in {time.time() - start_t:.02f} seconds.')
+        return True
+
     @staticmethod
     def print_version():
         """
@@ -1411,12 +1503,14 @@ def main():
     edit_parser = subparsers.add_parser('edit', aliases=('edit-assets', ), help='Edit the assets list file')
     scrap_parser = subparsers.add_parser('scrap', aliases=('scrap-assets', ), help='Scrap all the available assets on the marketplace')
     install_parser = subparsers.add_parser('install', aliases=('download', ), help='Download or Install an asset')
+    verify_parser = subparsers.add_parser('verify', help='Verify the files of an installed asset and repair them if needed')
     # hidden commands have no help text
     get_token_parser = subparsers.add_parser('get-token')
 
     # Positional arguments
     install_parser.add_argument('app_name', nargs='?', metavar='<App Name>', help='Uid of the Asset to install')
     list_files_parser.add_argument('app_name', nargs='?', metavar='<App Name>', help='Uid of the Asset to list files from')
+    verify_parser.add_argument('app_name', metavar='<App Name>', help='Uid of the installed release to verify')
     info_parser.add_argument('app_name_or_manifest', help='Uid of the Asset to get info from or manifest path', metavar='<App Name/Manifest URI>')
 
     # Flags for parsers
@@ -1572,6 +1666,13 @@ def main():
         action='store',
         help='Filter assets by category. Search against the asset category in the marketplace. Search is case-insensitive and can be partial'
     )
+    scrap_parser.add_argument(
+        '-is',
+        '--incremental-sync',
+        dest='incremental_sync',
+        action='store_true',
+        help='Only scrap the assets added or updated on the marketplace since the last sync. Much faster than a full refresh'
+    )
     scrap_parser.add_argument('-g', '--gui', dest='gui', action='store_true', help='Display the output in a windows instead of using the console')
 
     ######
@@ -1678,6 +1779,31 @@ def main():
     install_parser.add_argument(
         '--no-https', dest='disable_https', action='store_true', help='Download games via plaintext HTTP (like EGS), e.g. for use with a lan cache'
     )
+    install_parser.add_argument(
+        '--verify', dest='verify_files', action='store_true', help='Verify the hashes of the downloaded files before installing them'
+    )
+
+    ######
+    verify_parser.add_argument(
+        '--folder',
+        dest='folder',
+        action='store',
+        metavar='<path>',
+        default='',
+        help='Folder that contains the files to verify (e.g. the vault cache folder). Default: the installation folder of the asset'
+    )
+    verify_parser.add_argument('--repair', dest='repair', action='store_true', help='Download again the missing or invalid files')
+    verify_parser.add_argument(
+        '--max-processes',
+        dest='max_processes',
+        action='store',
+        metavar='<num>',
+        type=int,
+        default=0,
+        help='Maximum number of processes used to hash the files, default: min(CPUs, 8)'
+    )
+    # noinspection DuplicatedCode
+    verify_parser.add_argument('-g', '--gui', dest='gui', action='store_true', help='Display the output in a windows instead of using the console')
 
     ######
     get_token_parser.add_argument('--json', dest='json', action='store_true', help='Output information in JSON format')
@@ -1767,6 +1893,8 @@ def main():
             args.gui = True
             UEVaultManagerCLI.is_gui = True
             cli.scrap_assets(args)
+        elif args.subparser_name == 'verify':
+            cli.verify(args)
         elif args.subparser_name in {'download', 'install'}:
             cli.install_asset(args)
         elif args.subparser_name == 'get-token':
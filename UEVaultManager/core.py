@@ -27,9 +27,9 @@ from UEVaultManager.api.uevm import UEVMAPI
 from UEVaultManager.downloader.mp.DLManagerClass import DLManager
 from UEVaultManager.lfs.EPCLFSClass import EPCLFS
 from UEVaultManager.lfs.UEVMLFSClass import UEVMLFS
-from UEVaultManager.lfs.utils import clean_filename, path_join
+from UEVaultManager.lfs.utils import clean_filename, path_join, path_join_resolved
 from UEVaultManager.models.Asset import Asset, InstalledAsset
-from UEVaultManager.models.downloading import AnalysisResult, ConditionCheckResult
+from UEVaultManager.models.downloading import AnalysisResult, ConditionCheckResult, VerificationResult
 from UEVaultManager.models.exceptions import InvalidCredentialsError
 from UEVaultManager.models.json_manifest import JSONManifest
 from UEVaultManager.models.manifest import Manifest
@@ -132,17 +132,42 @@ class AppCore:
         self.display_windows = None
         self.session_ttl: int = 100  # time to live for the current user login session in seconds
 
-    @staticmethod
-    def load_manifest(data: bytes) -> Manifest:
+    def load_manifest(self, data: bytes) -> Manifest:
         """
         Load a manifest.
         :param data: bytes object to load the manifest from.
         :return: Manifest object.
+
+        Notes:
+            If the compact_manifests option is set, the lists of a binary manifest are stored in arrays (less memory, slower access to the elements).
         """
         if data[0:1] == b'{':
             return JSONManifest.read_all(data)
         else:
-            return Manifest.read_all(data)
+            return Manifest.read_all(data, compact=self.uevmlfs.config.getboolean('UEVaultManager', 'compact_manifests', fallback=False))
+
+    def get_chunk_store_folder(self) -> str:
+        """
+        Get the folder of the store of the chunks shared by all the downloads.
+        :return: folder of the chunk store.
+        """
+        return self.uevmlfs.config.get('UEVaultManager', 'chunk_store_folder', fallback='') or path_join(self.uevmlfs.path, 'chunk_store')
+
+    def get_selected_base_urls(self, base_urls: list, preferred_cdn: str = None) -> list:
+        """
+        Get the base urls (i.e. CDNs) to download the chunks from.
+        :param base_urls: base urls available for the asset.
+        :param preferred_cdn: preferred CDN. If None, the preferred_cdn config option is used.
+        :return: list with the preferred CDN only if it's available, all the base urls otherwise.
+        """
+        if not base_urls:
+            raise ValueError('No base URLs found, please try again.')
+        if preferred_cdn or (preferred_cdn := self.uevmlfs.config.get('UEVaultManager', 'preferred_cdn', fallback=None)):
+            for url in base_urls:
+                if preferred_cdn in url:
+                    return [url]
+            self.logger.warning(f'Preferred CDN "{preferred_cdn}" unavailable, using default selection.')
+        return list(base_urls)
 
     @staticmethod
     def check_installation_conditions(analysis: AnalysisResult, folders: [], ignore_space_req: bool = False) -> ConditionCheckResult:
@@ -442,6 +467,48 @@ class AppCore:
         old_bytes = self.uevmlfs.load_manifest(app_name, installed_asset.version, installed_asset.platform)
         return old_bytes, installed_asset.base_urls
 
+    def get_nearest_installed_release(self, catalog_item_id: str, manifest: Manifest, excluded_folder: str = '') -> (str, Optional[Manifest], str):
+        """
+        Get the installed release of an asset that has the most files in common with a manifest.
+        :param catalog_item_id: catalog item id of the asset.
+        :param manifest: manifest of the release to install.
+        :param excluded_folder: folder to ignore (i.e. the download folder of the release to install).
+        :return: (release name, manifest of the release, folder of its files). The release name is empty if no release has been found.
+
+        Notes:
+            The files of a release are looked for in the vault cache first, then in its installation folder.
+            As the files of an installation folder can be modified, they are checked against the hashes of the manifest before being used (see DLManager.run_analysis()).
+        """
+        nearest = ('', None, '')
+        if not catalog_item_id:
+            return nearest
+        file_hashes = manifest.file_manifest_list.get_file_hashes()
+        file_sizes = manifest.file_manifest_list.get_file_sizes()
+        excluded_folder = os.path.normcase(os.path.normpath(excluded_folder)) if excluded_folder else ''
+        best_size = 0
+        if not self.uevmlfs.get_installed_assets():
+            self.uevmlfs.load_installed_assets()
+        for app_name, asset_data in self.uevmlfs.get_installed_assets().items():
+            if asset_data.get('catalog_item_id', '') != catalog_item_id:
+                continue
+            installed_asset = InstalledAsset.from_json(asset_data)
+            folders = [path_join_resolved(self.egl.vault_cache_folder, app_name, gui_g.s.ue_plugin_vaultcache_subfolder)] if self.egl.vault_cache_folder else []
+            folders.append(self.get_installed_verification_folder(installed_asset))
+            folder = next((folder for folder in folders if folder and os.path.isdir(folder)), '')
+            if not folder or os.path.normcase(os.path.normpath(folder)) == excluded_folder:
+                continue
+            manifest_data = self.uevmlfs.load_manifest(app_name, installed_asset.version, installed_asset.platform)
+            if not manifest_data:
+                continue
+            old_manifest = self.load_manifest(manifest_data)
+            old_file_hashes = old_manifest.file_manifest_list.get_file_hashes()
+            # size of the files that would be copied instead of being downloaded
+            common_size = sum(size for filename, size in file_sizes.items() if old_file_hashes.get(filename) == file_hashes[filename])
+            if common_size > best_size:
+                best_size = common_size
+                nearest = (app_name, old_manifest, folder)
+        return nearest
+
     def asset_obj_from_json(self, app_name: str) -> Optional[Asset]:
         """
         return an "item" like for compatibilty with "old" methods .
@@ -587,6 +654,8 @@ class AppCore:
         :return: (DLManager object, AnalysisResult object, InstalledAsset object).
         """
         old_manifest = None
+        # folder of the files of the old manifest, if it's another release of the asset
+        old_dir = ''
         egl_guid = ''
 
         # load old manifest if we have one
@@ -636,6 +705,14 @@ class AppCore:
         if not os.access(download_folder, os.W_OK):
             raise PermissionError(f'No write access to "{download_folder}"')
 
+        # the same release is not installed, use the files of another installed release of the asset instead of downloading them again
+        if old_manifest is None and not disable_patching and not override_old_manifest:
+            old_release_name, old_manifest, old_dir = self.get_nearest_installed_release(
+                base_asset.catalog_item_id, manifest, excluded_folder=download_folder
+            )
+            if old_release_name:
+                log_info_and_gui_display(f'The files of the installed release "{old_release_name}" will be reused from "{old_dir}".')
+
         # reuse existing installation's directory
         installed_asset = self.uevmlfs.get_installed_asset(release_name)
         if reuse_last_install and installed_asset:
@@ -661,31 +738,20 @@ class AppCore:
         else:
             resume_file = None
 
-        # Use user-specified base URL or preferred CDN first, otherwise fall back to
-        # EGS's behaviour of just selecting the first CDN in the list.
-        base_url = None
+        # Use user-specified base URL or preferred CDN only, otherwise use all the CDNs in the list.
+        # The downloads are distributed between them according to their speed (see CDNBalancer).
         if override_base_url:
             log_info_and_gui_display(f'Overriding base URL with "{override_base_url}"')
-            base_url = override_base_url
-        elif preferred_cdn or (preferred_cdn := self.uevmlfs.config.get('UEVaultManager', 'preferred_cdn', fallback=None)):
-            for url in base_urls:
-                if preferred_cdn in url:
-                    base_url = url
-                    break
-            else:
-                self.logger.warning(f'Preferred CDN "{preferred_cdn}" unavailable, using default selection.')
-        # Use first, fail if none known
-        if not base_url:
-            if not base_urls:
-                raise ValueError('No base URLs found, please try again.')
-            base_url = base_urls[0]
-
+            selected_base_urls = [override_base_url]
+        else:
+            selected_base_urls = self.get_selected_base_urls(base_urls, preferred_cdn)
         if disable_https:
-            base_url = base_url.replace('https://', 'http://')
+            selected_base_urls = [url.replace('https://', 'http://') for url in selected_base_urls]
 
-        self.logger.debug(f'Using base URL: {base_url}')
-        scheme, cdn_host = base_url.split('/')[0:3:2]
-        log_info_and_gui_display(f'Selected CDN: {cdn_host} ({scheme.strip(":")})')
+        self.logger.debug(f'Using base URLs: {selected_base_urls}')
+        scheme = selected_base_urls[0].split('/')[0]
+        cdn_hosts = ', '.join(url.split('/')[2] for url in selected_base_urls)
+        log_info_and_gui_display(f'Selected CDN: {cdn_hosts} ({scheme.strip(":")})')
 
         if not max_shm:
             max_shm = self.uevmlfs.config.getint('UEVaultManager', 'max_memory', fallback=2048)
@@ -698,14 +764,22 @@ class AppCore:
 
         if not max_workers:
             max_workers = self.uevmlfs.config.getint('UEVaultManager', 'max_workers', fallback=0)
+        max_writers = self.uevmlfs.config.getint('UEVaultManager', 'max_writers', fallback=0)
+        max_disk_cache = self.uevmlfs.config.getint('UEVaultManager', 'max_disk_cache', fallback=10240)
 
         download_manager = DLManager(
             download_dir=download_folder,
-            base_url=base_url,
+            base_url=selected_base_urls[0],
+            base_urls=selected_base_urls[1:],
             resume_file=resume_file,
             status_q=status_queue,
             max_shared_memory=max_shm * 1024 * 1024,
+            max_disk_cache=max_disk_cache * 1024 * 1024,
+            verify_chunks=self.uevmlfs.config.getboolean('UEVaultManager', 'verify_chunks', fallback=True),
+            chunk_store_dir=self.get_chunk_store_folder(),
+            max_chunk_store=self.uevmlfs.config.getint('UEVaultManager', 'chunk_store_size', fallback=0) * 1024 * 1024,
             max_workers=max_workers,
+            max_writers=max_writers,
             timeout=self.timeout,
             trace_func=log_info_and_gui_display,
         )
@@ -730,7 +804,8 @@ class AppCore:
             file_exclude_filter=file_exclude_filter,
             file_install_tag=file_install_tag,
             processing_optimization=process_opt,
-            already_installed=already_installed
+            already_installed=already_installed,
+            old_dir=old_dir
         )
         if install_path:
             # will add install_path to the installed_folders list after checking if it is not already in it
@@ -738,12 +813,91 @@ class AppCore:
         installed_asset.install_size = analyse_res.install_size
         return download_manager, analyse_res, installed_asset
 
+    def get_installed_verification_folder(self, installed_asset: InstalledAsset) -> str:
+        """
+        Get the folder to use by default to verify the files of an installed asset.
+        :param installed_asset: installed asset.
+        :return: folder that contains the files listed in the manifest.
+        """
+        folder = installed_asset.install_path
+        # the files in the manifest are in the 'Content' sub folder, so we need its parent folder
+        if folder and os.path.basename(folder).lower() == gui_g.s.ue_asset_content_subfolder.lower():
+            folder = os.path.dirname(folder)
+        return folder
+
+    def verify_asset(self, release_name: str, folder: str = '', max_processes: int = 0) -> (VerificationResult, str):
+        """
+        Verify the files of an installed asset against the hashes of its manifest.
+        :param release_name: release name of the installed asset.
+        :param folder: folder that contains the files. If empty, the installation folder of the asset will be used.
+        :param max_processes: maximum number of processes used to hash the files. If 0, the number of CPUs will be used (8 max).
+        :return: (VerificationResult object, verified folder).
+        """
+        installed_asset = self.uevmlfs.get_installed_asset(release_name)
+        if installed_asset is None:
+            raise ValueError(f'The asset "{release_name}" is not installed.')
+        manifest_data = self.uevmlfs.load_manifest(release_name, installed_asset.version, installed_asset.platform)
+        if not manifest_data:
+            raise ValueError(f'The manifest of "{release_name}" could not be loaded.')
+        folder = folder or self.get_installed_verification_folder(installed_asset)
+        if not folder or not os.path.isdir(folder):
+            raise ValueError(f'The folder "{folder}" does not exist.')
+
+        manifest = self.load_manifest(manifest_data)
+        file_list = [(fm.filename, fm.file_size, fm.sha_hash.hex()) for fm in manifest.file_manifest_list.elements]
+        log_info_and_gui_display(f'Verifying {len(file_list)} files of "{release_name}" in "{folder}"...')
+        download_manager = DLManager(download_dir=folder, base_url='', trace_func=log_info_and_gui_display)
+        return download_manager.verify_files(file_list=file_list, max_processes=max_processes), folder
+
+    def prepare_repair(self, release_name: str, files_to_repair: list, folder: str = '', status_queue: Queue = None) -> (DLManager, AnalysisResult):
+        """
+        Prepare the download of the bad files of an installed asset, found by verify_asset().
+        :param release_name: release name of the installed asset.
+        :param files_to_repair: files to download again.
+        :param folder: folder that contains the files. If empty, the installation folder of the asset will be used.
+        :param status_queue: status queue to send status updates to.
+        :return: (DLManager object, AnalysisResult object).
+        """
+        installed_asset = self.uevmlfs.get_installed_asset(release_name)
+        if installed_asset is None:
+            raise ValueError(f'The asset "{release_name}" is not installed.')
+        manifest_data = self.uevmlfs.load_manifest(release_name, installed_asset.version, installed_asset.platform)
+        if not manifest_data:
+            raise ValueError(f'The manifest of "{release_name}" could not be loaded.')
+        folder = folder or self.get_installed_verification_folder(installed_asset)
+
+        selected_base_urls = self.get_selected_base_urls(installed_asset.base_urls)
+        if self.uevmlfs.config.getboolean('UEVaultManager', 'disable_https', fallback=False):
+            selected_base_urls = [url.replace('https://', 'http://') for url in selected_base_urls]
+
+        download_manager = DLManager(
+            download_dir=folder,
+            base_url=selected_base_urls[0],
+            base_urls=selected_base_urls[1:],
+            status_q=status_queue,
+            max_shared_memory=self.uevmlfs.config.getint('UEVaultManager', 'max_memory', fallback=2048) * 1024 * 1024,
+            max_disk_cache=self.uevmlfs.config.getint('UEVaultManager', 'max_disk_cache', fallback=10240) * 1024 * 1024,
+            verify_chunks=self.uevmlfs.config.getboolean('UEVaultManager', 'verify_chunks', fallback=True),
+            chunk_store_dir=self.get_chunk_store_folder(),
+            max_chunk_store=self.uevmlfs.config.getint('UEVaultManager', 'chunk_store_size', fallback=0) * 1024 * 1024,
+            max_workers=self.uevmlfs.config.getint('UEVaultManager', 'max_workers', fallback=0),
+            max_writers=self.uevmlfs.config.getint('UEVaultManager', 'max_writers', fallback=0),
+            timeout=self.timeout,
+            trace_func=log_info_and_gui_display,
+        )
+        analyse_res = download_manager.run_analysis(
+            manifest=self.load_manifest(manifest_data), patch=False, resume=False, already_installed=True, files_to_repair=set(files_to_repair)
+        )
+        return download_manager, analyse_res
+
     def clean_exit(self, code=0) -> None:
         """
         Do cleanup, config saving, and quit.
         :param code: exit code.
         """
+        self.uevmlfs.flush_json_files()
         self.uevmlfs.save_config()
+        self.egs.close_uc_browser()
         logging.shutdown()
         exit_and_clean_windows(code)
 
@@ -0,0 +1,177 @@
+# coding: utf-8
+"""
+Implementation for:
+- CDNBalancer: Distributes the chunk downloads between several CDN base urls, according to their measured throughput.
+"""
+import logging
+import random
+import time
+from dataclasses import replace
+from threading import Lock
+
+from UEVaultManager.models.downloading import CDNStats
+
+
+class CDNBalancer:
+    """
+    Distributes the chunk downloads between several CDN base urls, according to their measured throughput.
+    :param base_urls: base urls of the CDNs.
+    :param smoothing: weight of the last request in the average speed and failure rate of a host.
+    :param min_requests: number of requests done by a host before it can be demoted.
+    :param demotion_ratio: a host slower than this ratio of the speed of the fastest one is demoted.
+    :param max_failure_rate: a host with a failure rate over this value is demoted.
+    :param demoted_share: share of the requests still sent to a demoted host, to keep measuring it (and promote it again if it got better).
+    :param base_backoff: backoff in seconds after the first failure of a host.
+    :param max_backoff: maximal backoff in seconds.
+
+    Notes:
+        The base urls are picked with a smooth weighted round-robin, the weight of a host being its average speed.
+        After a failure, a host is in backoff: it's not used until a delay, doubled for each consecutive failure and jittered, has elapsed.
+        The backoff is shared by all the requests to the host, so the workers don't retry all at the same time after a hiccup of the CDN.
+        Thread safe: the urls are picked by the download job manager and the results added by the download result handler.
+    """
+    logger = logging.getLogger('CDNBalancer')
+
+    def __init__(
+        self,
+        base_urls: list,
+        smoothing: float = 0.2,
+        min_requests: int = 5,
+        demotion_ratio: float = 0.25,
+        max_failure_rate: float = 0.5,
+        demoted_share: float = 0.02,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0
+    ):
+        if not base_urls:
+            raise ValueError('No base URLs given.')
+        self.base_urls: list = list(dict.fromkeys(base_urls))  # remove the duplicates but keep the order
+        self.smoothing: float = smoothing
+        self.min_requests: int = min_requests
+        self.demotion_ratio: float = demotion_ratio
+        self.max_failure_rate: float = max_failure_rate
+        self.demoted_share: float = demoted_share
+        self.base_backoff: float = base_backoff
+        self.max_backoff: float = max_backoff
+        self.stats: dict = {base_url: CDNStats(host=self.get_host(base_url)) for base_url in self.base_urls}
+        self._credits: dict = {base_url: 0.0 for base_url in self.base_urls}
+        self._consecutive_failures: dict = {base_url: 0 for base_url in self.base_urls}
+        self._backoff_until: dict = {base_url: 0.0 for base_url in self.base_urls}
+        self._lock = Lock()
+
+    def __getstate__(self) -> dict:
+        """
+        Get the state of the object to pickle it (it's pickled with the DLManager when its process is started with the "spawn" method).
+        :return: state of the object, without the lock that can't be pickled.
+        """
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Set the state of the object when unpickled, with a new lock.
+        :param state: state of the object.
+        """
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    @staticmethod
+    def get_host(base_url: str) -> str:
+        """
+        Get the host of a base url.
+        :param base_url: base url.
+        :return: host.
+        """
+        return base_url.split('/')[2] if '//' in base_url else base_url
+
+    def _get_weights(self) -> dict:
+        """
+        Get the weight of each base url, i.e. the share of the requests it should get.
+        :return: dict of weights by base url.
+        """
+        best_speed = max(stats.speed for stats in self.stats.values())
+        if not best_speed:
+            # nothing measured yet, share the requests between the hosts that did not fail
+            weights = {base_url: 0.0 if stats.num_failures else 1.0 for base_url, stats in self.stats.items()}
+            return weights if any(weights.values()) else dict.fromkeys(self.stats, 1.0)
+        weights = {}
+        for base_url, stats in self.stats.items():
+            if not stats.num_requests:
+                # not measured yet, give it the same chance as the best one
+                weights[base_url] = best_speed
+            else:
+                stats.demoted = stats.num_requests >= self.min_requests and (
+                    stats.speed < best_speed * self.demotion_ratio or stats.failure_rate > self.max_failure_rate
+                )
+                weights[base_url] = best_speed * self.demoted_share if stats.demoted else max(stats.speed, best_speed * self.demoted_share)
+        return weights
+
+    def get_wait_time(self) -> float:
+        """
+        Get the time to wait before a host is available, i.e. not in backoff.
+        :return: time in seconds, 0 if a host is available.
+        """
+        with self._lock:
+            return max(0.0, min(self._backoff_until.values()) - time.perf_counter())
+
+    def get_base_url(self) -> str:
+        """
+        Get the base url to use for the next request.
+        :return: base url.
+        """
+        if len(self.base_urls) == 1:
+            return self.base_urls[0]
+        with self._lock:
+            weights = self._get_weights()
+            now = time.perf_counter()
+            available_weights = {base_url: weight for base_url, weight in weights.items() if self._backoff_until[base_url] <= now}
+            if any(available_weights.values()):
+                # the hosts in backoff are skipped, they don't get credits
+                weights = available_weights
+            total = sum(weights.values())
+            for base_url, weight in weights.items():
+                self._credits[base_url] += weight
+            base_url = max(weights, key=self._credits.get)
+            self._credits[base_url] -= total
+            return base_url
+
+    def add_result(self, base_url: str, success: bool, size: int = 0, duration: float = 0.0) -> None:
+        """
+        Add the result of a request to the statistics of its host.
+        :param base_url: base url used by the request.
+        :param success: whether the request succeeded.
+        :param size: size of the downloaded data.
+        :param duration: duration of the request in seconds.
+        """
+        with self._lock:
+            stats = self.stats.get(base_url)
+            if stats is None:
+                return
+            was_demoted = stats.demoted
+            stats.num_requests += 1
+            stats.failure_rate += self.smoothing * ((0.0 if success else 1.0) - stats.failure_rate)
+            if success:
+                self._consecutive_failures[base_url] = 0
+                stats.bytes_downloaded += size
+                if duration > 0:
+                    speed = size / duration
+                    stats.speed = speed if not stats.speed else stats.speed + self.smoothing * (speed - stats.speed)
+            else:
+                stats.num_failures += 1
+                self._consecutive_failures[base_url] += 1
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (self._consecutive_failures[base_url] - 1))
+                # "equal jitter": half of the backoff is fixed, the other half is random
+                backoff_until = time.perf_counter() + backoff / 2 + random.uniform(0, backoff / 2)
+                self._backoff_until[base_url] = max(self._backoff_until[base_url], backoff_until)
+            self._get_weights()
+            if stats.demoted != was_demoted:
+                self.logger.info(f'CDN {stats.host} has been {"demoted" if stats.demoted else "promoted"}')
+
+    def get_stats(self) -> list:
+        """
+        Get a copy of the statistics of all the hosts.
+        :return: list of CDNStats objects.
+        """
+        with self._lock:
+            return [replace(stats) for stats in self.stats.values()]
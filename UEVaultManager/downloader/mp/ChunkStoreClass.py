@@ -0,0 +1,157 @@
+# coding: utf-8
+"""
+Implementation for:
+- ChunkStore: Local store of the downloaded chunks, shared by all the assets and releases, with a size limit.
+"""
+import logging
+import os
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+from UEVaultManager.lfs.utils import path_join
+
+
+class ChunkStore:
+    """
+    Local store of the downloaded chunks, shared by all the assets and releases, with a size limit.
+    :param folder: folder of the store.
+    :param max_size: maximal size of the store in bytes.
+
+    Notes:
+        The chunks are stored decompressed, one file by chunk, named by the hash of their content (see get_key()).
+        So a chunk used by several releases of an asset (or by several assets of a seller) is downloaded only once.
+        When the store is full, the least recently used chunks are removed. The last use of a chunk is the modification time of its file.
+        The chunks used by the current download are never removed.
+        Thread safe: the chunks are read by the analysis and added by the writer result handler.
+    """
+    logger = logging.getLogger('ChunkStore')
+    extension = '.chunk'
+
+    def __init__(self, folder: str, max_size: int):
+        self.folder: str = folder
+        self.max_size: int = max_size
+        self.size: int = 0
+        # size of each chunk in the store, by key. Sorted from the least recently used to the most recently used
+        self._entries: OrderedDict = OrderedDict()
+        # chunks used by the current download, they can't be removed
+        self._pinned: set = set()
+        self._lock = Lock()
+        self._load()
+
+    def __getstate__(self) -> dict:
+        """
+        Get the state of the object to pickle it (it's pickled with the DLManager when its process is started with the "spawn" method).
+        :return: state of the object, without the lock that can't be pickled.
+
+        Notes:
+            The chunks pinned by the analysis, done in the parent process, are kept so they are not removed by the download.
+        """
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Set the state of the object when unpickled, with a new lock.
+        :param state: state of the object.
+        """
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    @staticmethod
+    def get_key(chunk_info) -> str:
+        """
+        Get the key of a chunk in the store.
+        :param chunk_info: ChunkInfo object of the chunk, from the manifest.
+        :return: key of the chunk.
+
+        Notes:
+            The SHA-1 hash of the chunk is used if the manifest has it. The JSON manifests don't, the guid and the rolling hash are used instead.
+        """
+        if chunk_info.sha_hash:
+            return chunk_info.sha_hash.hex()
+        return f'{chunk_info.guid_num:032x}_{chunk_info.hash:016x}'
+
+    def get_path(self, key: str) -> str:
+        """
+        Get the path of the file of a chunk.
+        :param key: key of the chunk.
+        :return: path of the file.
+        """
+        # sub folders to keep the number of files by folder reasonable
+        return path_join(self.folder, key[:2], key + self.extension)
+
+    def _load(self) -> None:
+        """
+        Load the list of the chunks in the store.
+        """
+        if not os.path.isdir(self.folder):
+            return
+        found = []
+        for sub_folder in os.scandir(self.folder):
+            if not sub_folder.is_dir():
+                continue
+            for entry in os.scandir(sub_folder.path):
+                if entry.name.endswith(self.extension):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, entry.name[:-len(self.extension)], stat.st_size))
+                elif entry.name.endswith('.tmp'):
+                    # a chunk that was being added when the application stopped
+                    self._remove_file(entry.path)
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.size += size
+        self.logger.debug(f'Chunk store: {len(self._entries)} chunks, {self.size / 1024 / 1024:.02f} MiB')
+
+    def _remove_file(self, path: str) -> None:
+        """
+        Remove a file of the store.
+        :param path: path of the file.
+        """
+        try:
+            os.remove(path)
+        except OSError as error:
+            self.logger.warning(f'Failed to remove "{path}" from the chunk store: {error!r}')
+
+    def get(self, key: str, size: int) -> Optional[str]:
+        """
+        Get the file of a chunk and mark it as used by the current download.
+        :param key: key of the chunk.
+        :param size: expected size of the decompressed chunk.
+        :return: path of the file, or None if the chunk is not in the store.
+        """
+        with self._lock:
+            if self._entries.get(key) != size:
+                return None
+            path = self.get_path(key)
+            try:
+                # the modification time keeps the order of use between the sessions
+                os.utime(path)
+            except OSError:
+                # removed by something else
+                self.size -= self._entries.pop(key)
+                return None
+            self._entries.move_to_end(key)
+            self._pinned.add(key)
+            return path
+
+    def add(self, key: str, size: int) -> None:
+        """
+        Add a chunk whose file has been written, and remove the least recently used chunks if the store is full.
+        :param key: key of the chunk.
+        :param size: size of the file of the chunk.
+        """
+        with self._lock:
+            self.size += size - self._entries.get(key, 0)
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            if self.size <= self.max_size:
+                return
+            for old_key in list(self._entries):
+                if self.size <= self.max_size:
+                    break
+                if old_key in self._pinned or old_key == key:
+                    continue
+                self._remove_file(self.get_path(old_key))
+                self.size -= self._entries.pop(old_key)
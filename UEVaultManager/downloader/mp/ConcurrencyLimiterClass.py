@@ -0,0 +1,115 @@
+# coding: utf-8
+"""
+Implementation for:
+- ConcurrencyLimiter: Limit of the number of chunk requests in flight, adapted to the throughput and to the errors.
+"""
+import logging
+import time
+from threading import Lock
+
+
+class ConcurrencyLimiter:
+    """
+    Limit of the number of chunk requests in flight, adapted to the throughput and to the errors.
+    :param min_limit: minimal value of the limit.
+    :param max_limit: maximal value of the limit.
+    :param initial_limit: initial value of the limit. If None, min_limit is used.
+    :param decrease_factor: factor applied to the limit when a request fails or when the throughput drops.
+    :param cooldown: minimal time in seconds between two decreases, the failures of the requests sent at the same time count once.
+    :param throughput_tolerance: relative drop of the throughput between two windows considered as a congestion.
+
+    Notes:
+        It's an AIMD (additive increase, multiplicative decrease) algorithm, as the TCP congestion control:
+        - the limit is increased by 1 after each window of successful requests (a window is "limit" requests),
+        - the limit is multiplied by decrease_factor when a request fails, or when a window had a lower throughput than the previous one after an increase.
+        Thread safe: the limit is read by the download job manager and the results are added by the download result handler.
+    """
+    logger = logging.getLogger('ConcurrencyLimiter')
+
+    def __init__(
+        self,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        initial_limit: int = None,
+        decrease_factor: float = 0.5,
+        cooldown: float = 2.0,
+        throughput_tolerance: float = 0.1
+    ):
+        self.min_limit: int = max(1, min_limit)
+        self.max_limit: int = max(self.min_limit, max_limit)
+        self.decrease_factor: float = decrease_factor
+        self.cooldown: float = cooldown
+        self.throughput_tolerance: float = throughput_tolerance
+        self._limit: float = min(max(initial_limit or self.min_limit, self.min_limit), self.max_limit)
+        self._last_decrease: float = 0.0
+        self._window_start: float = time.perf_counter()
+        self._window_bytes: int = 0
+        self._window_count: int = 0
+        self._last_throughput: float = 0.0
+        self._last_window_increased: bool = False
+        self._lock = Lock()
+
+    def __getstate__(self) -> dict:
+        """
+        Get the state of the object to pickle it (it's pickled with the DLManager when its process is started with the "spawn" method).
+        :return: state of the object, without the lock that can't be pickled.
+        """
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Set the state of the object when unpickled, with a new lock.
+        :param state: state of the object.
+        """
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    @property
+    def limit(self) -> int:
+        """ Get the current maximal number of requests in flight. """
+        return int(self._limit)
+
+    def _decrease(self, now: float, reason: str) -> None:
+        """
+        Decrease the limit, if not already done during the cooldown.
+        :param now: current time.
+        :param reason: reason of the decrease, for the logs.
+        """
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+        self.logger.debug(f'Concurrency limit decreased to {self.limit} ({reason})')
+
+    def add_result(self, success: bool, size: int = 0) -> None:
+        """
+        Add the result of a request and adapt the limit.
+        :param success: whether the request succeeded.
+        :param size: size of the downloaded data.
+        """
+        with self._lock:
+            now = time.perf_counter()
+            if not success:
+                self._decrease(now, 'request failed')
+                return
+            self._window_bytes += size
+            self._window_count += 1
+            if self._window_count < self.limit:
+                return
+            # end of a window, compare its throughput with the previous one
+            duration = now - self._window_start
+            throughput = self._window_bytes / duration if duration > 0 else 0.0
+            if self._last_window_increased and throughput < self._last_throughput * (1 - self.throughput_tolerance):
+                # more requests in flight gave a lower throughput, the network or the CDN is saturated
+                self._decrease(now, 'throughput dropped')
+                self._last_window_increased = False
+            elif self._limit < self.max_limit:
+                self._limit = min(self.max_limit, self._limit + 1)
+                self._last_window_increased = True
+            else:
+                self._last_window_increased = False
+            self._last_throughput = throughput
+            self._window_start = now
+            self._window_bytes = self._window_count = 0
@@ -7,20 +7,27 @@ Implementation for:
 
 import logging
 import os
+import heapq
 import sys
 import time
+import zlib
 from collections import Counter, defaultdict, deque
+from concurrent.futures import as_completed, ProcessPoolExecutor
 from logging.handlers import QueueHandler
 from multiprocessing import cpu_count, Process, Queue as MPQueue
 from multiprocessing.shared_memory import SharedMemory
 from queue import Empty
-from threading import Condition, Thread
+from threading import Condition, Lock, Thread
 from typing import Callable
 
-from UEVaultManager.downloader.mp.workers import DLWorker, FileWorker
-from UEVaultManager.lfs.utils import path_join
+from UEVaultManager.downloader.mp.CDNBalancerClass import CDNBalancer
+from UEVaultManager.downloader.mp.ChunkStoreClass import ChunkStore
+from UEVaultManager.downloader.mp.ConcurrencyLimiterClass import ConcurrencyLimiter
+from UEVaultManager.downloader.mp.ResumeJournalClass import ResumeJournal
+from UEVaultManager.downloader.mp.workers import DLWorker, FileWorker, hash_file
+from UEVaultManager.lfs.utils import path_join, path_join_resolved
 from UEVaultManager.models.downloading import AnalysisResult, ChunkTask, DownloaderTask, FileTask, SharedMemorySegment, TaskFlags, \
-    TerminateWorkerTask, UIUpdate, WriterTask
+    TerminateWorkerTask, UIUpdate, VerificationResult, WriterTask
 from UEVaultManager.models.manifest import Manifest, ManifestComparison
 from UEVaultManager.tkgui.modules.cls.FakeUEVMGuiClass import FakeUEVMGuiClass
 from UEVaultManager.tkgui.modules.cls.ProgressWindowClass import ProgressWindow
@@ -35,13 +42,20 @@ class DLManager(Process):
         self,
         download_dir: str,
         base_url: str,
+        base_urls: list = None,
         cache_dir: str = '',
         status_q=None,
         max_workers: int = 0,
+        max_writers: int = 0,
         update_interval: float = 1.0,
         timeout: (float, float) = (7, 7),
         resume_file=None,
         max_shared_memory: int = 1024 * 1024 * 1024,
+        max_disk_cache: int = 10 * 1024 * 1024 * 1024,
+        verify_chunks: bool = True,
+        chunk_store_dir: str = '',
+        max_chunk_store: int = 0,
+        max_chunk_retries: int = 7,
         trace_func: Callable = None,
     ):
         super().__init__(name='DLManager')
@@ -49,28 +63,53 @@ class DLManager(Process):
         self.proc_debug = False
 
         self.base_url = base_url
-        self.download_dir = download_dir
-        self.cache_dir = cache_dir or path_join(download_dir, '.cache')
+        # the chunks are downloaded from all the base urls (i.e. CDNs), the fastest ones getting more requests
+        self.cdn_balancer = CDNBalancer([base_url] + (base_urls or []))
+        # resolved once here, the paths of the files are joined to it without accessing the filesystem
+        self.download_dir = path_join_resolved(download_dir)
+        self.cache_dir = path_join_resolved(cache_dir) if cache_dir else path_join(self.download_dir, '.cache')
 
         # All the queues!
         self.logging_queue = None
         self.worker_queue = None
-        self.writer_queue = None
+        self.writer_queues = []  # one queue per writer process
         self.result_queue = None
         self.writer_result_queue = None
         self.max_workers = max_workers or min(cpu_count() * 2, 16)
+        self.max_writers = max_writers or min(cpu_count(), 4)
         self.timeout = timeout
+        # number of download jobs in flight, between 1 and max_workers * 2 (the jobs waiting in the queue of the workers are prefetched)
+        self.concurrency_limiter = ConcurrencyLimiter(min_limit=1, max_limit=self.max_workers * 2, initial_limit=self.max_workers)
 
         # Analysis stuff
         self.analysis = None
         self.tasks = deque()
         self.chunks_to_dl = deque()
+        # results of the failed download jobs, to send again
+        self.retry_tasks = deque()
+        # number of failed downloads of each chunk, a chunk that fails more than max_chunk_retries times stops the download
+        self.max_chunk_retries = max_chunk_retries
+        self.chunk_retries = Counter()
+        self.failed_chunks = []
         self.chunk_data_list = None
 
         # shared memory stuff
         self.max_shared_memory = max_shared_memory  # 1 GiB by default
+        # maximum size of the disk cache used when the shared memory is too small to keep all the chunks (10 GiB by default, 0 to disable)
+        self.max_disk_cache = max_disk_cache
         self.sms = deque()
         self.shared_memory = None
+        # number of pending writes for each shared memory segment (by offset) and segments to release when they are all done
+        # needed because the writes of a cached chunk can be done by different writers, in any order
+        self.shm_pending_writes = Counter()
+        self.shm_to_release = set()
+        self.shm_lock = Lock()
+        # same for the files of the disk cache, plus the files that have been written and can be read
+        self.disk_cache_pending_reads = Counter()
+        self.disk_cache_to_delete = set()
+        self.disk_cache_ready = set()
+        # store of the chunks shared by all the downloads, the chunks found there are not downloaded (disabled if max_chunk_store is 0)
+        self.chunk_store = ChunkStore(path_join_resolved(chunk_store_dir), max_chunk_store) if chunk_store_dir and max_chunk_store > 0 else None
 
         # Interval for log updates and pushing updates to the queue
         self.update_interval = update_interval
@@ -78,11 +117,20 @@ class DLManager(Process):
 
         # Resume file stuff
         self.resume_file = resume_file
+        # opened when running, the journal is written by the writer result handler
+        self.resume_journal = None
         self.hash_map = {}
+        # files written by the download, as (filename, size, sha hash) tuples, used to verify them at the end
+        self.verification_list = []
+        # whether the download workers check the hash of each chunk, and the number of chunks checked and rejected
+        self.verify_chunks = verify_chunks
+        self.num_chunks_verified = 0
+        self.num_chunks_corrupted = 0
 
         # cross-thread runtime information
         self.running = True
         self.active_tasks = 0
+        self.dl_results_handler_done = False
         self.children = []
         self.threads = []
         self.conditions = []
@@ -98,6 +146,23 @@ class DLManager(Process):
         self.num_tasks_processed_since_last = 0
         self.trace_func = trace_func if trace_func is not None else self.logger.info
 
+    def __getstate__(self) -> dict:
+        """
+        Get the state of the object to pickle it, when the process is started with the "spawn" method (default on Windows and macOS).
+        :return: state of the object, without the lock that can't be pickled.
+        """
+        state = self.__dict__.copy()
+        del state['shm_lock']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Set the state of the object when unpickled in the process, with a new lock.
+        :param state: state of the object.
+        """
+        self.__dict__.update(state)
+        self.shm_lock = Lock()
+
     def run_analysis(
         self,
         manifest: Manifest,
@@ -108,7 +173,9 @@ class DLManager(Process):
         file_exclude_filter: list = None,
         file_install_tag: list = None,
         processing_optimization: bool = False,
-        already_installed: bool = False
+        already_installed: bool = False,
+        files_to_repair: set = None,
+        old_dir: str = ''
     ) -> AnalysisResult:
         """
         Run analysis on manifest and old manifest (if not None) and return a result
@@ -122,13 +189,20 @@ class DLManager(Process):
         :param file_install_tag: only install files with the specified tag.
         :param processing_optimization: attempt to optimize processing order and RAM usage.
         :param already_installed: True if the asset has already been installed into the installation folder. Note that this parem is TRAMSMITTED by the caller and stored as it in the "AnalysisResult".
+        :param files_to_repair: if set, only these files will be downloaded (e.g. the bad files found by verify_files()). The others are considered as unchanged.
+        :param old_dir: folder of the files of the old manifest, if it's not the download folder (i.e. another installed release of the asset).
+            The unchanged files are copied from there and the changed files are patched from there, the old files are not modified.
+            Only the files that match the hashes of the old manifest are used, the others are downloaded.
         :return: analysisResult.
         """
         analysis_res = AnalysisResult()
         analysis_res.already_installed = already_installed
-        analysis_res.install_size = sum(fm.file_size for fm in manifest.file_manifest_list.elements)
-        analysis_res.biggest_chunk = max(c.window_size for c in manifest.chunk_data_list.elements)
-        analysis_res.biggest_file_size = max(f.file_size for f in manifest.file_manifest_list.elements)
+        # use the columns of the lists, the elements of a compact manifest are created on each access
+        file_sizes = manifest.file_manifest_list.get_file_sizes()
+        chunk_sizes = manifest.chunk_data_list.get_chunk_sizes()
+        analysis_res.install_size = sum(file_sizes.values())
+        analysis_res.biggest_chunk = max(window_size for window_size, _ in chunk_sizes.values())
+        analysis_res.biggest_file_size = max(file_sizes.values())
         is_1mib = analysis_res.biggest_chunk == 1024 * 1024
         self.logger.debug(f'Biggest chunk size: {analysis_res.biggest_chunk} bytes (== 1 MiB? {is_1mib})')
 
@@ -136,24 +210,62 @@ class DLManager(Process):
         mc = ManifestComparison.create(manifest, old_manifest)
         analysis_res.manifest_comparison = mc
 
+        # unchanged files to copy from the folder of the old release
+        files_to_copy = set()
+        old_dir = path_join_resolved(old_dir) if old_dir else ''
+        if old_manifest and old_dir:
+            # the files of the other release could have been modified (i.e. in the folder of a project) or deleted since its installation.
+            # Only the files that match the hashes of its manifest are copied or used to patch, the others are downloaded
+            old_file_sizes = old_manifest.file_manifest_list.get_file_sizes()
+            old_file_hashes = old_manifest.file_manifest_list.get_file_hashes()
+            files_to_check = mc.unchanged | mc.changed if patch else mc.unchanged
+            result = self.verify_files([(filename, old_file_sizes[filename], old_file_hashes[filename].hex()) for filename in files_to_check], base_dir=old_dir)
+            missing_old_files = set(result.missing + result.mismatched + result.failed)
+            if missing_old_files:
+                self.trace_func(f'{len(missing_old_files)} files of "{old_dir}" are missing or have been modified, they will be downloaded.')
+            files_to_copy = mc.unchanged - missing_old_files
+            mc.added |= missing_old_files
+            mc.changed -= missing_old_files
+            mc.unchanged -= missing_old_files
+            self.trace_func(f'{len(files_to_copy)} unchanged files will be copied from "{old_dir}", {len(mc.changed)} changed files will be patched.')
+
+        if files_to_repair is not None:
+            all_files = set(fm.filename for fm in manifest.file_manifest_list.elements)
+            mc.added = set(files_to_repair) & all_files
+            mc.changed = set()
+            mc.removed = set()
+            mc.unchanged = all_files - mc.added
+            self.trace_func(f'{len(mc.added)} files will be repaired.')
+            # the resume file would skip the files to repair
+            resume = False
+
+        # chunk parts already written in the files that were not completed by an interrupted download, by filename
+        written_parts = {}
         if resume and self.resume_file and os.path.exists(self.resume_file):
             self.trace_func('Found previously interrupted download. Download will be resumed if possible.')
             try:
                 missing = 0
                 mismatch = 0
                 completed_files = set()
+                file_hashes = manifest.file_manifest_list.get_file_hashes()
+                journal_files, journal_parts = ResumeJournal.read(self.resume_file)
 
-                for line in open(self.resume_file, encoding='utf-8').readlines():
-                    file_hash, _, filename = line.strip().partition(':')
+                for filename, file_hash in journal_files.items():
                     _p = path_join(self.download_dir, filename)
                     if not os.path.exists(_p):
                         self.logger.debug(f'File does not exist but is in resume file: "{_p}"')
                         missing += 1
-                    elif file_hash != manifest.file_manifest_list.get_file_by_path(filename).sha_hash.hex():
+                    elif filename not in file_hashes or file_hash != file_hashes[filename].hex():
                         mismatch += 1
                     else:
                         completed_files.add(filename)
 
+                for filename, parts in journal_parts.items():
+                    _p = path_join(self.download_dir, filename)
+                    # the parts are checked against the chunk parts of the manifest when creating the tasks, only the size of the file is checked here
+                    if filename in file_sizes and os.path.exists(_p) and os.path.getsize(_p) >= max(offset + size for offset, size, _ in parts):
+                        written_parts[filename] = parts
+
                 if missing:
                     self.logger.warning(f'{missing} previously completed file(s) are missing, they will be redownloaded.')
                 if mismatch:
@@ -163,16 +275,22 @@ class DLManager(Process):
                 mc.added -= completed_files
                 mc.changed -= completed_files
                 mc.unchanged |= completed_files
+                files_to_copy -= completed_files
                 self.trace_func(f'Skipping {len(completed_files)} files based on resume data.')
+                if written_parts:
+                    num_parts = sum(len(parts) for parts in written_parts.values())
+                    self.trace_func(f'Skipping {num_parts} chunk parts already written in {len(written_parts)} partially downloaded files.')
             except Exception as error:
                 self.logger.warning(f'Reading resume file failed: {error!r}, continuing as normal...')
+                written_parts = {}
         elif resume:
             # Basic check if files exist locally, put all missing files into "added"
             # This allows new SDL tags to be installed without having to do a repair as well.
             missing_files = set()
 
             for fm in manifest.file_manifest_list.elements:
-                if fm.filename in mc.added:
+                # in copy mode, the files of the old release are not in the download folder yet
+                if fm.filename in mc.added or fm.filename in files_to_copy or (old_dir and fm.filename in mc.changed):
                     continue
 
                 local_path = path_join(self.download_dir, fm.filename)
@@ -199,6 +317,7 @@ class DLManager(Process):
             mc.added -= files_to_skip
             mc.changed -= files_to_skip
             mc.unchanged |= files_to_skip
+            files_to_copy -= files_to_skip
             for fname in sorted(files_to_skip):
                 additional_deletion_tasks.append(FileTask(fname, flags=TaskFlags.DELETE_FILE | TaskFlags.SILENT))
 
@@ -215,6 +334,7 @@ class DLManager(Process):
             mc.added -= files_to_skip
             mc.changed -= files_to_skip
             mc.unchanged |= files_to_skip
+            files_to_copy -= files_to_skip
 
         if file_prefix_filter:
             if isinstance(file_prefix_filter, str):
@@ -228,11 +348,12 @@ class DLManager(Process):
             mc.added -= files_to_skip
             mc.changed -= files_to_skip
             mc.unchanged |= files_to_skip
+            files_to_copy -= files_to_skip
 
         if file_prefix_filter or file_exclude_filter or file_install_tag:
             self.trace_func(f'Remaining files after filtering: {len(mc.added) + len(mc.changed)}')
             # correct instalation size after filtering
-            analysis_res.install_size = sum(fm.file_size for fm in manifest.file_manifest_list.elements if fm.filename in mc.added)
+            analysis_res.install_size = sum(file_sizes[filename] for filename in mc.added)
 
         if mc.removed:
             analysis_res.removed = len(mc.removed)
@@ -247,10 +368,7 @@ class DLManager(Process):
             analysis_res.unchanged = len(mc.unchanged)
             self.logger.debug(f'{analysis_res.unchanged} unchanged files')
 
-        if processing_optimization and len(manifest.file_manifest_list.elements) > 100_000:
-            self.logger.warning('Manifest contains too many files, processing optimizations will be disabled.')
-            processing_optimization = False
-        elif processing_optimization:
+        if processing_optimization:
             self.trace_func('Processing order optimization is enabled, analysis may take a few seconds longer...')
 
         # count references to chunks for determining runtime cache size later
@@ -262,12 +380,25 @@ class DLManager(Process):
         for fm in fmlist:
             self.hash_map[fm.filename] = fm.sha_hash.hex()
 
+            if fm.filename in files_to_copy:
+                # copied from the old release, without using any chunk
+                self.verification_list.append((fm.filename, fm.file_size, self.hash_map[fm.filename]))
+                analysis_res.reuse_size += fm.file_size
+                current_tmp_size += fm.file_size
+                analysis_res.disk_space_delta = max(current_tmp_size, analysis_res.disk_space_delta)
+                continue
+
             # chunks of unchanged files are not downloaded, so we can skip them
             if fm.filename in mc.unchanged:
                 analysis_res.unchanged += fm.file_size
                 continue
+            self.verification_list.append((fm.filename, fm.file_size, self.hash_map[fm.filename]))
 
+            file_written_parts = written_parts.get(fm.filename)
             for cp in fm.chunk_parts:
+                if file_written_parts and (cp.file_offset, cp.size, cp.guid_num) in file_written_parts:
+                    # already written by the interrupted download
+                    continue
                 references[cp.guid_num] += 1
 
             if fm.filename in mc.added:
@@ -279,53 +410,50 @@ class DLManager(Process):
                 # but then subtract the size of the old file as it's deleted on write completion.
                 current_tmp_size += fm.file_size
                 analysis_res.disk_space_delta = max(current_tmp_size, analysis_res.disk_space_delta)
-                current_tmp_size -= old_manifest.file_manifest_list.get_file_by_path(fm.filename).file_size
+                if not old_dir:
+                    # in copy mode, the old file is kept
+                    current_tmp_size -= old_manifest.file_manifest_list.get_file_by_path(fm.filename).file_size
 
         # clamp to 0
         self.logger.debug(f'Disk space delta: {analysis_res.disk_space_delta / 1024 / 1024:.02f} MiB')
 
+        # the chunks already in the chunk store are copied from it instead of being downloaded
+        stored_chunks = {}
+        if self.chunk_store:
+            for guid_num in references:
+                key = ChunkStore.get_key(manifest.chunk_data_list.get_chunk_by_guid_num(guid_num))
+                store_file = self.chunk_store.get(key, chunk_sizes[guid_num][0])
+                if store_file:
+                    stored_chunks[guid_num] = store_file
+            for guid_num in stored_chunks:
+                del references[guid_num]
+            analysis_res.num_chunks_stored = len(stored_chunks)
+            if stored_chunks:
+                self.trace_func(f'{len(stored_chunks)} chunks will be copied from the chunk store instead of being downloaded.')
+
         if processing_optimization:
             s_time = time.time()
-            # reorder the file manifest list to group files that share many chunks
-            # 4 is mostly arbitrary but has shown in testing to be a good choice
-            min_overlap = 4
-            # ignore files with less than N chunk parts, this speeds things up dramatically
-            cp_threshold = 5
-
-            remaining_files = {fm.filename: {cp.guid_num for cp in fm.chunk_parts} for fm in fmlist if fm.filename not in mc.unchanged}
-            _fmlist = []
-
-            # iterate over all files that will be downloaded and pair up those that share the most chunks
-            for fm in fmlist:
-                if fm.filename not in remaining_files:
-                    continue
-
-                _fmlist.append(fm)
-                f_chunks = remaining_files.pop(fm.filename)
-                if len(f_chunks) < cp_threshold:
-                    continue
-
-                best_overlap, match = 0, None
-                for fname, chunks in remaining_files.items():
-                    if len(chunks) < cp_threshold:
-                        continue
-                    overlap = len(f_chunks & chunks)
-                    if overlap > min_overlap and overlap > best_overlap:
-                        best_overlap, match = overlap, fname
-
-                if match:
-                    _fmlist.append(manifest.file_manifest_list.get_file_by_path(match))
-                    remaining_files.pop(match)
-
-            fmlist = _fmlist
+            # reorder the file manifest list to group files that share chunks, so the cached chunks are released sooner
+            files_to_process = [fm for fm in fmlist if fm.filename not in mc.unchanged]
+            _fmlist = self._get_optimized_file_order(files_to_process)
+            peak_before = self._get_peak_cache_count(files_to_process)
+            peak_after = self._get_peak_cache_count(_fmlist)
+            # the heuristic is not perfect, keep the original order if it's better
+            if peak_after < peak_before:
+                fmlist = _fmlist
             opt_delta = time.time() - s_time
-            self.logger.debug(f'Processing optimizations took {opt_delta:.01f} seconds.')
+            self.logger.debug(
+                f'Processing optimizations took {opt_delta:.01f} seconds. Cached chunks peak: {peak_before} before, {peak_after} after optimization.'
+            )
 
         # determine reusable chunks and prepare lookup table for reusable ones
         re_usable = defaultdict(dict)
         if old_manifest and mc.changed and patch:
             self.logger.debug('Analyzing manifests for re-usable chunks...')
             for changed in mc.changed:
+                if changed in written_parts:
+                    # the interrupted download was overwriting the old file, its content can't be reused
+                    continue
                 old_file = old_manifest.file_manifest_list.get_file_by_path(changed)
                 new_file = manifest.file_manifest_list.get_file_by_path(changed)
 
@@ -348,6 +476,34 @@ class DLManager(Process):
         last_cache_size = current_cache_size = 0
         # set to determine whether a file is currently cached or not
         cached = set()
+        # chunks that don't fit in the shared memory are spilled to the disk cache, if enabled
+        padding_size = 1024 * 1024 * 32
+        spill_to_disk = self.max_disk_cache > 0
+        last_disk_cache_size = current_disk_cache_size = 0
+        # cache file of each chunk currently in the disk cache
+        disk_cached = {}
+        # last task using each chunk of the disk cache, updated if the chunk is evicted
+        last_disk_cache_task = {}
+        # number of times each chunk has been spilled, used to get a unique cache file name
+        spill_count = Counter()
+
+        def evict_from_disk_cache(chunk_guid: int) -> None:
+            """
+            Remove a chunk from the disk cache. Its next uses will download it again.
+            :param chunk_guid: guid of the chunk to remove.
+            """
+            nonlocal current_disk_cache_size
+            last_task = last_disk_cache_task.pop(chunk_guid)
+            if last_task.cache_chunk:
+                # the chunk has not been read from the cache yet, no need to write it
+                last_task.cache_chunk = False
+                last_task.cache_file = None
+            else:
+                last_task.cleanup = True
+            del disk_cached[chunk_guid]
+            current_disk_cache_size -= analysis_res.biggest_chunk
+            chunks_in_dl_list.discard(chunk_guid)
+
         # Using this secondary set is orders of magnitude faster than checking the deque.
         chunks_in_dl_list = set()
         # This is just used to count all unique guids that have been cached
@@ -357,6 +513,11 @@ class DLManager(Process):
         # runtime cache requirement by simulating adding/removing from cache during download.
         self.logger.debug('Creating filetasks and chunktasks...')
         for current_file in fmlist:
+            if current_file.filename in files_to_copy:
+                self.tasks.append(FileTask(current_file.filename, old_file=path_join(old_dir, current_file.filename), flags=TaskFlags.COPY_FILE))
+                if current_file.executable:
+                    self.tasks.append(FileTask(current_file.filename, flags=TaskFlags.MAKE_EXECUTABLE))
+                continue
             # skip unchanged and empty files
             if current_file.filename in mc.unchanged:
                 continue
@@ -365,17 +526,34 @@ class DLManager(Process):
                 continue
 
             existing_chunks = re_usable.get(current_file.filename, None)
+            file_written_parts = written_parts.get(current_file.filename)
             chunk_tasks = []
             reused = 0
+            skipped = 0
 
             for cp in current_file.chunk_parts:
-                ct = ChunkTask(cp.guid_num, cp.offset, cp.size)
+                if file_written_parts and (cp.file_offset, cp.size, cp.guid_num) in file_written_parts:
+                    skipped += 1
+                    continue
+                ct = ChunkTask(cp.guid_num, cp.offset, cp.size, file_offset=cp.file_offset)
 
                 # re-use the chunk from the existing file if we can
                 if existing_chunks and (cp.guid_num, cp.offset, cp.size) in existing_chunks:
                     reused += 1
-                    ct.chunk_file = current_file.filename
+                    ct.chunk_file = path_join(old_dir, current_file.filename) if old_dir else current_file.filename
                     ct.chunk_offset = existing_chunks[(cp.guid_num, cp.offset, cp.size)]
+                elif cp.guid_num in stored_chunks:
+                    ct.store_file = stored_chunks[cp.guid_num]
+                elif cp.guid_num in disk_cached:
+                    # read the chunk from the disk cache
+                    references[cp.guid_num] -= 1
+                    ct.cache_file = disk_cached[cp.guid_num]
+                    last_disk_cache_task[cp.guid_num] = ct
+                    if references[cp.guid_num] < 1:
+                        ct.cleanup = True
+                        del disk_cached[cp.guid_num]
+                        del last_disk_cache_task[cp.guid_num]
+                        current_disk_cache_size -= analysis_res.biggest_chunk
                 else:
                     # add to DL list if not already in it
                     if cp.guid_num not in chunks_in_dl_list:
@@ -393,16 +571,45 @@ class DLManager(Process):
                             cached.remove(cp.guid_num)
                             ct.cleanup = True
                         # add to cache if not already cached
-                        elif cp.guid_num not in cached:
+                        elif cp.guid_num not in cached and (
+                            not spill_to_disk or current_cache_size + analysis_res.biggest_chunk + padding_size <= self.max_shared_memory
+                        ):
                             dl_cache_guids.add(cp.guid_num)
                             cached.add(cp.guid_num)
                             current_cache_size += analysis_res.biggest_chunk
+                        elif cp.guid_num not in cached:
+                            # not enough shared memory, spill the chunk to the disk cache
+                            ct.cleanup = True
+                            # if the disk cache is full, evict the chunks with the fewest remaining uses, they are the cheapest to download again
+                            while disk_cached and current_disk_cache_size + analysis_res.biggest_chunk > self.max_disk_cache:
+                                evicted_guid = min(disk_cached, key=references.__getitem__)
+                                if references[evicted_guid] >= references[cp.guid_num]:
+                                    break
+                                evict_from_disk_cache(evicted_guid)
+                            if current_disk_cache_size + analysis_res.biggest_chunk <= self.max_disk_cache:
+                                spill_count[cp.guid_num] += 1
+                                ct.cache_file = f'{cp.guid_num:x}_{spill_count[cp.guid_num]}.chunk'
+                                ct.cache_chunk = True
+                                disk_cached[cp.guid_num] = ct.cache_file
+                                last_disk_cache_task[cp.guid_num] = ct
+                                current_disk_cache_size += analysis_res.biggest_chunk
+                                last_disk_cache_size = max(last_disk_cache_size, current_disk_cache_size)
+                                analysis_res.num_chunks_spilled += 1
+                            else:
+                                # the chunk will be downloaded again for its next use
+                                chunks_in_dl_list.discard(cp.guid_num)
                     else:
                         ct.cleanup = True
 
                 chunk_tasks.append(ct)
 
-            if reused:
+            if reused and old_dir:
+                self.logger.debug(f' + Reusing {reused} chunks from: {path_join(old_dir, current_file.filename)}')
+                # the old file is in another folder, the new one is written directly
+                self.tasks.append(FileTask(current_file.filename, flags=TaskFlags.OPEN_FILE))
+                self.tasks.extend(chunk_tasks)
+                self.tasks.append(FileTask(current_file.filename, flags=TaskFlags.CLOSE_FILE))
+            elif reused:
                 self.logger.debug(f' + Reusing {reused} chunks from: {current_file.filename}')
                 # open temporary file that will contain download + old file contents
                 self.tasks.append(FileTask(current_file.filename + u'.tmp', flags=TaskFlags.OPEN_FILE))
@@ -413,7 +620,11 @@ class DLManager(Process):
                     FileTask(current_file.filename, old_file=current_file.filename + u'.tmp', flags=TaskFlags.RENAME_FILE | TaskFlags.DELETE_FILE)
                 )
             else:
-                self.tasks.append(FileTask(current_file.filename, flags=TaskFlags.OPEN_FILE))
+                if skipped:
+                    self.logger.debug(f' + Skipping {skipped} chunks already written in: {current_file.filename}')
+                # the file written by the interrupted download is kept, and the writer seeks to the chunk parts left
+                open_flags = TaskFlags.OPEN_FILE | TaskFlags.RESUME_FILE if skipped else TaskFlags.OPEN_FILE
+                self.tasks.append(FileTask(current_file.filename, flags=open_flags))
                 self.tasks.extend(chunk_tasks)
                 self.tasks.append(FileTask(current_file.filename, flags=TaskFlags.CLOSE_FILE))
 
@@ -426,9 +637,17 @@ class DLManager(Process):
                 last_cache_size = current_cache_size
 
         self.logger.debug(f'Final cache size requirement: {last_cache_size / 1024 / 1024} MiB.')
-        analysis_res.min_memory = last_cache_size + (1024 * 1024 * 32)  # add some padding just to be safe
+        analysis_res.min_memory = last_cache_size + padding_size  # add some padding just to be safe
+        if analysis_res.num_chunks_spilled:
+            analysis_res.disk_cache_size = last_disk_cache_size
+            # the disk cache is stored in the download folder
+            analysis_res.disk_space_delta += last_disk_cache_size
+            self.trace_func(
+                f'Shared memory is too small to keep all the chunks, {analysis_res.num_chunks_spilled} chunks will be cached on disk '
+                f'(up to {last_disk_cache_size / 1024 / 1024:.01f} MiB).'
+            )
 
-        # Todo: implement on-disk caching to avoid this issue.
+        # only possible if the disk cache is disabled
         if analysis_res.min_memory > self.max_shared_memory:
             shared_mib = f'{self.max_shared_memory / 1024 / 1024:.01f} MiB'
             required_mib = f'{analysis_res.min_memory / 1024 / 1024:.01f} MiB'
@@ -440,13 +659,15 @@ class DLManager(Process):
 
             raise MemoryError(f'Current shared memory cache is smaller than required: {shared_mib} < {required_mib}. ' + message)
 
-        # calculate actual dl and patch write size.
-        analysis_res.dl_size = sum(c.file_size for c in manifest.chunk_data_list.elements if c.guid_num in chunks_in_dl_list)
-        analysis_res.uncompressed_dl_size = sum(c.window_size for c in manifest.chunk_data_list.elements if c.guid_num in chunks_in_dl_list)
+        # calculate actual dl and patch write size. Chunks evicted from the disk cache are downloaded several times
+        dl_counts = Counter(self.chunks_to_dl)
+        analysis_res.dl_size = sum(chunk_sizes[guid_num][1] * count for guid_num, count in dl_counts.items())
+        analysis_res.uncompressed_dl_size = sum(chunk_sizes[guid_num][0] * count for guid_num, count in dl_counts.items())
 
-        # add jobs to remove files
-        for fname in mc.removed:
-            self.tasks.append(FileTask(fname, flags=TaskFlags.DELETE_FILE))
+        # add jobs to remove files, not needed in copy mode because the old files are in another folder
+        if not old_dir:
+            for fname in mc.removed:
+                self.tasks.append(FileTask(fname, flags=TaskFlags.DELETE_FILE))
         self.tasks.extend(additional_deletion_tasks)
 
         analysis_res.num_chunks_cache = len(dl_cache_guids)
@@ -455,34 +676,241 @@ class DLManager(Process):
 
         return analysis_res
 
+    @staticmethod
+    def _get_optimized_file_order(file_list: list) -> list:
+        """
+        Get an order of the files that keeps the files sharing chunks close, to reduce the number of chunks kept in the cache.
+        :param file_list: list of FileManifest objects to order.
+        :return: ordered list of FileManifest objects.
+
+        Notes:
+            The next file is the one having the most chunks already downloaded, so these chunks can be released sooner.
+            An inverted index (chunk -> files) is used to update the scores, each chunk updates them only once, when it's first downloaded.
+            So it runs in O(n.log(n)) with n the number of chunk parts, instead of the O(n²) of the files pairing.
+        """
+        chunk_index = defaultdict(list)  # files using each chunk
+        file_chunks = []
+        for index, fm in enumerate(file_list):
+            chunks = {cp.guid_num for cp in fm.chunk_parts}
+            file_chunks.append(chunks)
+            for chunk_guid in chunks:
+                chunk_index[chunk_guid].append(index)
+
+        scores = [0] * len(file_list)  # number of chunks already downloaded for each file
+        done = [False] * len(file_list)
+        downloaded = set()
+        heap = []  # (-score, index) of the candidates, outdated entries are skipped when popped
+        result = []
+        next_index = 0  # next file in the original order, used when there is no candidate
+        while len(result) < len(file_list):
+            index = None
+            while heap:
+                score, candidate = heapq.heappop(heap)
+                if not done[candidate] and -score == scores[candidate]:
+                    index = candidate
+                    break
+            if index is None:
+                while done[next_index]:
+                    next_index += 1
+                index = next_index
+            done[index] = True
+            result.append(file_list[index])
+            for chunk_guid in file_chunks[index] - downloaded:
+                downloaded.add(chunk_guid)
+                for other in chunk_index.pop(chunk_guid):
+                    if not done[other]:
+                        scores[other] += 1
+                        heapq.heappush(heap, (-scores[other], other))
+        return result
+
+    @staticmethod
+    def _get_peak_cache_count(file_list: list) -> int:
+        """
+        Get the maximum number of chunks that must be kept in the cache when processing files in the given order.
+        :param file_list: list of FileManifest objects.
+        :return: maximum number of chunks in the cache.
+        """
+        references = Counter(cp.guid_num for fm in file_list for cp in fm.chunk_parts)
+        cached = set()
+        peak = 0
+        for fm in file_list:
+            for cp in fm.chunk_parts:
+                references[cp.guid_num] -= 1
+                if references[cp.guid_num] < 1:
+                    cached.discard(cp.guid_num)
+                elif cp.guid_num not in cached:
+                    cached.add(cp.guid_num)
+                    peak = max(peak, len(cached))
+        return peak
+
+    def verify_files(self, file_list: list = None, base_dir: str = '', max_processes: int = 0) -> VerificationResult:
+        """
+        Verify the files against the hashes of the manifest. The files are hashed in a pool of processes.
+        :param file_list: list of (filename, size, sha hash) tuples. If None, the files written by the download will be verified.
+        :param base_dir: folder that contains the files. If empty, the download folder will be used.
+        :param max_processes: maximum number of processes used to hash the files. If 0, the number of CPUs will be used (8 max).
+        :return: result of the verification.
+        """
+        if file_list is None:
+            file_list = self.verification_list
+        base_dir = base_dir or self.download_dir
+        max_processes = max_processes or min(cpu_count(), 8)
+        result = VerificationResult()
+        files_to_hash = []
+        for filename, file_size, file_hash in file_list:
+            full_path = path_join(base_dir, filename)
+            try:
+                size = os.path.getsize(full_path)
+            except FileNotFoundError:
+                result.missing.append(filename)
+                continue
+            except OSError as error:
+                self.logger.warning(f'Could not read "{full_path}": {error!r}')
+                result.failed.append(filename)
+                continue
+            if size != file_size:
+                # no need to hash a file with a wrong size
+                result.mismatched.append(filename)
+            else:
+                files_to_hash.append((filename, full_path, file_size, file_hash))
+        result.checked = len(file_list)
+        if not files_to_hash:
+            return result
+
+        # biggest files first, so the processes finish at about the same time
+        files_to_hash.sort(key=lambda item: item[2], reverse=True)
+        total_size = sum(item[2] for item in files_to_hash) or 1
+        hashed_size = 0
+        last_update = time.time()
+        self.trace_func(f'Verifying {len(files_to_hash)} files ({total_size / 1024 / 1024:.02f} MiB) using {max_processes} processes...')
+        with ProcessPoolExecutor(max_workers=max_processes) as executor:
+            futures = {executor.submit(hash_file, full_path): (filename, file_size, file_hash) for filename, full_path, file_size, file_hash in files_to_hash}
+            for future in as_completed(futures):
+                filename, file_size, file_hash = futures[future]
+                try:
+                    if future.result() != file_hash:
+                        result.mismatched.append(filename)
+                except Exception as error:
+                    self.logger.warning(f'Could not hash "{filename}": {error!r}')
+                    result.failed.append(filename)
+                hashed_size += file_size
+                if time.time() - last_update >= self.update_interval:
+                    last_update = time.time()
+                    self.trace_func(f'= Verification: {hashed_size / total_size * 100:.02f}%')
+        return result
+
+    def release_disk_cache(self, res) -> None:
+        """
+        Update the state of the disk cache file used by a writer task, and delete it if all the pending reads are done.
+        :param res: result of the writer task.
+        """
+        cache_file = res.cache_file
+        if res.flags & TaskFlags.CACHE_CHUNK:
+            # the file can now be read. On failure, the reads will fail and will be logged
+            self.disk_cache_ready.add(cache_file)
+            return
+        with self.shm_lock:
+            self.disk_cache_pending_reads[cache_file] -= 1
+            if res.flags & TaskFlags.RELEASE_MEMORY:
+                self.disk_cache_to_delete.add(cache_file)
+            if self.disk_cache_pending_reads[cache_file] > 0 or cache_file not in self.disk_cache_to_delete:
+                return
+            del self.disk_cache_pending_reads[cache_file]
+            self.disk_cache_to_delete.discard(cache_file)
+            self.disk_cache_ready.discard(cache_file)
+        try:
+            os.remove(path_join(self.cache_dir, cache_file))
+        except OSError as error:
+            self.logger.warning(f'Removing disk cache file failed: {error!r}')
+
+    def get_writer_queue(self, filename: str) -> MPQueue:
+        """
+        Get the queue of the writer process that handles the given file.
+        :param filename: name of the file.
+        :return: queue of the writer.
+
+        Notes:
+            A file and its temporary version (.tmp) are always handled by the same writer, so the tasks for a file are kept in order.
+        """
+        if filename.endswith('.tmp'):
+            filename = filename[:-4]
+        index = zlib.crc32(filename.encode('utf-8')) % len(self.writer_queues)
+        return self.writer_queues[index]
+
+    def release_shared_memory(self, res, shm_cond: Condition) -> None:
+        """
+        Release the shared memory segment used by a writer task if all the pending writes using it are done.
+        :param res: result of the writer task.
+        :param shm_cond: shared memory condition.
+        """
+        offset = res.shared_memory.offset
+        with self.shm_lock:
+            self.shm_pending_writes[offset] -= 1
+            if res.flags & TaskFlags.RELEASE_MEMORY:
+                self.shm_to_release.add(offset)
+            if self.shm_pending_writes[offset] > 0 or offset not in self.shm_to_release:
+                return
+            del self.shm_pending_writes[offset]
+            self.shm_to_release.discard(offset)
+        self.sms.appendleft(res.shared_memory)
+        with shm_cond:
+            shm_cond.notify()
+
     def download_job_manager(self, task_cond: Condition, shm_cond: Condition):
         """
         Download job manager that handles adding download jobs to the queue.
         :param task_cond: task condition.
         :param shm_cond: shared memory condition.
+
+        Notes:
+            The number of jobs in flight is adapted to the throughput and to the errors (see ConcurrencyLimiter).
+            The failed jobs are sent again first, because their chunks are the ones needed soonest by the writers.
+            When all the CDNs are in backoff after some errors, no job is sent until one of them is available again.
         """
-        while self.chunks_to_dl and self.running:
-            while self.active_tasks < self.max_workers * 2 and self.chunks_to_dl:
-                try:
-                    sms = self.sms.popleft()
-                    no_shm = False
-                except IndexError:  # no free cache
-                    no_shm = True
+        # a failed job can be added to retry_tasks after the last chunk has been sent, so this runs until all the results have been handled
+        while self.running and not self.dl_results_handler_done:
+            no_shm = False
+            while self.active_tasks < self.concurrency_limiter.limit and (self.chunks_to_dl or self.retry_tasks):
+                if (wait_time := self.cdn_balancer.get_wait_time()) > 0:
+                    # all the CDNs are in backoff, this pause is shared by all the workers
+                    time.sleep(min(wait_time, 1.0))
                     break
 
-                c_guid = self.chunks_to_dl.popleft()
+                if self.retry_tasks:
+                    res = self.retry_tasks.popleft()
+                    c_guid, sms = res.chunk_guid, res.shm
+                else:
+                    try:
+                        sms = self.sms.popleft()
+                    except IndexError:  # no free cache
+                        no_shm = True
+                        break
+                    c_guid = self.chunks_to_dl.popleft()
+                    res = None
+
                 chunk = self.chunk_data_list.get_chunk_by_guid(c_guid)
                 self.logger.debug(f'Adding {chunk.guid_num} (active: {self.active_tasks})')
+                # the base url is picked for each job, so a failing CDN is not used for all the retries of a chunk
+                base_url = self.cdn_balancer.get_base_url()
+                dl_task = DownloaderTask(url=base_url + '/' + chunk.path, chunk_guid=c_guid, shm=sms, base_url=base_url)
+                if self.verify_chunks:
+                    # the SHA-1 hash is empty in the JSON manifests, the rolling hash is used instead
+                    dl_task.sha_hash = chunk.sha_hash or None
+                    dl_task.rolling_hash = chunk.hash or None
                 try:
-                    self.worker_queue.put(DownloaderTask(url=self.base_url + '/' + chunk.path, chunk_guid=c_guid, shm=sms), timeout=1.0)
+                    self.worker_queue.put(dl_task, timeout=1.0)
                 except Exception as error:
                     self.logger.warning(f'Failed to add to download queue: {error!r}')
-                    self.chunks_to_dl.appendleft(c_guid)
+                    if res is not None:
+                        self.retry_tasks.appendleft(res)
+                    else:
+                        self.chunks_to_dl.appendleft(c_guid)
+                        self.sms.appendleft(sms)
                     break
 
                 self.active_tasks += 1
             else:
-                # active tasks limit hit, wait for tasks to finish
+                # active tasks limit hit (or nothing to send before the pending jobs end), wait for tasks to finish
                 with task_cond:
                     self.logger.debug('Waiting for download tasks to complete...')
                     task_cond.wait(timeout=1.0)
@@ -501,7 +929,22 @@ class DLManager(Process):
         Download result handler that handles adding writer jobs to the queue.
         :param task_cond: task condition.
         """
-        in_buffer = {}
+        # downloaded chunks, as lists of results because a chunk evicted from the disk cache can be downloaded several times
+        in_buffer = defaultdict(deque)
+        # chunks already added to the chunk store by this download
+        stored_guids = set()
+
+        def is_task_ready(chunk_task: ChunkTask) -> bool:
+            """
+            Check if the data of a chunk task is available.
+            :param chunk_task: task to check.
+            :return: True if the data can be written.
+            """
+            if chunk_task.chunk_file or chunk_task.store_file:
+                return True
+            if chunk_task.cache_file and not chunk_task.cache_chunk:
+                return chunk_task.cache_file in self.disk_cache_ready
+            return bool(in_buffer.get(chunk_task.chunk_guid))
 
         try:
             task = self.tasks.popleft()
@@ -512,7 +955,7 @@ class DLManager(Process):
         while task and self.running:
             if isinstance(task, FileTask):  # this wasn't necessarily a good idea...
                 try:
-                    self.writer_queue.put(WriterTask(**task.__dict__), timeout=1.0)
+                    self.get_writer_queue(task.filename).put(WriterTask(**task.__dict__), timeout=1.0)
                     if task.flags & TaskFlags.OPEN_FILE:
                         current_file = task.filename
                 except Exception as error:
@@ -526,14 +969,40 @@ class DLManager(Process):
                     break
                 continue
 
-            while (task.chunk_guid in in_buffer) or task.chunk_file:
+            while is_task_ready(task):
                 res_shm = None
-                if not task.chunk_file:  # not re-using from an old file
-                    res_shm = in_buffer[task.chunk_guid].shm
-
+                flags = TaskFlags.RELEASE_MEMORY if task.cleanup else TaskFlags.NONE
+                cache_file = None
+                cache_chunk_size = 0
+                store_file = task.store_file
+                from_memory = not task.chunk_file and not task.store_file and not (task.cache_file and not task.cache_chunk)
+                if task.cache_file and not task.cache_chunk:  # reading from the disk cache
+                    cache_file = task.cache_file
+                    with self.shm_lock:
+                        self.disk_cache_pending_reads[cache_file] += 1
+                elif from_memory:  # not re-using from an old file
+                    res = in_buffer[task.chunk_guid][0]
+                    res_shm = res.shm
+                    if task.cache_chunk:  # spill the chunk to the disk cache while writing it
+                        flags |= TaskFlags.CACHE_CHUNK
+                        cache_file = task.cache_file
+                        cache_chunk_size = res.size_decompressed
+                    # add the chunk to the chunk store while writing it, only if its hash has been checked: it could be used by other assets
+                    if self.chunk_store and res.verified and task.chunk_guid not in stored_guids:
+                        stored_guids.add(task.chunk_guid)
+                        flags |= TaskFlags.STORE_CHUNK
+                        store_file = self.chunk_store.get_path(ChunkStore.get_key(self.chunk_data_list.get_chunk_by_guid_num(task.chunk_guid)))
+                        cache_chunk_size = res.size_decompressed
+
+                # the chunks written in a temporary file are not journaled, the file is created again from the old one on resume
+                if self.resume_journal and not current_file.endswith('.tmp'):
+                    flags |= TaskFlags.JOURNAL_CHUNK
+                if res_shm:
+                    with self.shm_lock:
+                        self.shm_pending_writes[res_shm.offset] += 1
                 try:
                     self.logger.debug(f'Adding {task.chunk_guid} to writer queue')
-                    self.writer_queue.put(
+                    self.get_writer_queue(current_file).put(
                         WriterTask(
                             filename=current_file,
                             shared_memory=res_shm,
@@ -541,16 +1010,27 @@ class DLManager(Process):
                             chunk_size=task.chunk_size,
                             chunk_guid=task.chunk_guid,
                             old_file=task.chunk_file,
-                            flags=TaskFlags.RELEASE_MEMORY if task.cleanup else TaskFlags.NONE
+                            cache_file=cache_file,
+                            cache_chunk_size=cache_chunk_size,
+                            store_file=store_file,
+                            file_offset=task.file_offset,
+                            flags=flags
                         ),
                         timeout=1.0
                     )
                 except Exception as error:
                     self.logger.warning(f'Adding to queue failed: {error!r}')
+                    with self.shm_lock:
+                        if res_shm:
+                            self.shm_pending_writes[res_shm.offset] -= 1
+                        elif cache_file:
+                            self.disk_cache_pending_reads[cache_file] -= 1
                     break
 
-                if task.cleanup and not task.chunk_file:
-                    del in_buffer[task.chunk_guid]
+                if task.cleanup and from_memory:
+                    in_buffer[task.chunk_guid].popleft()
+                    if not in_buffer[task.chunk_guid]:
+                        del in_buffer[task.chunk_guid]
 
                 try:
                     task = self.tasks.popleft()
@@ -561,31 +1041,40 @@ class DLManager(Process):
                     break
             else:  # only enter blocking code if the loop did not break
                 try:
-                    res = self.result_queue.get(timeout=1)
-                    self.active_tasks -= 1
-                    with task_cond:
-                        task_cond.notify()
-
+                    # don't wait too long if the data will come from the disk cache
+                    res = self.result_queue.get(timeout=0.1 if task.cache_file else 1)
+                    self.cdn_balancer.add_result(res.base_url, res.success, res.size_downloaded or 0, res.download_time or 0.0)
+                    self.concurrency_limiter.add_result(res.success, res.size_downloaded or 0)
+                    if res.verified:
+                        self.num_chunks_verified += 1
                     if res.success:
                         self.logger.debug(f'Download for {res.chunk_guid} succeeded, adding to in_buffer...')
-                        in_buffer[res.chunk_guid] = res
+                        in_buffer[res.chunk_guid].append(res)
                         self.bytes_downloaded_since_last += res.size_downloaded
                         self.bytes_decompressed_since_last += res.size_decompressed
                     else:
-                        self.logger.error(f'Download for {res.chunk_guid} failed, retrying...')
-                        try:
-                            # since the result is a subclass of the task we can simply resubmit the result object
-                            self.worker_queue.put(res, timeout=1.0)
-                            self.active_tasks += 1
-                        except Exception as error:
-                            self.logger.warning(f'Failed adding retry task to queue! {error!r}')
-                            # If this failed for whatever reason, put the chunk at the front of the DL list
-                            self.chunks_to_dl.appendleft(res.chunk_guid)
+                        if res.hash_mismatch:
+                            self.num_chunks_corrupted += 1
+                        self.chunk_retries[res.chunk_guid] += 1
+                        if self.chunk_retries[res.chunk_guid] > self.max_chunk_retries:
+                            # the chunk is needed by the next writes, so the files that use it can't be completed
+                            self.logger.error(f'Download for {res.chunk_guid} failed {self.chunk_retries[res.chunk_guid]} times, stopping the download')
+                            self.failed_chunks.append(res.chunk_guid)
+                            task = None
+                        else:
+                            self.logger.error(f'Download for {res.chunk_guid} failed, retrying...')
+                            # sent again by the download job manager, before the other chunks
+                            self.retry_tasks.append(res)
+                    # decreased after adding the retry, so the download job manager can't see a moment with nothing left to send
+                    self.active_tasks -= 1
+                    with task_cond:
+                        task_cond.notify()
                 except Empty:
                     pass
                 except Exception as error:
                     self.logger.warning(f'Unhandled exception when trying to read download result queue: {error!r}')
 
+        self.dl_results_handler_done = True
         self.logger.debug('Download result handler quitting...')
 
     def fw_results_handler(self, shm_cond: Condition):
@@ -593,34 +1082,43 @@ class DLManager(Process):
         Writer result handler that handles releasing shared memory and writing to the resume file.
         :param shm_cond: shared memory condition.
         """
+        running_writers = len(self.writer_queues)
         while self.running:
             try:
                 res = self.writer_result_queue.get(timeout=1.0)
 
                 if isinstance(res, TerminateWorkerTask):
+                    # each writer sends its own termination task
+                    running_writers -= 1
+                    if running_writers > 0:
+                        continue
                     self.logger.debug('Got termination command in FW result handler')
                     break
 
                 self.num_tasks_processed_since_last += 1
 
-                if res.flags & TaskFlags.CLOSE_FILE and self.resume_file and res.success:
+                if res.flags & (TaskFlags.CLOSE_FILE | TaskFlags.COPY_FILE) and self.resume_journal and res.success:
                     if res.filename.endswith('.tmp'):
                         res.filename = res.filename[:-4]
 
                     file_hash = self.hash_map[res.filename]
-                    # write last completed file to super simple resume file
-                    with open(self.resume_file, 'a', encoding='utf-8') as rf:
-                        rf.write(f'{file_hash}:{res.filename}\n')
+                    # write last completed file to the resume journal
+                    self.resume_journal.add_file(res.filename, file_hash)
+
+                if res.flags & TaskFlags.STORE_CHUNK and res.success:
+                    self.chunk_store.add(ChunkStore.get_key(self.chunk_data_list.get_chunk_by_guid_num(res.chunk_guid)), res.cache_chunk_size)
 
                 if not res.success:
                     # todo make this kill the installation process or at least skip the file and mark it as failed
                     self.logger.critical(f'Writing for {res.filename} failed!')
-                if res.flags & TaskFlags.RELEASE_MEMORY:
-                    self.sms.appendleft(res.shared_memory)
-                    with shm_cond:
-                        shm_cond.notify()
+                if res.shared_memory:
+                    self.release_shared_memory(res, shm_cond)
+                if res.cache_file:
+                    self.release_disk_cache(res)
 
                 if res.chunk_guid:
+                    if res.flags & TaskFlags.JOURNAL_CHUNK and res.success:
+                        self.resume_journal.add_chunk(res.filename, res.file_offset, res.size, res.chunk_guid)
                     self.bytes_written_since_last += res.size
                     # if there's no shared memory we must have read from disk.
                     if not res.shared_memory:
@@ -674,10 +1172,9 @@ class DLManager(Process):
                     child.terminate()
 
             # clean up all the queues, otherwise this process won't terminate properly
-            for name, q in zip(
-                ('Download jobs', 'Writer jobs', 'Download results', 'Writer results'),
-                (self.worker_queue, self.writer_queue, self.result_queue, self.writer_result_queue)
-            ):
+            queues = [('Download jobs', self.worker_queue), ('Download results', self.result_queue), ('Writer results', self.writer_result_queue)]
+            queues.extend((f'Writer jobs {i + 1}', q) for i, q in enumerate(self.writer_queues))
+            for name, q in queues:
                 self.logger.debug(f'Cleaning up queue "{name}"')
                 try:
                     while True:
@@ -703,9 +1200,12 @@ class DLManager(Process):
 
         self.logger.debug(f'Created {len(self.sms)} shared memory segments.')
 
+        if self.resume_file:
+            self.resume_journal = ResumeJournal(self.resume_file, self.download_dir)
+
         # Create queues
         self.worker_queue = MPQueue(-1)
-        self.writer_queue = MPQueue(-1)
+        self.writer_queues = [MPQueue(-1) for _ in range(self.max_writers)]
         self.result_queue = MPQueue(-1)
         self.writer_result_queue = MPQueue(-1)
 
@@ -723,17 +1223,26 @@ class DLManager(Process):
                 self.shared_memory.name,
                 logging_queue=self.logging_queue,
                 timeout=self.timeout,
-                max_retries=3,
+                num_hosts=len(self.cdn_balancer.base_urls),
             )
             self.children.append(w)
             w.start()
 
-        self.trace_func('Starting file writing worker...')
-        writer_p = FileWorker(
-            self.writer_queue, self.writer_result_queue, self.download_dir, self.shared_memory.name, self.cache_dir, self.logging_queue
-        )
-        self.children.append(writer_p)
-        writer_p.start()
+        self.trace_func(f'Starting {self.max_writers} file writing workers...')
+        writers = []
+        for i, writer_queue in enumerate(self.writer_queues):
+            writer_p = FileWorker(
+                writer_queue,
+                self.writer_result_queue,
+                self.download_dir,
+                self.shared_memory.name,
+                self.cache_dir,
+                self.logging_queue,
+                name=f'FileWorker {i + 1}'
+            )
+            writers.append(writer_p)
+            self.children.append(writer_p)
+            writer_p.start()
 
         num_chunk_tasks = sum(isinstance(t, ChunkTask) for t in self.tasks)
         num_dl_tasks = len(self.chunks_to_dl)
@@ -789,7 +1298,8 @@ class DLManager(Process):
             self.bytes_decompressed_since_last = self.num_tasks_processed_since_last = 0
             last_update = time.time()
 
-            perc = (processed_chunks / num_chunk_tasks) * 100
+            # a delta install can have only files to copy, without any chunk
+            perc = (processed_chunks / num_chunk_tasks) * 100 if num_chunk_tasks else (processed_tasks / num_tasks) * 100
             runtime = time.time() - s_time
             total_avail = len(self.sms)
             total_used = (num_shared_memory_segments - total_avail) * (self.analysis.biggest_chunk / 1024 / 1024)
@@ -806,6 +1316,11 @@ class DLManager(Process):
                 hours = minutes = seconds = 0
                 rt_hours = rt_minutes = rt_seconds = 0
 
+            if self.failed_chunks:
+                # the download result handler has stopped, the files using the failed chunks can't be completed
+                self.trace_func(f'{len(self.failed_chunks)} chunks could not be downloaded after {self.max_chunk_retries} retries. The download has been stopped.')
+                break
+
             pw.set_max_value(num_chunk_tasks)
             message = f'Downloaded: {total_dl / 1024 / 1024:.02f} MiB  ({perc:.02f}%)'
             if not pw.update_and_continue(value=processed_chunks, text=message):
@@ -817,9 +1332,19 @@ class DLManager(Process):
             self.trace_func(f'Running for {rt_hours:02d}:{rt_minutes:02d}:{rt_seconds:02d}')
             self.trace_func(f'ETA: {hours:02d}:{minutes:02d}:{seconds:02d}')
             self.trace_func(f' - Downloaded: {total_dl / 1024 / 1024:.02f} MiB,Written: {total_write / 1024 / 1024:.02f} MiB')
-            self.trace_func(f' - Cache usage: {total_used:.02f} MiB, active tasks: {self.active_tasks}')
+            self.trace_func(f' - Cache usage: {total_used:.02f} MiB, active tasks: {self.active_tasks} (limit: {self.concurrency_limiter.limit})')
             self.trace_func(f' + Download\t- {dl_speed / 1024 / 1024:.02f} MiB/s (raw) / {dl_unc_speed / 1024 / 1024:.02f} MiB/s (decompressed)')
             self.trace_func(f' + Disk\t- {w_speed / 1024 / 1024:.02f} MiB/s (write) / {r_speed / 1024 / 1024:.02f} MiB/s (read)')
+            if self.verify_chunks:
+                self.trace_func(f' + Chunks\t- {self.num_chunks_verified} verified / {self.num_chunks_corrupted} corrupted and downloaded again')
+            cdn_stats = self.cdn_balancer.get_stats()
+            if len(cdn_stats) > 1:
+                for stats in cdn_stats:
+                    self.trace_func(
+                        f' + CDN {stats.host}\t- {stats.speed / 1024 / 1024:.02f} MiB/s, {stats.bytes_downloaded / 1024 / 1024:.02f} MiB, '
+                        f'{stats.num_requests} requests, {stats.num_failures} failures'
+                        f'{" (demoted)" if stats.demoted else ""}'
+                    )
 
             # send status update to back to instantiator (if queue exists)
             if self.status_queue:
@@ -830,7 +1355,10 @@ class DLManager(Process):
                             download_speed=dl_unc_speed,
                             write_speed=w_speed,
                             read_speed=r_speed,
-                            memory_usage=total_used * 1024 * 1024
+                            memory_usage=total_used * 1024 * 1024,
+                            chunks_verified=self.num_chunks_verified,
+                            chunks_corrupted=self.num_chunks_corrupted,
+                            cdn_stats=cdn_stats
                         ),
                         timeout=1.0
                     )
@@ -843,12 +1371,14 @@ class DLManager(Process):
             self.worker_queue.put_nowait(TerminateWorkerTask())
 
         self.trace_func('Waiting for installation to finish...')
-        self.writer_queue.put_nowait(TerminateWorkerTask())
+        for writer_queue in self.writer_queues:
+            writer_queue.put_nowait(TerminateWorkerTask())
 
-        writer_p.join(timeout=7)
-        if writer_p.exitcode is None:
-            self.logger.warning(f'Terminating writer process, no exit code!')
-            writer_p.terminate()
+        for writer_p in writers:
+            writer_p.join(timeout=7)
+            if writer_p.exitcode is None:
+                self.logger.warning(f'Terminating writer process {writer_p.name}, no exit code!')
+                writer_p.terminate()
 
         # forcibly kill DL workers that are not actually dead yet
         for child in self.children:
@@ -861,12 +1391,23 @@ class DLManager(Process):
             if t.is_alive():
                 self.logger.warning(f'Thread did not terminate! {t!r}')
 
-        # clean up resume file
-        if self.resume_file:
-            try:
-                os.remove(self.resume_file)
-            except OSError as error:
-                self.logger.warning(f'Failed to remove resume file: {error!r}')
+        # clean up resume file, it's kept if the download has been interrupted
+        if self.resume_journal:
+            self.resume_journal.close()
+            if processed_tasks >= num_tasks:
+                try:
+                    os.remove(self.resume_file)
+                except OSError as error:
+                    self.logger.warning(f'Failed to remove resume file: {error!r}')
+
+        # clean up the disk cache, some files could remain if the download has been cancelled
+        if self.analysis.num_chunks_spilled and os.path.isdir(self.cache_dir):
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith('.chunk'):
+                    try:
+                        os.remove(path_join(self.cache_dir, filename))
+                    except OSError as error:
+                        self.logger.warning(f'Failed to remove disk cache file: {error!r}')
 
         # close up shared memory
         self.shared_memory.close()
@@ -875,8 +1416,8 @@ class DLManager(Process):
         # pw.close_window(destroy_window=True)
         self.trace_func('All done! Download manager quitting...')
         pw.close_window(destroy_window=True)
-        # finally, exit the process.
-        sys.exit(0)
+        # finally, exit the process. The exit code tells the caller if the download has failed
+        sys.exit(1 if self.failed_chunks else 0)
 
     def cancel(self):
         """
@@ -884,4 +1425,5 @@ class DLManager(Process):
         """
         self.logger.warning('User requested immediate exit!. Cancelling queues...')
         self.chunks_to_dl.clear()
+        self.retry_tasks.clear()
         self.tasks.clear()
@@ -0,0 +1,134 @@
+# coding: utf-8
+"""
+Implementation for:
+- ResumeJournal: Append-only journal of the chunk writes and of the completed files of a download, used to resume it.
+"""
+import logging
+import os
+import time
+
+from UEVaultManager.lfs.utils import path_join
+
+
+class ResumeJournal:
+    """
+    Append-only journal of the chunk writes and of the completed files of a download, used to resume it.
+    :param filename: path of the journal file.
+    :param base_path: folder of the downloaded files.
+    :param sync_records: number of records written before syncing the journal to the disk.
+    :param sync_interval: maximal time in seconds between two syncs of the journal, if records have been written.
+
+    Notes:
+        Each line is a record, the journal is never rewritten, only appended:
+        - "hash:filename" for a completed file (the format of the former resume file, so it can still be read),
+        - "+file_offset:size:guid:filename" for a chunk part written in a file, the numbers are in hexadecimal.
+        The records are synced in batches. Before syncing the journal, the files written since the last sync are synced too,
+        so a record on the disk always describes data that is on the disk, even after a power loss.
+        The records after the last sync can be lost. Their chunks are downloaded again, nothing else is lost.
+    """
+    logger = logging.getLogger('ResumeJournal')
+    chunk_prefix = '+'
+
+    def __init__(self, filename: str, base_path: str, sync_records: int = 256, sync_interval: float = 5.0):
+        self.filename: str = filename
+        self.base_path: str = base_path
+        self.sync_records: int = sync_records
+        self.sync_interval: float = sync_interval
+        self._file = open(filename, 'a', encoding='utf-8')
+        # records not written yet, they are only written to the journal after the files they describe are synced
+        self._pending_records: list = []
+        self._files_to_sync: set = set()
+        self._last_sync: float = time.perf_counter()
+
+    @classmethod
+    def read(cls, filename: str) -> (dict, dict):
+        """
+        Read a journal.
+        :param filename: path of the journal file.
+        :return: (dict of the hashes of the completed files by filename, dict of the set of written chunk parts by filename).
+
+        Notes:
+            A written chunk part is a tuple (file_offset, size, guid_num).
+            The chunk parts of the completed files are not returned.
+            A truncated last line (i.e. the application crashed while writing it) is ignored.
+        """
+        completed_files = {}
+        written_parts = {}
+        with open(filename, encoding='utf-8') as file:
+            for line in file:
+                if not line.endswith('\n'):
+                    break
+                line = line[:-1]
+                if line.startswith(cls.chunk_prefix):
+                    try:
+                        file_offset, size, guid_num, part_filename = line[1:].split(':', 3)
+                        part = (int(file_offset, 16), int(size, 16), int(guid_num, 16))
+                    except ValueError:
+                        cls.logger.debug(f'Invalid record in the resume journal: "{line}"')
+                        continue
+                    written_parts.setdefault(part_filename, set()).add(part)
+                else:
+                    file_hash, _, completed_filename = line.partition(':')
+                    completed_files[completed_filename] = file_hash
+        for completed_filename in completed_files:
+            written_parts.pop(completed_filename, None)
+        return completed_files, written_parts
+
+    def add_chunk(self, filename: str, file_offset: int, size: int, guid_num: int) -> None:
+        """
+        Add the record of a chunk part written in a file.
+        :param filename: name of the file, relative to the base path.
+        :param file_offset: offset of the chunk part in the file.
+        :param size: size of the chunk part.
+        :param guid_num: guid of the chunk.
+        """
+        self._files_to_sync.add(filename)
+        self._add_record(f'{self.chunk_prefix}{file_offset:x}:{size:x}:{guid_num:x}:{filename}\n')
+
+    def add_file(self, filename: str, file_hash: str) -> None:
+        """
+        Add the record of a completed file.
+        :param filename: name of the file, relative to the base path.
+        :param file_hash: hash of the file, as an hexadecimal string.
+        """
+        self._files_to_sync.add(filename)
+        self._add_record(f'{file_hash}:{filename}\n')
+
+    def _add_record(self, record: str) -> None:
+        """
+        Add a record and sync the journal if needed.
+        :param record: line to add to the journal.
+        """
+        self._pending_records.append(record)
+        if len(self._pending_records) >= self.sync_records or time.perf_counter() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        """
+        Sync the files written since the last sync, then the journal.
+        """
+        if not self._pending_records:
+            return
+        for filename in self._files_to_sync:
+            try:
+                # the data written by the other processes is synced too, fsync flushes the whole file and not only this descriptor
+                with open(path_join(self.base_path, filename), 'r+b') as file:
+                    os.fsync(file.fileno())
+            except OSError as error:
+                # the file has been renamed or deleted since, its records will be ignored on resume
+                self.logger.debug(f'Failed to sync {filename}: {error!r}')
+        self._file.write(''.join(self._pending_records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._files_to_sync.clear()
+        self._pending_records.clear()
+        self._last_sync = time.perf_counter()
+
+    def close(self) -> None:
+        """
+        Sync and close the journal.
+        """
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
@@ -3,21 +3,27 @@
 Implementation for:
 - DLWorker: Downloads chunks from the internet and writes them to the shared memory segment.
 - FileWorker: Writes chunks to files.
+- hash_file: Get the SHA-1 hash of a file.
 """
 import logging
+import mmap
 import os
+import shutil
 import time
+from hashlib import sha1
 from logging.handlers import QueueHandler
 from multiprocessing import Process
 from multiprocessing.shared_memory import SharedMemory
 from queue import Empty
 
 import requests
+from requests.adapters import HTTPAdapter
 
 import UEVaultManager.tkgui.modules.globals as gui_g  # using the shortest variable name for globals for convenience
 from UEVaultManager.lfs.utils import path_join
 from UEVaultManager.models.ChunkClass import Chunk
 from UEVaultManager.models.downloading import (DownloaderTask, DownloaderTaskResult, TaskFlags, TerminateWorkerTask, WriterTask, WriterTaskResult)
+from UEVaultManager.utils.rolling_hash import get_hash
 
 
 class DLWorker(Process):
@@ -27,18 +33,25 @@ class DLWorker(Process):
     :param queue: queue to get jobs from.
     :param out_queue: queue to put results in.
     :param shm: name of the shared memory segment to write to.
-    :param max_retries: maximum number of retries for a chunk.
     :param logging_queue: queue to send log messages to.
     :param timeout: timeout for the request. Could be a float or a tuple of float (connect timeout, read timeout).
+    :param num_hosts: number of CDN hosts the chunks are downloaded from.
+
+    Notes:
+        The session keeps a persistent connection to each CDN host. A worker does one request at a time, so one connection per host is enough.
+        Each job is tried once. The failed jobs are sent again by the download manager, with a backoff shared by all the workers.
     """
 
-    def __init__(self, name, queue, out_queue, shm, max_retries=7, logging_queue=None, timeout=(7, 7)):
+    def __init__(self, name, queue, out_queue, shm, logging_queue=None, timeout=(7, 7), num_hosts=1):
         super().__init__(name=name)
         self.q = queue
         self.o_q = out_queue
         self.session = requests.session()
         self.session.headers.update({'User-Agent': 'EpicGamesLauncher/11.0.1-14907503+++Portal+Release-Live Windows/10.0.19041.1.256.64bit'})
-        self.max_retries = max_retries
+        # the retries are done by the download manager
+        adapter = HTTPAdapter(pool_connections=max(num_hosts, 1), pool_maxsize=1, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.shm = SharedMemory(name=shm)
         self.log_level = logging.getLogger().level
         self.logging_queue = logging_queue
@@ -72,44 +85,30 @@ class DLWorker(Process):
                 logger.debug('Worker received termination signal, shutting down...')
                 break
 
-            tries = 0
             compressed = 0
             chunk = None
+            start_time = time.perf_counter()
 
             try:
-                while tries < self.max_retries:
-                    if gui_g.WindowsRef.progress and not gui_g.WindowsRef.progress.continue_execution:
-                        logger.warning('Stop button has been pressed, exit requested, quitting...')
-                        break
-                    # retry once immediately, otherwise do exponential backoff
-                    if tries > 1:
-                        sleep_time = 2 ** (tries - 1)
-                        logger.info(f'Sleeping {sleep_time} seconds before retrying.')
-                        time.sleep(sleep_time)
-
+                if gui_g.WindowsRef.progress and not gui_g.WindowsRef.progress.continue_execution:
+                    logger.warning('Stop button has been pressed, exit requested, quitting...')
+                else:
                     # print('Downloading', job.url)
                     logger.debug(f'Downloading {job.url}')
-
-                    try:
-                        r = self.session.get(job.url, timeout=self.timeout)
-                        r.raise_for_status()
-                    except Exception as error:
-                        logger.warning(f'Chunk download for {job.chunk_guid} failed: ({error!r}), retrying...')
-                        continue
-
+                    r = self.session.get(job.url, timeout=self.timeout)
+                    r.raise_for_status()
                     if r.status_code != 200:
-                        logger.warning(f'Chunk download for {job.chunk_guid} failed: status {r.status_code}, retrying...')
-                        continue
-                    else:
-                        compressed = len(r.content)
-                        chunk = Chunk.read_buffer(r.content)
-                        break
-                else:
-                    raise TimeoutError('Max retries reached')
+                        raise ValueError(f'Unexpected status {r.status_code}')
+                    compressed = len(r.content)
+                    download_time = time.perf_counter() - start_time
+                    # the chunk keeps a view on the downloaded data, no copy is made until decompressing it
+                    chunk = Chunk.read_view(r.content)
             except Exception as error:
                 logger.error(f'Job for {job.chunk_guid} failed with: {error!r}, fetching next one...')
                 # add failed job to result queue to be requeued
+                # only one result by job, two retries of the same job would use the same shared memory segment
                 self.o_q.put(DownloaderTaskResult(success=False, **job.__dict__))
+                continue
             except KeyboardInterrupt:
                 logger.warning('Immediate exit requested, quitting...')
                 break
@@ -119,15 +118,39 @@ class DLWorker(Process):
                 self.o_q.put(DownloaderTaskResult(success=False, **job.__dict__))
                 continue
 
-            # decompress stuff
+            # decompress stuff, directly into the shared memory segment
             try:
-                size = len(chunk.data)
-                if size > job.shm.size:
-                    logger.critical('Downloaded chunk is longer than SharedMemorySegment!')
-
-                self.shm.buf[job.shm.offset:job.shm.offset + size] = bytes(chunk.data)
+                with self.shm.buf[job.shm.offset:job.shm.offset + job.shm.size] as target:
+                    try:
+                        size = chunk.decompress_into(target)
+                    except ValueError:
+                        logger.critical('Downloaded chunk is longer than SharedMemorySegment!')
+                        raise
+                    # check the chunk in place, the hash functions read the shared memory without copying it
+                    verified = is_valid = False
+                    if job.sha_hash:
+                        with target[:size] as data:
+                            is_valid = sha1(data).digest() == job.sha_hash
+                        verified = True
+                    elif job.rolling_hash:
+                        with target[:size] as data:
+                            is_valid = get_hash(data) == job.rolling_hash
+                        verified = True
                 del chunk
-                self.o_q.put(DownloaderTaskResult(success=True, size_decompressed=size, size_downloaded=compressed, **job.__dict__))
+                if verified and not is_valid:
+                    logger.error(f'Hash of chunk {job.chunk_guid} does not match the manifest, it will be downloaded again')
+                    self.o_q.put(DownloaderTaskResult(success=False, verified=True, hash_mismatch=True, **job.__dict__))
+                    continue
+                self.o_q.put(
+                    DownloaderTaskResult(
+                        success=True,
+                        size_decompressed=size,
+                        size_downloaded=compressed,
+                        verified=verified,
+                        download_time=download_time,
+                        **job.__dict__
+                    )
+                )
             except Exception as error:
                 logger.warning(f'Job for {job.chunk_guid} failed with: {error!r}, fetching next one...')
                 self.o_q.put(DownloaderTaskResult(success=False, **job.__dict__))
@@ -148,10 +171,14 @@ class FileWorker(Process):
     :param shm: name of the shared memory segment to read from.
     :param cache_path: path to the cache directory.
     :param logging_queue: queue to send log messages to.
+    :param name: name of the worker process.
+
+    Notes:
+        Several FileWorkers can run at the same time. All the tasks for a given file must be sent to the same worker to keep their order.
     """
 
-    def __init__(self, queue, out_queue, base_path, shm, cache_path=None, logging_queue=None):
-        super().__init__(name='FileWorker')
+    def __init__(self, queue, out_queue, base_path, shm, cache_path=None, logging_queue=None, name='FileWorker'):
+        super().__init__(name=name)
         self.q = queue
         self.o_q = out_queue
         self.base_path = base_path
@@ -175,6 +202,8 @@ class FileWorker(Process):
 
         last_filename = ''
         current_file = None
+        # whether the current file has been opened to complete the file written by an interrupted download
+        resuming_file = False
         # noinspection PyTypeChecker
         j = None
         while True:
@@ -196,7 +225,8 @@ class FileWorker(Process):
                 # make directories if required
                 path = os.path.split(j.filename)[0]
                 if not os.path.exists(path_join(self.base_path, path)):
-                    os.makedirs(path_join(self.base_path, path))
+                    # exist_ok because another writer could have created it in the meantime
+                    os.makedirs(path_join(self.base_path, path), exist_ok=True)
 
                 full_path = path_join(self.base_path, j.filename)
 
@@ -209,7 +239,9 @@ class FileWorker(Process):
                         logger.warning(f'Opening new file {j.filename} without closing previous! {last_filename}')
                         current_file.close()
 
-                    current_file = open(full_path, 'wb')
+                    resuming_file = bool(j.flags & TaskFlags.RESUME_FILE) and os.path.exists(full_path)
+                    # keep the chunks already written when resuming
+                    current_file = open(full_path, 'r+b' if resuming_file else 'wb')
                     last_filename = j.filename
 
                     self.o_q.put(WriterTaskResult(success=True, **j.__dict__))
@@ -243,6 +275,22 @@ class FileWorker(Process):
                         self.o_q.put(WriterTaskResult(success=False, **j.__dict__))
                         continue
 
+                    self.o_q.put(WriterTaskResult(success=True, **j.__dict__))
+                    continue
+                elif j.flags & TaskFlags.COPY_FILE:
+                    if current_file:
+                        logger.warning('Trying to copy file without closing first!')
+                        current_file.close()
+                        current_file = None
+
+                    try:
+                        # the file is identical in another installed release
+                        shutil.copyfile(path_join(self.base_path, j.old_file), full_path)
+                    except OSError as error:
+                        logger.error(f'Copying file failed: {error!r}')
+                        self.o_q.put(WriterTaskResult(success=False, **j.__dict__))
+                        continue
+
                     self.o_q.put(WriterTaskResult(success=True, **j.__dict__))
                     continue
                 elif j.flags & TaskFlags.DELETE_FILE:
@@ -276,20 +324,51 @@ class FileWorker(Process):
                     continue
 
                 try:
+                    if resuming_file and current_file.tell() != j.file_offset:
+                        # skip the chunk parts already written
+                        current_file.seek(j.file_offset)
+                    if j.flags & TaskFlags.CACHE_CHUNK:
+                        # spill the whole chunk to the disk cache, its next uses will read it from there
+                        os.makedirs(self.cache_path, exist_ok=True)
+                        with open(path_join(self.cache_path, j.cache_file), 'wb') as cache_file:
+                            with self.shm.buf[j.shared_memory.offset:j.shared_memory.offset + j.cache_chunk_size] as chunk_view:
+                                cache_file.write(chunk_view)
+                    if j.flags & TaskFlags.STORE_CHUNK:
+                        # add the whole chunk to the chunk store, the file is renamed when complete so the store never has a partial chunk
+                        try:
+                            os.makedirs(os.path.dirname(j.store_file), exist_ok=True)
+                            with open(j.store_file + '.tmp', 'wb') as store_file:
+                                with self.shm.buf[j.shared_memory.offset:j.shared_memory.offset + j.cache_chunk_size] as chunk_view:
+                                    store_file.write(chunk_view)
+                            os.replace(j.store_file + '.tmp', j.store_file)
+                        except OSError as error:
+                            # the store is only an optimization, the file is written anyway
+                            logger.warning(f'Failed to add chunk {j.chunk_guid} to the chunk store: {error!r}')
+                            j.flags &= ~TaskFlags.STORE_CHUNK
                     if j.shared_memory:
                         shm_offset = j.shared_memory.offset + j.chunk_offset
                         shm_end = shm_offset + j.chunk_size
-                        current_file.write(self.shm.buf[shm_offset:shm_end].tobytes())
+                        # write directly from the shared memory, without copying the data
+                        with self.shm.buf[shm_offset:shm_end] as chunk_view:
+                            current_file.write(chunk_view)
                     elif j.cache_file:
                         with open(path_join(self.cache_path, j.cache_file), 'rb') as file:
-                            if j.chunk_offset:
-                                file.seek(j.chunk_offset)
-                            current_file.write(file.read(j.chunk_size))
+                            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                                with memoryview(mapped_file)[j.chunk_offset:j.chunk_offset + j.chunk_size] as chunk_view:
+                                    current_file.write(chunk_view)
+                    elif j.store_file:
+                        with open(j.store_file, 'rb') as file:
+                            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                                with memoryview(mapped_file)[j.chunk_offset:j.chunk_offset + j.chunk_size] as chunk_view:
+                                    current_file.write(chunk_view)
                     elif j.old_file:
                         with open(path_join(self.base_path, j.old_file), 'rb') as file:
                             if j.chunk_offset:
                                 file.seek(j.chunk_offset)
                             current_file.write(file.read(j.chunk_size))
+                    if j.flags & TaskFlags.JOURNAL_CHUNK:
+                        # the chunk is journaled when its result is received, its data must not stay in the buffer of this process
+                        current_file.flush()
                 except Exception as error:
                     logger.warning(f'Something in writing a file failed: {error!r}')
                     self.o_q.put(WriterTaskResult(success=False, size=j.chunk_size, **j.__dict__))
@@ -310,3 +389,25 @@ class FileWorker(Process):
                 if current_file:
                     current_file.close()
                 return
+
+
+def hash_file(filename: str, read_size: int = 8 * 1024 * 1024) -> str:
+    """
+    Get the SHA-1 hash of a file. Used to verify the installed files in a pool of processes.
+    :param filename: path of the file.
+    :param read_size: size of the blocks read when the file can't be mapped in memory.
+    :return: hash of the file as an hexadecimal string.
+    """
+    hasher = sha1()
+    with open(filename, 'rb') as file:
+        try:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                hasher.update(mapped_file)
+        except ValueError:
+            # empty files can't be mapped, nothing to hash
+            pass
+        except OSError:
+            # mmap is not available for this file (network drive...), read it by big blocks instead
+            for block in iter(lambda: file.read(read_size), b''):
+                hasher.update(block)
+    return hasher.hexdigest()
@@ -0,0 +1,214 @@
+# coding: utf-8
+"""
+Implementation for:
+- AssetStore: Store of the raw json data of the assets, packed in a single SQLite file by folder.
+"""
+import json
+import logging
+import os
+import sqlite3
+from threading import Lock
+from typing import Iterator, Optional
+
+from UEVaultManager.lfs.utils import path_join, path_join_resolved
+
+try:
+    # faster than the json module to decode the data, used if installed
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+
+class AssetStore:
+    """
+    Store of the raw json data of the assets, packed in a single SQLite file by folder.
+    :param folder: folder of the store. It's also the folder of the json files to migrate into the store.
+    :param batch_size: number of assets added before the changes are committed.
+
+    Notes:
+        It replaces the json file by asset that were saved in the folder (tens of thousands of small files, slow to list, to read and to back up).
+        The data of an asset are read by its app_name with an index lookup.
+        The json files saved in the folder by the former versions are only imported by an explicit call to migrate_json_files().
+        Use get_store() to get the store of a folder. The same object is shared by all the callers, it's thread safe.
+    """
+    logger = logging.getLogger('AssetStore')
+    filename = 'assets_data.db'
+    # json files of the folder that are not asset data
+    excluded_files = ('last_run.json', )
+    _stores: dict = {}
+    _stores_lock = Lock()
+
+    def __init__(self, folder: str, batch_size: int = 500):
+        self.folder: str = folder
+        self.batch_size: int = batch_size
+        self.db_path: str = path_join(folder, self.filename)
+        self._pending_count: int = 0
+        self._lock = Lock()
+        os.makedirs(folder, exist_ok=True)
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS assets_data (app_name TEXT PRIMARY KEY, data BLOB NOT NULL) WITHOUT ROWID')
+        self._connection.commit()
+
+    @classmethod
+    def get_store(cls, folder: str) -> 'AssetStore':
+        """
+        Get the store of a folder, open it if needed.
+        :param folder: folder of the store.
+        :return: AssetStore object.
+        """
+        folder = path_join_resolved(folder)
+        with cls._stores_lock:
+            store = cls._stores.get(folder)
+            if store is None:
+                store = cls(folder)
+                cls._stores[folder] = store
+            return store
+
+    @classmethod
+    def close_all(cls) -> None:
+        """
+        Close all the opened stores.
+        """
+        with cls._stores_lock:
+            for store in cls._stores.values():
+                store.close()
+            cls._stores.clear()
+
+    def migrate_json_files(self) -> int:
+        """
+        Import the json files of the folder into the store and delete them.
+        :return: number of imported files.
+
+        Notes:
+            The name of the file, without extension, is used as app_name, as it was the key used to read the files.
+            The invalid files are kept in the folder.
+        """
+        imported_files = []
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json') or entry.name in self.excluded_files or not entry.is_file():
+                    continue
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as file:
+                        data = json.load(file)
+                except (OSError, json.decoder.JSONDecodeError) as error:
+                    self.logger.warning(f'The file "{entry.path}" could not be imported into the asset store: {error!r}')
+                    continue
+                self.put(entry.name[:-len('.json')], data)
+                imported_files.append(entry.path)
+        if not imported_files:
+            return 0
+        self.commit()
+        # the files are only deleted when their data have been committed
+        for filename in imported_files:
+            try:
+                os.remove(filename)
+            except OSError as error:
+                self.logger.debug(f'Failed to delete {filename}: {error!r}')
+        self.logger.info(f'{len(imported_files)} json files have been imported into {self.db_path}')
+        return len(imported_files)
+
+    def put(self, app_name: str, data: dict) -> None:
+        """
+        Add or replace the data of an asset.
+        :param app_name: app_name of the asset.
+        :param data: json data of the asset.
+        """
+        blob = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO assets_data (app_name, data) VALUES (?, ?)', (app_name, blob))
+            self._pending_count += 1
+            if self._pending_count >= self.batch_size:
+                self._commit()
+
+    def get(self, app_name: str) -> Optional[dict]:
+        """
+        Get the data of an asset.
+        :param app_name: app_name of the asset.
+        :return: json data of the asset, or None if it's not in the store.
+        """
+        with self._lock:
+            row = self._connection.execute('SELECT data FROM assets_data WHERE app_name = ?', (app_name, )).fetchone()
+        return self.decode(row[0]) if row else None
+
+    @staticmethod
+    def decode(blob: bytes) -> dict:
+        """
+        Decode the data of an asset, as stored in the store.
+        :param blob: encoded json data.
+        :return: json data.
+        """
+        return json_loads(blob)
+
+    def iter_raw_batches(self, batch_size: int = 0) -> Iterator[list]:
+        """
+        Iterate over the encoded data of all the assets in the store, by batches.
+        :param batch_size: number of assets by batch. If 0, the batch_size of the store is used.
+        :return: iterator of lists of (app_name, encoded json data).
+
+        Notes:
+            The rows are read in batches, so all the data are not loaded in memory at once.
+            The data are not decoded, so the batches can be sent to other processes at a low cost. Use decode() to get the json data.
+        """
+        batch_size = batch_size or self.batch_size
+        last_app_name = ''
+        while True:
+            with self._lock:
+                rows = self._connection.execute(
+                    'SELECT app_name, data FROM assets_data WHERE app_name > ? ORDER BY app_name LIMIT ?', (last_app_name, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            yield rows
+            last_app_name = rows[-1][0]
+
+    def iter_data(self) -> Iterator[tuple]:
+        """
+        Iterate over the data of all the assets in the store.
+        :return: iterator of (app_name, json data).
+        """
+        for rows in self.iter_raw_batches():
+            for app_name, blob in rows:
+                yield app_name, self.decode(blob)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM assets_data').fetchone()[0]
+
+    def _commit(self) -> None:
+        """
+        Commit the pending changes. The lock must be held.
+        """
+        if self._pending_count:
+            self._connection.commit()
+            self._pending_count = 0
+
+    def commit(self) -> None:
+        """
+        Commit the pending changes.
+        """
+        with self._lock:
+            self._commit()
+
+    def export_to_file(self, app_name: str, filename: str) -> bool:
+        """
+        Export the data of an asset to a json file.
+        :param app_name: app_name of the asset.
+        :param filename: name of the json file to create.
+        :return: True if the asset has been found and exported, False otherwise.
+        """
+        data = self.get(app_name)
+        if data is None:
+            return False
+        with open(filename, 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=2)
+        return True
+
+    def close(self) -> None:
+        """
+        Commit the pending changes and close the store.
+        """
+        with self._lock:
+            self._commit()
+            self._connection.close()
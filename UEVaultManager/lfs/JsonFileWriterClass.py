@@ -0,0 +1,131 @@
+# coding: utf-8
+"""
+Implementation for:
+- JsonFileWriter: Writer of a json file that only saves the data when they have changed, with atomic writes and optional delayed saves.
+"""
+import json
+import logging
+import os
+from contextlib import contextmanager
+from threading import RLock, Timer
+from typing import Iterator
+
+
+class JsonFileWriter:
+    """
+    Writer of a json file that only saves the data when they have changed, with atomic writes and optional delayed saves.
+    :param filename: json file to write.
+    :param owner: object that holds the data to save.
+    :param attribute: name of the attribute of the owner that holds the data. It's read on each save, so the data object can be replaced by the owner.
+    :param save_delay: delay in seconds between a change and the save of the file. If 0, the file is saved on each change.
+
+    Notes:
+        Call set_changed() after each change of the data, and flush() to save the file at once.
+        Inside a batch() block, the saves are grouped and the file is only saved once, when the outermost block ends.
+        With a save_delay, the changes made during the delay are saved together by a timer thread. Call flush() before exiting.
+        The file is written in a temporary file that replaces the previous one, so it's never left partially written.
+        The object can be pickled (with its owner), the lock and the timer are created again and the pending changes are left to the original object.
+    """
+    logger = logging.getLogger('JsonFileWriter')
+
+    def __init__(self, filename: str, owner, attribute: str, save_delay: float = 0.):
+        self.filename: str = filename
+        self.owner = owner
+        self.attribute: str = attribute
+        self.save_delay: float = save_delay
+        self._has_changed: bool = False
+        self._batch_level: int = 0
+        self._timer = None
+        self._lock = RLock()
+
+    def __getstate__(self) -> dict:
+        """
+        Get the state of the object to pickle it.
+        :return: state of the object, without the lock and the timer that can't be pickled.
+        """
+        state = self.__dict__.copy()
+        del state['_lock']
+        del state['_timer']
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Set the state of the object when unpickled, with a new lock and no pending change.
+        :param state: state of the object.
+        """
+        self.__dict__.update(state)
+        self._has_changed = False
+        self._batch_level = 0
+        self._timer = None
+        self._lock = RLock()
+
+    def set_changed(self) -> None:
+        """
+        Mark the data as changed. Save the file now, or later when in a batch() block or with a save_delay.
+        """
+        with self._lock:
+            self._has_changed = True
+            if self._batch_level == 0:
+                self._schedule_save()
+
+    def _schedule_save(self) -> None:
+        """
+        Save the file now if there is no save_delay, otherwise start the timer that will save it. The lock must be held.
+        """
+        if self.save_delay <= 0:
+            self.flush()
+        elif self._timer is None:
+            self._timer = Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        Context manager that groups the saves of the changes made inside the block.
+        """
+        with self._lock:
+            self._batch_level += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._batch_level -= 1
+                if self._batch_level == 0 and self._has_changed:
+                    self._schedule_save()
+
+    def flush(self) -> bool:
+        """
+        Save the file if the data have changed.
+        :return: True if the file has been saved.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._has_changed:
+                return False
+            data = getattr(self.owner, self.attribute)
+            if data is None:
+                self._has_changed = False
+                return False
+            try:
+                content = json.dumps(data, indent=2, sort_keys=True)
+            except RuntimeError as error:
+                # the data have been changed by another thread during the serialization (only possible with a save_delay), retry later
+                self.logger.debug(f'Failed to serialize the data for {self.filename}: {error!r}')
+                if self.save_delay > 0:
+                    self._schedule_save()
+                return False
+            tmp_filename = self.filename + '.tmp'
+            try:
+                with open(tmp_filename, 'w', encoding='utf-8') as file:
+                    file.write(content)
+                    file.flush()
+                    os.fsync(file.fileno())
+                os.replace(tmp_filename, self.filename)
+            except OSError as error:
+                self.logger.warning(f'Failed to save {self.filename}: {error!r}')
+                return False
+            self._has_changed = False
+            return True
@@ -3,18 +3,23 @@
 Implementation for:
 - UEVMLFS: Local File System.
 """
+import atexit
 import filecmp
 import json
 import logging
 import os
+from contextlib import contextmanager
 from datetime import datetime
 from time import time
-from typing import Optional
+from typing import Iterator, Optional
 
 import UEVaultManager.tkgui.modules.functions_no_deps as gui_fn  # using the shortest variable name for globals for convenience
 import UEVaultManager.tkgui.modules.globals as gui_g  # using the shortest variable name for globals for convenience
+from UEVaultManager.lfs.AssetStoreClass import AssetStore
+from UEVaultManager.lfs.JsonFileWriterClass import JsonFileWriter
 from UEVaultManager.lfs.utils import clean_filename, generate_label_from_path
-from UEVaultManager.lfs.utils import path_join
+from UEVaultManager.lfs.utils import path_join, path_join_resolved
+from UEVaultManager.lfs.VaultCacheScannerClass import VaultCacheScanner
 from UEVaultManager.models.AppConfigClass import AppConfig
 from UEVaultManager.models.Asset import InstalledAsset
 from UEVaultManager.models.types import DateFormat
@@ -22,7 +27,7 @@ from UEVaultManager.models.UEAssetDbHandlerClass import UEAssetDbHandler
 from UEVaultManager.tkgui.modules.cls.FilterValueClass import FilterValue, FilterValueEncoder
 from UEVaultManager.tkgui.modules.functions import create_file_backup
 from UEVaultManager.tkgui.modules.functions_no_deps import check_and_convert_list_to_str, create_uid, merge_lists_or_strings
-from UEVaultManager.utils.cli import check_and_create_file
+from UEVaultManager.utils.cli import check_and_create_file, get_max_threads
 from UEVaultManager.utils.env import is_windows_mac_or_pyi
 
 
@@ -36,7 +41,7 @@ class UEVMLFS:
         self.logger = logging.getLogger('UEVMLFS')
 
         if config_path := os.environ.get('XDG_CONFIG_HOME'):
-            self.path = path_join(config_path, 'UEVaultManager')
+            self.path = path_join_resolved(config_path, 'UEVaultManager')
         else:
             self.path = os.path.expanduser('~/.config/UEVaultManager')
         # EGS user info
@@ -77,6 +82,8 @@ class UEVMLFS:
         self.asset_sizes_filename: str = path_join(self.json_files_folder, 'asset_sizes.json')
         # filename for storing the catalog item ids of all the (owned) items (assets and games) of the user library
         self.library_catalog_ids_filename: str = path_join(self.json_files_folder, 'library_catalog_ids.json')
+        # filename for the index of the folders scanned in the vault cache
+        self.vault_cache_index_filename: str = path_join(self.json_files_folder, 'vault_cache_index.json')
 
         # ensure folders exist.
         for f in ['', self.manifests_folder, self.tmp_folder, self.json_files_folder]:
@@ -115,6 +122,36 @@ class UEVMLFS:
             )
             self.config.set('UEVaultManager', 'max_workers', '8')
             has_changed = True
+        if not self.config.has_option('UEVaultManager', 'max_writers'):
+            self.config.set(
+                'UEVaultManager', '; maximum number of processes writing the files when downloading (0 for automatic, more can be faster on SSD)'
+            )
+            self.config.set('UEVaultManager', 'max_writers', '0')
+            has_changed = True
+        if not self.config.has_option('UEVaultManager', 'max_disk_cache'):
+            self.config.set(
+                'UEVaultManager', '; maximum size in MiB of the disk cache used when max_memory is too small to keep the chunks (0 to disable)'
+            )
+            self.config.set('UEVaultManager', 'max_disk_cache', '10240')
+            has_changed = True
+        if not self.config.has_option('UEVaultManager', 'verify_chunks'):
+            self.config.set('UEVaultManager', '; set to false to not check the hash of the downloaded chunks')
+            self.config.set('UEVaultManager', 'verify_chunks', 'true')
+            has_changed = True
+        if not self.config.has_option('UEVaultManager', 'compact_manifests'):
+            self.config.set('UEVaultManager', '; set to true to store the manifests in arrays, uses less memory for the assets with a lot of files')
+            self.config.set('UEVaultManager', 'compact_manifests', 'false')
+            has_changed = True
+        if not self.config.has_option('UEVaultManager', 'chunk_store_size'):
+            self.config.set(
+                'UEVaultManager', '; maximum size in MiB of the store of the chunks shared by all the downloads, the chunks found there are not downloaded again (0 to disable)'
+            )
+            self.config.set('UEVaultManager', 'chunk_store_size', '0')
+            has_changed = True
+        if not self.config.has_option('UEVaultManager', 'chunk_store_folder'):
+            self.config.set('UEVaultManager', '; folder of the chunk store. If empty, the "chunk_store" folder in the folder of the configuration is used')
+            self.config.set('UEVaultManager', 'chunk_store_folder', '')
+            has_changed = True
         if not self.config.has_option('UEVaultManager', 'locale'):
             self.config.set('UEVaultManager', '; locale override, must be in RFC 1766 format (e.g. "en-US")')
             self.config.set('UEVaultManager', 'locale', 'en-US')
@@ -160,6 +197,12 @@ class UEVMLFS:
             self.config.set('UEVaultManager', '; Set to True to print more information during long operations')
             self.config.set('UEVaultManager', 'verbose_mode', 'False')
             has_changed = True
+        if not self.config.has_option('UEVaultManager', 'json_save_delay'):
+            self.config.set(
+                'UEVaultManager', '; delay in seconds to group the saves of the installed assets and asset sizes files (0 to save them on each change)'
+            )
+            self.config.set('UEVaultManager', 'json_save_delay', '0')
+            has_changed = True
         if not self.config.has_option('UEVaultManager', 'scrap_assets_filename_log'):
             self.config.set(
                 'UEVaultManager', '; File name (and path) to log issues with assets when running the list or scrap commands' + "\n" +
@@ -186,10 +229,20 @@ class UEVMLFS:
         if has_changed:
             self.save_config()
 
+        # the installed assets and asset sizes files are only saved when their data have changed, see JsonFileWriter
+        save_delay = self.config.getfloat('UEVaultManager', 'json_save_delay', fallback=0.)
+        self._installed_assets_writer = JsonFileWriter(self.installed_asset_filename, self, '_installed_assets', save_delay)
+        self._asset_sizes_writer = JsonFileWriter(self.asset_sizes_filename, self, '_asset_sizes', save_delay)
+        if save_delay > 0:
+            atexit.register(self.flush_json_files)
+
         # load existing installed assets
         self._installed_assets = {}
         self.load_installed_assets()
 
+        # import the asset data saved in json files by the former versions
+        self.migrate_assets_data_files()
+
         # TOOBIG
         # load existing assets metadata
         # data_folder = gui_g.s.assets_data_folder
@@ -279,8 +332,7 @@ class UEVMLFS:
         :param asset_sizes: asset sizes.
         """
         self._asset_sizes = asset_sizes
-        with open(self.asset_sizes_filename, 'w', encoding='utf-8') as file:
-            json.dump(self._asset_sizes, file, indent=2, sort_keys=True)
+        self._asset_sizes_writer.set_changed()
 
     @property
     def library_catalog_ids(self):
@@ -462,9 +514,20 @@ class UEVMLFS:
         }
         return data_to_uevm_format
 
+    @staticmethod
+    def migrate_assets_data_files() -> int:
+        """
+        Import the json files of the asset data folders into their asset stores.
+        :return: number of imported files.
+
+        Notes:
+            Only the folders of the asset data are migrated. The json files of the other folders (i.e. the ratings) are kept as is.
+        """
+        return sum(AssetStore.get_store(folder).migrate_json_files() for folder in (gui_g.s.assets_data_folder, gui_g.s.owned_assets_data_folder))
+
     def get_asset(self, app_name: str, owned_assets_only=False) -> (dict, str):
         """
-        Load JSON data from a file.
+        Load JSON data from the asset store.
         :param app_name: name of the asset to load the data from.
         :param owned_assets_only: whether only the owned assets are scraped.
         :return: dictionary containing the loaded data.
@@ -473,22 +536,16 @@ class UEVMLFS:
             Mainly used when manipulating assets in the "old" format (I.E. when using ClI methods), like install_asset(), info() and list_files()
         """
         folder = gui_g.s.owned_assets_data_folder if owned_assets_only else gui_g.s.assets_data_folder
-        filename = app_name + '.json'
         json_data_uevm = {}
         message = ''
-        full_filename = path_join(folder, filename)
-        if not os.path.isfile(full_filename):
-            message = f'The json file "{filename}" to get data from does not exist.\nTry to scrap the asset first.'
+        json_data = AssetStore.get_store(folder).get(app_name)
+        if json_data is None:
+            message = f'The data of "{app_name}" are not in the asset store.\nTry to scrap the asset first.'
         else:
-            with open(full_filename, 'r', encoding='utf-8') as file:
-                try:
-                    json_data = json.load(file)
-                except json.decoder.JSONDecodeError as error:
-                    message = f'The following error occured when loading data from {filename}:{error!r}'
-                # we need to add the appName  (i.e. assetId) to the data because it can't be found INSIDE the json data
-                # it needed by the json_data_mapping() method
-                json_data['appName'] = app_name
-                json_data_uevm = self.json_data_mapping(json_data)
+            # we need to add the appName  (i.e. assetId) to the data because it can't be found INSIDE the json data
+            # it needed by the json_data_mapping() method
+            json_data['appName'] = app_name
+            json_data_uevm = self.json_data_mapping(json_data)
         return json_data_uevm, message
 
     def delete_folder_content(self, folders=None, extensions_to_delete: list = None, file_name_to_keep: list = None) -> int:
@@ -625,10 +682,27 @@ class UEVMLFS:
     def save_installed_assets(self) -> None:
         """
         Save the installed asset data.
+
+        Notes:
+            The save is delayed inside a grouped_saves() block or if the json_save_delay option is set. Use flush_json_files() to save at once.
         """
-        installed_assets = self._installed_assets
-        with open(self.installed_asset_filename, 'w', encoding='utf-8') as file:
-            json.dump(installed_assets, file, indent=2, sort_keys=True)
+        self._installed_assets_writer.set_changed()
+
+    @contextmanager
+    def grouped_saves(self) -> Iterator[None]:
+        """
+        Context manager that groups the saves of the installed assets and asset sizes files done inside the block.
+        Each file is saved once at the end of the block, if its data have changed.
+        """
+        with self._installed_assets_writer.batch(), self._asset_sizes_writer.batch():
+            yield
+
+    def flush_json_files(self) -> None:
+        """
+        Save the installed assets and asset sizes files if their data have changed and their saves have been delayed.
+        """
+        self._installed_assets_writer.flush()
+        self._asset_sizes_writer.flush()
 
     def get_installed_asset(self, app_name: str) -> Optional[InstalledAsset]:
         """
@@ -740,9 +814,9 @@ class UEVMLFS:
             return
         if self._asset_sizes is None:
             self._asset_sizes = {}
-        self._asset_sizes[app_name] = size
-        with open(self.asset_sizes_filename, 'w', encoding='utf-8') as file:
-            json.dump(self._asset_sizes, file, indent=2, sort_keys=True)
+        if self._asset_sizes.get(app_name) != size:
+            self._asset_sizes[app_name] = size
+            self._asset_sizes_writer.set_changed()
 
     def save_config(self) -> None:
         """
@@ -765,6 +839,8 @@ class UEVMLFS:
         :return: size of the deleted files.
         """
         folders = [gui_g.s.assets_data_folder, gui_g.s.owned_assets_data_folder, gui_g.s.assets_global_folder, gui_g.s.assets_csv_files_folder]
+        # the files of the asset stores can't be deleted while they are opened
+        AssetStore.close_all()
         return self.delete_folder_content(folders)
 
     def get_online_version_saved(self) -> dict:
@@ -866,29 +942,19 @@ class UEVMLFS:
 
         Notes:
             The scan of a Vault cache folder with lots of assets can take a long time.
-            This scan is done when the datatable is loaded.
-            So, increase the max_depth value with care to avoid long loading times.
-        """
-        vault_cache_folder = os.path.normpath(vault_cache_folder) if vault_cache_folder else ''
+            The folders of the assets are scanned in parallel and the results are kept in an index (see VaultCacheScanner),
+            so only the folders that have changed since the previous scan are scanned again.
+            Increase the max_depth value with care to avoid long scanning times.
+            If the installed_asset file does not exist, the size is the size of the asset folder in the Vault cache.
+        """
+        scanner = VaultCacheScanner(
+            self.vault_cache_index_filename, gui_g.s.ue_manifest_filename, max_depth=max_depth, max_threads=get_max_threads()
+        )
         downloaded_assets = {}
-        # scan the vault_cache_folder for files. Proceed level by level until max_depth is reached.
-        for root, dirs, files in os.walk(vault_cache_folder):
-            # print(f'scanning root: {root}')
-            depth = root[len(vault_cache_folder) + len(os.path.sep):].count(os.path.sep)
-            if depth == max_depth:
-                # remove all subfolders from the list of folders to scan to speed up the process
-                del dirs[:]
-            for file in files:
-                filename, _ = os.path.splitext(file)
-                # print(f'root: {root}, file: {file}, filename: {filename}')
-                if filename.lower() == gui_g.s.ue_manifest_filename.lower():
-                    # print('==>found manifest file')
-                    parts = root.split(os.sep)
-                    asset_id = parts[-1]  # the folder name is the asset id
-                    installed_asset = self.get_installed_asset(asset_id)
-                    size = installed_asset.install_size if installed_asset else 1
-                    file_path = os.path.join(root, file)
-                    downloaded_assets[asset_id] = {'size': size, 'path': file_path}
+        for asset_id, (file_path, folder_size) in scanner.scan(vault_cache_folder).items():
+            installed_asset = self.get_installed_asset(asset_id)
+            size = installed_asset.install_size if installed_asset else (folder_size or 1)
+            downloaded_assets[asset_id] = {'size': size, 'path': file_path}
         return downloaded_assets
 
     def pre_update_installed_folders(self, db_handler: UEAssetDbHandler = None) -> None:
@@ -899,19 +965,21 @@ class UEVMLFS:
         installed_assets_json = self.get_installed_assets().copy()  # copy because the content could change during the process
         merged_installed_folders = {}
         # get all installed folders for a given catalog_item_id
-        for app_name, asset in installed_assets_json.items():
-            installed_folders_ori = asset.get('installed_folders', None)
-            # WE USE A COPY to avoid modifying the original list and merging all the installation folders for all releases
-            installed_folders = installed_folders_ori.copy() if installed_folders_ori is not None else None
-            if installed_folders:
-                catalog_item_id = asset.get('catalog_item_id', None)
-                if merged_installed_folders.get(catalog_item_id, None) is None:
-                    merged_installed_folders[catalog_item_id] = installed_folders
+        # the installed_assets json file is saved once, after the loop
+        with self.grouped_saves():
+            for app_name, asset in installed_assets_json.items():
+                installed_folders_ori = asset.get('installed_folders', None)
+                # WE USE A COPY to avoid modifying the original list and merging all the installation folders for all releases
+                installed_folders = installed_folders_ori.copy() if installed_folders_ori is not None else None
+                if installed_folders:
+                    catalog_item_id = asset.get('catalog_item_id', None)
+                    if merged_installed_folders.get(catalog_item_id, None) is None:
+                        merged_installed_folders[catalog_item_id] = installed_folders
+                    else:
+                        merged_installed_folders[catalog_item_id].extend(installed_folders)
                 else:
-                    merged_installed_folders[catalog_item_id].extend(installed_folders)
-            else:
-                # the installed_folders field is empty for the installed_assets, we remove it from the json file
-                self.remove_installed_asset(app_name)
+                    # the installed_folders field is empty for the installed_assets, we remove it from the json file
+                    self.remove_installed_asset(app_name)
 
         # as it, all the formatting and filtering could be done at start with good values
         # update the database using catalog_item_id instead as asset_id to merge installed_folders for ALL the releases
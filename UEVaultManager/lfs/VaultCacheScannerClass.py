@@ -0,0 +1,141 @@
+# coding: utf-8
+"""
+Implementation for:
+- VaultCacheScanner: Scanner of the vault cache folder that finds the downloaded assets, with an index of the folders already scanned.
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from UEVaultManager.lfs.utils import get_dir_size, path_join
+
+
+class VaultCacheScanner:
+    """
+    Scanner of the vault cache folder that finds the downloaded assets, with an index of the folders already scanned.
+    :param index_filename: json file of the index.
+    :param manifest_filename: name of the manifest files, without extension. The comparison is case-insensitive.
+    :param max_depth: maximum depth of subfolders to scan. The folders at the top of the vault cache are at depth 0.
+    :param max_threads: number of threads used to scan the folders.
+
+    Notes:
+        Each folder at the top of the vault cache (i.e. a downloaded asset) is scanned in a thread of the pool, with os.scandir.
+        The index keeps, for each of these folders, its modification time, its size and the manifests found inside.
+        The next scans only scan again the folders whose modification time has changed, and the new ones.
+        The modification time of a folder changes when an entry is added to or removed from it (i.e. the manifest when a download ends),
+        not when a file deeper in the folder is modified.
+    """
+    logger = logging.getLogger('VaultCacheScanner')
+
+    def __init__(self, index_filename: str, manifest_filename: str, max_depth: int = 3, max_threads: int = 8):
+        self.index_filename: str = index_filename
+        self.manifest_filename: str = manifest_filename.lower()
+        self.max_depth: int = max_depth
+        self.max_threads: int = max_threads
+
+    def _load_index(self, vault_cache_folder: str) -> dict:
+        """
+        Load the index of a vault cache folder.
+        :param vault_cache_folder: vault cache folder.
+        :return: dict of the folders data by folder name. Empty if the index is missing, invalid or has been created for another folder or depth.
+        """
+        try:
+            with open(self.index_filename, 'r', encoding='utf-8') as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if index.get('vault_cache_folder') != vault_cache_folder or index.get('max_depth') != self.max_depth:
+            return {}
+        return index.get('folders', {})
+
+    def _save_index(self, vault_cache_folder: str, folders: dict) -> None:
+        """
+        Save the index of a vault cache folder.
+        :param vault_cache_folder: vault cache folder.
+        :param folders: dict of the folders data by folder name.
+        """
+        index = {'vault_cache_folder': vault_cache_folder, 'max_depth': self.max_depth, 'folders': folders}
+        try:
+            with open(self.index_filename, 'w', encoding='utf-8') as file:
+                json.dump(index, file)
+        except OSError as error:
+            self.logger.warning(f'Failed to save the index of the vault cache in {self.index_filename}: {error!r}')
+
+    def _is_manifest(self, name: str) -> bool:
+        """
+        Check if a file is a manifest.
+        :param name: name of the file.
+        :return: True if the file is a manifest.
+        """
+        return os.path.splitext(name)[0].lower() == self.manifest_filename
+
+    def _scan_folder(self, folder: str) -> dict:
+        """
+        Scan a folder at the top of the vault cache.
+        :param folder: path of the folder.
+        :return: dict {'size', 'manifests': {asset_id: manifest path}}.
+        """
+        manifests = {}
+        size = 0
+        # (path, depth). The folder at the top of the vault cache is at depth 0, as the vault cache folder itself
+        folders = [(folder, 0)]
+        while folders:
+            current_folder, depth = folders.pop()
+            try:
+                with os.scandir(current_folder) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if depth < self.max_depth:
+                                folders.append((entry.path, depth + 1))
+                            else:
+                                # too deep to contain a manifest, only its size is needed
+                                size += get_dir_size(entry.path)
+                        elif entry.is_file():
+                            size += entry.stat().st_size
+                            if self._is_manifest(entry.name):
+                                # the folder name is the asset id
+                                manifests[os.path.basename(current_folder)] = entry.path
+            except OSError as error:
+                self.logger.debug(f'Failed to scan {current_folder}: {error!r}')
+        return {'size': size, 'manifests': manifests}
+
+    def scan(self, vault_cache_folder: str) -> dict:
+        """
+        Scan the vault cache folder.
+        :param vault_cache_folder: vault cache folder.
+        :return: dict {asset_id: (manifest path, size of the asset folder)}.
+        """
+        vault_cache_folder = os.path.normpath(vault_cache_folder) if vault_cache_folder else ''
+        if not vault_cache_folder or not os.path.isdir(vault_cache_folder):
+            return {}
+        old_folders = self._load_index(vault_cache_folder)
+        folders = {}
+        folders_to_scan = {}
+        root_manifests = {}
+        with os.scandir(vault_cache_folder) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    mtime = entry.stat().st_mtime
+                    old_data = old_folders.get(entry.name)
+                    if old_data and old_data['mtime'] == mtime:
+                        folders[entry.name] = old_data
+                    else:
+                        folders_to_scan[entry.name] = mtime
+                elif self._is_manifest(entry.name):
+                    root_manifests[os.path.basename(vault_cache_folder)] = entry.path
+        if folders_to_scan:
+            self.logger.debug(f'Scanning {len(folders_to_scan)} of {len(folders_to_scan) + len(folders)} folders in {vault_cache_folder}')
+            names = list(folders_to_scan)
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_threads, len(names))), thread_name_prefix='VaultCacheScanner') as executor:
+                for name, folder_data in zip(names, executor.map(self._scan_folder, [path_join(vault_cache_folder, name) for name in names])):
+                    folder_data['mtime'] = folders_to_scan[name]
+                    folders[name] = folder_data
+        if folders_to_scan or len(folders) != len(old_folders):
+            self._save_index(vault_cache_folder, folders)
+
+        downloaded_assets = {asset_id: (path, 0) for asset_id, path in root_manifests.items()}
+        for folder_data in folders.values():
+            for asset_id, path in folder_data['manifests'].items():
+                downloaded_assets[asset_id] = (path, folder_data['size'])
+        return downloaded_assets
@@ -26,15 +26,47 @@ def get_dir_size(path: str) -> int:
     Get the size of a directory.
     :param path: path to the directory.
     :return: size of the directory.
-    """
-    return sum(f.stat().st_size for f in Path(path).glob('**/*') if f.is_file())
-
 
-def path_join(*paths):
+    Notes:
+        The tree is walked with os.scandir, that gets the type of the entries (and their stats on Windows) while listing the folders.
+        The symlinks to folders are not followed.
+    """
+    size = 0
+    folders = [path]
+    while folders:
+        try:
+            with os.scandir(folders.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        folders.append(entry.path)
+                    elif entry.is_file():
+                        size += entry.stat().st_size
+        except OSError:
+            continue
+    return size
+
+
+def path_join(*paths) -> str:
     """
     Join multiple paths together. Make the return value unified
     :param paths: paths to join.
     :return: joined paths.
+
+    Notes:
+        Only the strings are processed, the filesystem is not accessed, so it can be used in loops on a lot of files.
+        A relative path stays relative and the symbolic links are kept. Use path_join_resolved() for paths coming from the user or the config.
+    """
+    return os.path.normpath(os.path.join(*paths))
+
+
+def path_join_resolved(*paths) -> str:
+    """
+    Join multiple paths together and resolve the result. Make the return value unified
+    :param paths: paths to join.
+    :return: joined paths, as an absolute path with the symbolic links resolved.
+
+    Notes:
+        Each call does some system calls, it should be used once on a base folder and not on each file inside it.
     """
     return os.path.normpath(Path(*paths).resolve())
 
@@ -1,5 +1,6 @@
 # coding: utf-8
 
+import itertools
 import struct
 import zlib
 from hashlib import sha1
@@ -11,6 +12,11 @@ from UEVaultManager.utils.rolling_hash import get_hash
 
 class Chunk:
     header_magic = 0xB1FE3AA2
+    # header fields, as read by read()
+    _header_v1_struct = struct.Struct('<IIII4IQB')  # magic, version, header size, compressed size, guid, hash, stored_as
+    _header_v2_struct = struct.Struct('<20sB')  # sha hash, hash type
+    _header_v3_struct = struct.Struct('<I')  # uncompressed size
+    decompress_block_size = 64 * 1024  # size of the compressed blocks when decompressing into a buffer
 
     def __init__(self):
         self.header_version = 3
@@ -29,12 +35,18 @@ class Chunk:
         self._guid_num = 0
         self._bio = None
         self._data = None
+        self._payload = None  # memoryview on the (compressed) data, set by read_view()
 
     @property
     def data(self):
         if self._data:
             return self._data
 
+        if self._payload is not None:
+            self._data = zlib.decompress(self._payload) if self.compressed else self._payload.tobytes()
+            self._payload = None
+            return self._data
+
         if self.compressed:
             self._data = zlib.decompress(self._bio.read())
         else:
@@ -83,6 +95,78 @@ class Chunk:
         _sio = BytesIO(data)
         return cls.read(_sio)
 
+    @classmethod
+    def read_view(cls, data):
+        """
+        Read a chunk from a buffer without copying its data.
+        :param data: buffer (bytes, bytearray or memoryview) containing the chunk.
+        :return: chunk object. Its data must be read using decompress_into() or the data property.
+        """
+        view = memoryview(data)
+        magic, version, header_size, compressed_size, g0, g1, g2, g3, _hash, stored_as = cls._header_v1_struct.unpack_from(view, 0)
+        if magic != cls.header_magic:
+            raise ValueError("Chunk magic doesn't match!")
+
+        _chunk = cls()
+        _chunk.header_version = version
+        _chunk.header_size = header_size
+        _chunk.compressed_size = compressed_size
+        _chunk.guid = (g0, g1, g2, g3)
+        _chunk.hash = _hash
+        _chunk.stored_as = stored_as
+        offset = cls._header_v1_struct.size
+
+        if version >= 2:
+            _chunk.sha_hash, _chunk.hash_type = cls._header_v2_struct.unpack_from(view, offset)
+            offset += cls._header_v2_struct.size
+
+        if version >= 3:
+            _chunk.uncompressed_size = cls._header_v3_struct.unpack_from(view, offset)[0]
+            offset += cls._header_v3_struct.size
+
+        if offset != header_size:
+            raise ValueError('Did not read entire chunk header!')
+
+        _chunk._payload = view[header_size:]
+        return _chunk
+
+    def decompress_into(self, buffer) -> int:
+        """
+        Write the (uncompressed) data of a chunk read by read_view() into a buffer, without creating an intermediate copy of the whole data.
+        :param buffer: writable buffer (bytearray, memoryview or shared memory buffer) to write the data to.
+        :return: size of the data written.
+        """
+        if self._payload is None:
+            # chunk has not been read by read_view(), use the "usual" way
+            data = self.data
+            size = len(data)
+            buffer[:size] = data
+            return size
+
+        target = memoryview(buffer)
+        payload = self._payload
+        if not self.compressed:
+            size = len(payload)
+            if size > len(target):
+                raise ValueError('Buffer is too small for the chunk data!')
+            target[:size] = payload
+            return size
+
+        # decompress block by block, so only a small part of the data exists outside the buffer
+        decompressor = zlib.decompressobj()
+        size = 0
+        block_size = self.decompress_block_size
+        blocks = (payload[start:start + block_size] for start in range(0, len(payload), block_size))
+        for out in itertools.chain((decompressor.decompress(block) for block in blocks), (decompressor.flush(), )):
+            if not out:
+                continue
+            end = size + len(out)
+            if end > len(target):
+                raise ValueError('Buffer is too small for the chunk data!')
+            target[size:end] = out
+            size = end
+        return size
+
     # noinspection DuplicatedCode
     @classmethod
     def read(cls, bio):
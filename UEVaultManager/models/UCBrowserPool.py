@@ -0,0 +1,175 @@
+# coding=utf-8
+"""
+Implementation for:
+- UCBrowserPool: Pool of tabs opened in a single undetected Chrome browser.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+
+
+class UCBrowserPool:
+    """
+    Pool of tabs opened in a single undetected Chrome browser.
+    :param start_browser: coroutine function that starts and returns the browser. Called only once, when the first page is requested.
+    :param max_tabs: maximum number of tabs (and so of requests) opened at the same time.
+    :param max_uses_per_tab: number of pages loaded in a tab before closing it and opening a new one.
+    :param fetch_timeout: timeout in seconds for getting the content of a page.
+
+    Notes:
+        The browser and its tabs live in an event loop running in a dedicated thread.
+        fetch() can be called from any thread, the requests are queued in this loop.
+        The browser object must provide the "get(url, new_tab=True)" and "stop()" methods,
+        and the tab objects the "get(url)", "activate()", "get_content()" and "close()" methods (as nodriver does).
+    """
+    logger = logging.getLogger('UCBrowserPool')
+
+    def __init__(self, start_browser: callable, max_tabs: int = 4, max_uses_per_tab: int = 20, fetch_timeout: float = 60):
+        self._start_browser = start_browser
+        self.max_tabs: int = max(1, max_tabs)
+        self.max_uses_per_tab: int = max(1, max_uses_per_tab)
+        self.fetch_timeout: float = fetch_timeout
+        self._browser = None
+        self._idle_tabs: list = []  # list of (tab, use_count) tuples ready to be reused
+        self._loop: asyncio.AbstractEventLoop = None
+        self._thread: threading.Thread = None
+        self._semaphore: asyncio.Semaphore = None
+        self._browser_lock: asyncio.Lock = None
+        self._thread_lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        """ Get if the event loop of the pool is running. """
+        return self._loop is not None and self._loop.is_running()
+
+    def _start_loop(self) -> None:
+        """
+        Start the event loop of the pool in a dedicated thread if not already done.
+        """
+        with self._thread_lock:
+            if self.is_running:
+                return
+            self._loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(self._loop)
+                self._loop.call_soon(started.set)
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(target=_run, name='UCBrowserPool', daemon=True)
+            self._thread.start()
+            started.wait()
+
+    async def _init_sync_objects(self) -> None:
+        """
+        Create the objects used to synchronize the requests. They must be created inside the loop of the pool.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_tabs)
+            self._browser_lock = asyncio.Lock()
+
+    async def _get_browser(self):
+        """
+        Get the browser, start it if needed.
+        :return: browser object.
+        """
+        async with self._browser_lock:
+            if self._browser is None:
+                self._browser = await self._start_browser()
+        return self._browser
+
+    async def _close_tab(self, tab) -> None:
+        """
+        Close a tab, ignoring the errors (the tab could already be closed).
+        :param tab: tab to close.
+        """
+        try:
+            await tab.close()
+        except (Exception, ) as error:
+            self.logger.debug(f'Error when closing a tab: {error!r}')
+
+    async def _fetch(self, url: str) -> str:
+        """
+        Get the raw content of a page, using an idle tab or a new one.
+        :param url: url of the page.
+        :return: raw content of the page.
+        """
+        await self._init_sync_objects()
+        async with self._semaphore:
+            browser = await self._get_browser()
+            tab, use_count = self._idle_tabs.pop() if self._idle_tabs else (None, 0)
+            try:
+                if tab is None:
+                    tab = await browser.get(url, new_tab=True)
+                else:
+                    tab = await tab.get(url)
+                await tab.activate()
+                raw_content = await tab.get_content()
+            except (Exception, asyncio.CancelledError):
+                # the tab is in an unknown state, we don't reuse it
+                if tab is not None:
+                    await self._close_tab(tab)
+                raise
+            use_count += 1
+            if use_count >= self.max_uses_per_tab:
+                # recycle the tab to avoid memory leaks in the browser
+                await self._close_tab(tab)
+            else:
+                self._idle_tabs.append((tab, use_count))
+            return raw_content
+
+    def fetch(self, url: str, timeout: float = None) -> str:
+        """
+        Get the raw content of a page. Can be called from any thread.
+        :param url: url of the page.
+        :param timeout: timeout in seconds. If None, the fetch_timeout property will be used.
+        :return: raw content of the page.
+        """
+        self._start_loop()
+        future = asyncio.run_coroutine_threadsafe(self._fetch(url), self._loop)
+        try:
+            return future.result(timeout=timeout or self.fetch_timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    async def _close_all(self) -> None:
+        """
+        Close all the tabs and stop the browser.
+        """
+        while self._idle_tabs:
+            tab, _ = self._idle_tabs.pop()
+            await self._close_tab(tab)
+        if self._browser is not None:
+            try:
+                result = self._browser.stop()
+                if asyncio.iscoroutine(result):
+                    await result
+            except (Exception, ) as error:
+                self.logger.debug(f'Error when stopping the browser: {error!r}')
+            self._browser = None
+
+    def close(self) -> None:
+        """
+        Close all the tabs, stop the browser and the event loop of the pool.
+        """
+        with self._thread_lock:
+            if not self.is_running:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._close_all(), self._loop).result(timeout=self.fetch_timeout)
+            except (Exception, ) as error:
+                self.logger.warning(f'Error when closing the browser pool: {error!r}')
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=self.fetch_timeout)
+            if self._thread.is_alive():
+                # a running loop can't be closed. The thread is a daemon, it will end with the application
+                self.logger.warning('The event loop of the browser pool has not stopped in time, it has not been closed')
+            else:
+                self._loop.close()
+            self._loop = None
+            self._thread = None
+            self._semaphore = None
+            self._browser_lock = None
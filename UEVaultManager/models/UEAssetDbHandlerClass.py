@@ -14,6 +14,7 @@ import os
 import random
 import sqlite3
 import sys
+import time
 from enum import Enum
 from pathlib import Path
 
@@ -66,7 +67,8 @@ class DbVersionNum(Enum):
     V14 = 14  # add categories et grab_result views
     V15 = 15  # add Group column to the assets table
     V16 = 16  # add License column to the assets table
-    V17 = 17  # future version
+    V17 = 17  # add sync_watermark column to the last_run table
+    V18 = 18  # future version
 
 
 class UEAssetDbHandler:
@@ -84,6 +86,8 @@ class UEAssetDbHandler:
 
     def __init__(self, database_name: str, reset_database: bool = False):
         self.connection = None
+        self._tags_cache: dict = None  # if not None, the tags are read from and added to this dict instead of the 'tags' table
+        self._tags_to_save: dict = {}  # tags added to the cache and not saved in the database yet
         self.database_name: str = database_name
         self.init_connection()
         if reset_database:
@@ -145,6 +149,7 @@ class UEAssetDbHandler:
         """
         if self.is_connected:
             try:
+                self.flush_tags_cache()
                 self.connection.close()
             except sqlite3.Error as error:
                 print(f'Error while closing sqlite connection: {error!r}')
@@ -275,6 +280,47 @@ class UEAssetDbHandler:
             self.logger.warning(f"Error while inserting/updating row with id '{_id}': {error!r}")
             return False
 
+    def _bulk_upsert_rows(self, table_name: str, rows: list) -> int:
+        """
+        Insert or update a list of rows in the given table, using one query for each set of columns.
+        :param table_name: name of the table.
+        :param rows: list of rows to insert or update.
+        :return: number of rows inserted or updated.
+
+        Notes:
+            The table must have an 'id' primary key.
+            No commit is done here. The caller is in charge of the transaction.
+        """
+        if not table_name or not rows:
+            return 0
+        # remove all fields whith a None Value
+        # keep the empty string because we want to be able to save an empty string
+        none_values = [x for x in gui_g.s.cell_is_nan_list]
+        # group the rows by column set, each group will be saved with a single executemany() call
+        rows_by_columns = {}
+        for row_data in rows:
+            filtered_fields = {k: v for k, v in row_data.items() if (v is not None and v not in none_values)}
+            if filtered_fields:
+                rows_by_columns.setdefault(tuple(filtered_fields.keys()), []).append(filtered_fields)
+        count = 0
+        cursor = self.connection.cursor()
+        for column_list, group in rows_by_columns.items():
+            fields = ", ".join(f"{column}" for column in column_list)
+            values = ", ".join(f":{column}" for column in column_list)
+            updates = ", ".join(f"{column} = excluded.{column}" for column in column_list if column != 'id')
+            on_conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+            # this query will insert the row or update only the given columns if it already exists.
+            # noinspection SqlInsertValues
+            query = f"INSERT INTO {table_name} ({fields}) VALUES ({values}) ON CONFLICT(id) {on_conflict}"
+            try:
+                cursor.executemany(query, group)
+                count += len(group)
+            except (sqlite3.IntegrityError, sqlite3.InterfaceError) as error:
+                self.logger.warning(f'Error while inserting/updating {len(group)} rows at once. Saving them one by one: {error!r}')
+                count += sum(1 for row_data in group if self._insert_or_update_row(table_name, row_data))
+        cursor.close()
+        return count
+
     def _set_installed_folders(self, asset_id: str, catalog_item_id: str, installed_folders_existing: str, installed_folders: list) -> str:
         installed_folders_updated = ','.join(installed_folders)  # keep join() here to raise an error if installed_folders is not a list of strings
         if installed_folders_updated != installed_folders_existing:
@@ -526,6 +572,9 @@ class UEAssetDbHandler:
         if upgrade_from_version.value == DbVersionNum.V15.value:
             self._add_missing_columns('assets', required_columns={'license': 'TEXT'})
             self.db_version = upgrade_from_version = DbVersionNum.V16
+        if upgrade_from_version.value == DbVersionNum.V16.value:
+            self._add_missing_columns('last_run', required_columns={'sync_watermark': 'TEXT'})
+            self.db_version = upgrade_from_version = DbVersionNum.V17
         if previous_version != self.db_version:
             self.logger.info(f'Database upgraded to {upgrade_from_version}')
             self._set_db_version(self.db_version)
@@ -569,16 +618,38 @@ class UEAssetDbHandler:
             return
         if self.connection is not None:
             cursor = self.connection.cursor()
-            query = "INSERT INTO last_run (date, mode, files_count, items_count, scraped_ids) VALUES (:date, :mode, :files_count, :items_count, :scraped_ids)"
+            if self.db_version.value >= DbVersionNum.V17.value:
+                data = {'sync_watermark': '', **data}
+                query = "INSERT INTO last_run (date, mode, files_count, items_count, scraped_ids, sync_watermark) VALUES (:date, :mode, :files_count, :items_count, :scraped_ids, :sync_watermark)"
+            else:
+                query = "INSERT INTO last_run (date, mode, files_count, items_count, scraped_ids) VALUES (:date, :mode, :files_count, :items_count, :scraped_ids)"
             cursor.execute(query, data)
             cursor.close()
             self.connection.commit()
 
-    def set_assets(self, _asset_list, update_progress=True) -> bool:
+    def get_last_sync_watermark(self) -> str:
+        """
+        Get the sync watermark saved by the last incremental sync.
+        :return: effectiveDate of the most recent asset found during the last sync, or '' if no sync has been done yet.
+        """
+        # check if the database version is compatible with the current method
+        if not self._check_db_version(DbVersionNum.V17, caller_name=inspect.currentframe().f_code.co_name):
+            return ''
+        result = ''
+        if self.connection is not None:
+            cursor = self.connection.cursor()
+            cursor.execute("SELECT sync_watermark FROM last_run WHERE sync_watermark IS NOT NULL AND sync_watermark <> '' ORDER BY id DESC LIMIT 1")
+            row = cursor.fetchone()
+            cursor.close()
+            result = row[0] if row else result
+        return result
+
+    def set_assets(self, _asset_list, update_progress=True, table_name='assets') -> bool:
         """
         Insert or update assets into the 'assets' table.
         :param _asset_list: dictionary or a list of dictionaries representing assets.
         :param update_progress: True to update the progress window, otherwise False.
+        :param table_name: name of the table to save the assets into. Could be a staging table created by create_staging_table().
         :return: True if the assets were inserted or updated, otherwise False.
 
         Notes:
@@ -587,69 +658,167 @@ class UEAssetDbHandler:
         # check if the database version is compatible with the current method
         if not self._check_db_version(DbVersionNum.V2, caller_name=inspect.currentframe().f_code.co_name):
             return False
-        if self.connection is not None:
-            if not isinstance(_asset_list, list):
-                _asset_list = [_asset_list]
-            str_today = datetime.datetime.now().strftime(DateFormat.csv)
-            if update_progress and gui_g.WindowsRef.progress:
-                gui_g.WindowsRef.progress.reset(new_value=0, new_max_value=len(_asset_list), keep_execution_state=True)
-            for index, asset in enumerate(_asset_list):
-                # if gui_g.WindowsRef.progress and not gui_g.WindowsRef.progress.update_and_continue(increment=1):
-                if gui_g.WindowsRef.progress and (
-                    not gui_g.WindowsRef.progress.continue_execution or
-                    (update_progress and not gui_g.WindowsRef.progress.update_and_continue(increment=1))
-                ):
-                    return False
-                _id = str(asset.get('id', ''))
-                if not _id or _id in gui_g.s.cell_is_nan_list:
-                    _id = str(asset.get('asset_id', ''))
-                if _id and _id.startswith(gui_g.s.temp_id_prefix):
-                    # this a new row, partialled empty, created before scraping the data.
-                    # No need to save it, It will produce an error.
-                    # It will be saved after scraping
-                    # It should not occur here. It should have been filtered before.
-                    continue
-                # make some conversion before saving the asset
-                asset['update_date'] = str_today
-                asset['creation_date'] = convert_to_str_datetime(
-                    value=asset['creation_date'], date_format=DateFormat.csv
-                ) if 'creation_date' in asset else str_today
-                asset['date_added'] = convert_to_str_datetime(
-                    value=asset['date_added'], date_format=DateFormat.csv
-                ) if 'date_added' in asset else str_today
-                # converting lists to strings
-                tags = asset.get('tags', [])
-                asset['tags'] = self.convert_tag_list_to_string(tags)  # will search the tags table for ids
-                asset['installed_folders'] = check_and_convert_list_to_str(asset.get('installed_folders', []))
-                release_info = get_and_check_release_info(asset.get('release_info', []), empty_values=gui_g.s.cell_is_nan_list)
-                release_info_str = json.dumps(release_info)
-                asset['release_info'] = release_info_str  # if isinstance(release_info, list) else release_info
-                if 'row_index' in asset:
-                    asset.pop('row_index')  # remove the row_index key from the asset dictionary
-                self._insert_or_update_row('assets', asset)
+        if self.connection is None:
+            return False
+        if not isinstance(_asset_list, list):
+            _asset_list = [_asset_list]
+        str_today = datetime.datetime.now().strftime(DateFormat.csv)
+        asset_count = len(_asset_list)
+        # the progress window is only updated every progress_step rows, updating it for each row is slower than saving the row
+        progress_step = max(1, asset_count // 100)
+        if update_progress and gui_g.WindowsRef.progress:
+            gui_g.WindowsRef.progress.reset(new_value=0, new_max_value=asset_count, keep_execution_state=True)
+        rows_to_save = []
+        for index, asset in enumerate(_asset_list):
+            if gui_g.WindowsRef.progress and (
+                not gui_g.WindowsRef.progress.continue_execution or (
+                    update_progress and (index + 1) % progress_step == 0 and
+                    not gui_g.WindowsRef.progress.update_and_continue(increment=progress_step)
+                )
+            ):
+                return False
+            _id = str(asset.get('id', ''))
+            if not _id or _id in gui_g.s.cell_is_nan_list:
+                _id = str(asset.get('asset_id', ''))
+            if _id and _id.startswith(gui_g.s.temp_id_prefix):
+                # this a new row, partialled empty, created before scraping the data.
+                # No need to save it, It will produce an error.
+                # It will be saved after scraping
+                # It should not occur here. It should have been filtered before.
+                continue
+            # make some conversion before saving the asset
+            asset['update_date'] = str_today
+            asset['creation_date'] = convert_to_str_datetime(
+                value=asset['creation_date'], date_format=DateFormat.csv
+            ) if 'creation_date' in asset else str_today
+            asset['date_added'] = convert_to_str_datetime(value=asset['date_added'], date_format=DateFormat.csv) if 'date_added' in asset else str_today
+            # converting lists to strings
+            tags = asset.get('tags', [])
+            asset['tags'] = self.convert_tag_list_to_string(tags)  # will search the tags table for ids
+            asset['installed_folders'] = check_and_convert_list_to_str(asset.get('installed_folders', []))
+            release_info = get_and_check_release_info(asset.get('release_info', []), empty_values=gui_g.s.cell_is_nan_list)
+            release_info_str = json.dumps(release_info)
+            asset['release_info'] = release_info_str  # if isinstance(release_info, list) else release_info
+            if 'row_index' in asset:
+                asset.pop('row_index')  # remove the row_index key from the asset dictionary
+            rows_to_save.append(asset)
+        # all the rows are saved in a single transaction
+        start_time = time.time()
         try:
+            if not self.connection.in_transaction:
+                self.connection.execute('BEGIN')
+            saved_count = self._bulk_upsert_rows(table_name, rows_to_save)
             self.connection.commit()
-        except (sqlite3.IntegrityError, sqlite3.InterfaceError) as error:
+        except (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.OperationalError) as error:
+            self.connection.rollback()
             self.logger.warning(f'Error when committing the database changes: {error!r}')
             return False
+        duration = max(time.time() - start_time, 0.001)
+        self.logger.info(f'{saved_count} assets saved in the {table_name} table in {duration:.2f} s ({saved_count / duration:.0f} rows/s)')
+        return True
+
+    def create_staging_table(self, table_name='assets_staging') -> bool:
+        """
+        Create an empty temporary table with the columns of the 'assets' table, to stage assets before saving them with save_staged_assets().
+        :param table_name: name of the temporary table.
+        :return: True if the table has been created, otherwise False.
+
+        Notes:
+            A temporary table only exists in the current connection. SQLite keeps it in a temporary file, not in memory.
+        """
+        if self.connection is None:
+            return False
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(f"DROP TABLE IF EXISTS temp.{table_name}")
+            cursor.execute(f"CREATE TEMP TABLE {table_name} AS SELECT * FROM assets WHERE 0")
+            # needed by the "ON CONFLICT(id)" clause of the upsert queries
+            cursor.execute(f"CREATE UNIQUE INDEX temp.{table_name}_id ON {table_name} (id)")
+            self.connection.commit()
+            cursor.close()
+        except sqlite3.Error as error:
+            self.logger.warning(f'Error when creating the staging table {table_name}: {error!r}')
+            return False
+        return True
+
+    def drop_staging_table(self, table_name='assets_staging') -> None:
+        """
+        Drop a temporary table created by create_staging_table().
+        :param table_name: name of the temporary table.
+        """
+        if self.connection is not None:
+            cursor = self.connection.cursor()
+            cursor.execute(f"DROP TABLE IF EXISTS temp.{table_name}")
+            self.connection.commit()
+            cursor.close()
+
+    def save_staged_assets(self, table_name='assets_staging', delete_existing=False, keep_added_manually=True) -> bool:
+        """
+        Save the assets of a staging table into the 'assets' table, in a single transaction, and drop the staging table.
+        :param table_name: name of the staging table created by create_staging_table().
+        :param delete_existing: True to delete the existing assets before saving the staged ones.
+        :param keep_added_manually: True to keep the assets added manually when deleting the existing assets.
+        :return: True if the assets were saved, otherwise False.
+
+        Notes:
+            If an error occurs, nothing is deleted or saved.
+        """
+        if self.connection is None:
+            return False
+        cursor = self.connection.cursor()
+        cursor.execute("PRAGMA table_info(assets)")
+        column_list = [row[1] for row in cursor.fetchall()]
+        fields = ", ".join(column_list)
+        # the columns not set in a staged row are NULL, they must not erase the values of the existing row, as in set_assets()
+        updates = ", ".join(f"{column} = COALESCE(excluded.{column}, assets.{column})" for column in column_list if column != 'id')
+        try:
+            if not self.connection.in_transaction:
+                self.connection.execute('BEGIN')
+            if delete_existing:
+                where_clause = "added_manually = 0" if keep_added_manually else "1"
+                cursor.execute(f"DELETE FROM assets WHERE {where_clause}")
+            # the "WHERE true" clause is needed by SQLite to parse the "ON CONFLICT" clause after a SELECT
+            cursor.execute(f"INSERT INTO assets ({fields}) SELECT {fields} FROM temp.{table_name} WHERE true ON CONFLICT(id) DO UPDATE SET {updates}")
+            saved_count = cursor.rowcount
+            self.connection.commit()
+        except sqlite3.Error as error:
+            self.connection.rollback()
+            self.logger.warning(f'Error when saving the assets of the staging table {table_name}: {error!r}')
+            return False
+        finally:
+            cursor.close()
+            self.drop_staging_table(table_name)
+        self.logger.info(f'{saved_count} assets saved in the database from the {table_name} table')
         return True
 
     def get_assets_data(self, fields='*', uid=None) -> dict:
         """
         Get data from all the assets in the 'assets' table.
         :param fields: list of fields to return.
-        :param uid: id of the asset to get data for. If None, all the assets will be returned.
+        :param uid: id or list of ids of the assets to get data for. If None, all the assets will be returned.
         :return: dictionary {ids, rows}.
         """
         if not isinstance(fields, str):
             fields = ', '.join(fields)
         row_data = {}
-        where_clause = f"WHERE id='{uid}'" if uid is not None else ''
         if self.connection is not None:
             self.connection.row_factory = sqlite3.Row
             cursor = self.connection.cursor()
-            cursor.execute(f"SELECT {fields} FROM assets {where_clause}")
-            for row in cursor.fetchall():
+            if isinstance(uid, (list, tuple, set)):
+                # read all the assets in a few queries. The ids are split in batches because sqlite limits the number of parameters in a query
+                uids = list(uid)
+                rows = []
+                batch_size = 500
+                for index in range(0, len(uids), batch_size):
+                    batch = uids[index:index + batch_size]
+                    placeholders = ', '.join('?' * len(batch))
+                    cursor.execute(f"SELECT {fields} FROM assets WHERE id IN ({placeholders})", batch)
+                    rows.extend(cursor.fetchall())
+            else:
+                where_clause = f"WHERE id='{uid}'" if uid is not None else ''
+                cursor.execute(f"SELECT {fields} FROM assets {where_clause}")
+                rows = cursor.fetchall()
+            for row in rows:
                 uid = row['id']
                 row_data[uid] = dict(row)
             cursor.close()
@@ -796,7 +965,8 @@ class UEAssetDbHandler:
             where_clause = "1"
         if self.connection is not None:
             cursor = self.connection.cursor()
-            cursor.execute("DELETE FROM assets WHERE ?", (where_clause, ))
+            # the condition must be a part of the query. Bound as a parameter, it would be compared as a string and nothing would be deleted
+            cursor.execute(f"DELETE FROM assets WHERE {where_clause}")
             self.connection.commit()
             cursor.close()
 
@@ -828,6 +998,12 @@ class UEAssetDbHandler:
             return
         if self.connection is None or data.get('id', None) is None or data.get('name', None) is None:
             return
+        if self._tags_cache is not None:
+            # the tag will be saved in the database when flush_tags_cache() is called
+            if data['id'] not in self._tags_cache:
+                self._tags_cache[data['id']] = data['name']
+                self._tags_to_save[data['id']] = data['name']
+            return
         if self.get_tag_by_id(data['id']) is None:
             cursor = self.connection.cursor()
             query = "INSERT INTO tags (id, name) VALUES (:id, :name)"
@@ -842,6 +1018,8 @@ class UEAssetDbHandler:
         :return: name of the tag.
         """
         result = None
+        if self._tags_cache is not None:
+            return self._tags_cache.get(uid, result)
         if self.connection is not None:
             cursor = self.connection.cursor()
             cursor.execute("SELECT name from tags WHERE id = ?", (uid, ))
@@ -850,6 +1028,52 @@ class UEAssetDbHandler:
             result = row[0] if row else result
         return result
 
+    def load_tags_cache(self) -> None:
+        """
+        Load all the tags in memory.
+        Until flush_tags_cache() is called, the tags are read from and saved into this cache instead of the 'tags' table.
+        """
+        # check if the database version is compatible with the current method
+        if not self._check_db_version(DbVersionNum.V7, caller_name=inspect.currentframe().f_code.co_name):
+            return
+        if self.connection is None:
+            return
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT id, name FROM tags")
+        self._tags_cache = {row[0]: row[1] for row in cursor.fetchall()}
+        self._tags_to_save = {}
+        cursor.close()
+
+    def pop_tags_to_save(self) -> dict:
+        """
+        Get the tags added to the cache and not saved in the database yet, and forget them.
+        :return: dict of tag names by id.
+
+        Notes:
+            Used when the tags have been found in another process, to save them with the database handler of the main process (see save_tag()).
+        """
+        tags_to_save = self._tags_to_save
+        self._tags_to_save = {}
+        return tags_to_save
+
+    def flush_tags_cache(self, disable_cache: bool = True) -> int:
+        """
+        Save the tags added to the cache into the 'tags' table in a single query.
+        :param disable_cache: whether the cache is disabled after saving the tags.
+        :return: number of tags saved.
+        """
+        count = 0
+        if self._tags_to_save and self.connection is not None:
+            cursor = self.connection.cursor()
+            cursor.executemany("INSERT OR IGNORE INTO tags (id, name) VALUES (?, ?)", list(self._tags_to_save.items()))
+            self.connection.commit()
+            cursor.close()
+            count = len(self._tags_to_save)
+        self._tags_to_save = {}
+        if disable_cache:
+            self._tags_cache = None
+        return count
+
     # noinspection DuplicatedCode
     def save_rating(self, data: dict):
         """
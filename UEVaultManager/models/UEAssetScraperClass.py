@@ -1,26 +1,40 @@
 # coding=utf-8
 """
 Implementation for:
+- ScrapTask: a task that scraps the data of an url, used in a thread.
+- TokenBucket: an asyncio rate limiter.
+- ScrapedDataSink: base class for the objects that receive the parsed data during a scraping.
+- DatabaseSink: write the parsed data into the database.
+- FileSink: write the parsed data into a CSV or a JSON file.
+- IngestLFS: read-only replacement of the UEVMLFS object in the worker processes that parse the data of the asset store.
+- IngestCore: minimal replacement of the AppCore object in the worker processes that parse the data of the asset store.
+- init_ingest_worker, ingest_assets_batch: functions run in the worker processes that parse the data of the asset store.
 - UEAssetScraper: class that handles scraping data from the Unreal Engine Marketplace.
 """
+import asyncio
 import concurrent.futures
 import csv
 import json
 import logging
+import math
 import os
 import random
 import time
+from abc import ABC, abstractmethod
 from datetime import datetime
-from itertools import chain
-from threading import current_thread
+from threading import current_thread, Lock
+from typing import Optional
 
 from requests import ReadTimeout
 
 import UEVaultManager.tkgui.modules.functions_no_deps as gui_fn  # using the shortest variable name for globals for convenience
 import UEVaultManager.tkgui.modules.globals as gui_g  # using the shortest variable name for globals for convenience
-from UEVaultManager.api.egs import is_asset_obsolete
+from UEVaultManager.api.egs import EPCAPI, is_asset_obsolete
 from UEVaultManager.core import AppCore
+from UEVaultManager.lfs.AssetStoreClass import AssetStore
+from UEVaultManager.lfs.UEVMLFSClass import UEVMLFS
 from UEVaultManager.lfs.utils import path_join
+from UEVaultManager.models.Asset import InstalledAsset
 from UEVaultManager.models.csv_sql_fields import convert_data_to_csv, csv_sql_fields, debug_parsed_data, get_csv_field_name_list, \
     get_sql_field_name_list, get_sql_preserved_fields, is_on_state, is_preserved
 from UEVaultManager.models.types import CSVFieldState, DateFormat, GetDataResult
@@ -92,6 +106,393 @@ class ScrapTask:
         self.log_func(f'INTERRUPTION OF ScrapTask {self.name} at {datetime.now()}:{message}')
 
 
+class TokenBucket:
+    """
+    An asyncio rate limiter using a token bucket.
+    :param rate: number of tokens added per second.
+    :param capacity: maximum number of tokens in the bucket (i.e. size of a burst).
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate: float = max(rate, 0.001)
+        self.capacity: int = max(capacity, 1)
+        self._tokens: float = self.capacity
+        self._last_time: float = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """
+        Wait until a token is available and consume it.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_time) * self.rate)
+                self._last_time = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ScrapedDataSink(ABC):
+    """
+    Base class for the objects that receive the parsed data, page by page, during a scraping.
+    :param caller: UEAssetScraper object.
+
+    Notes:
+        The write() method could be called from several threads. The calls are serialized.
+    """
+
+    def __init__(self, caller):
+        self.caller = caller
+        self.items_count: int = 0
+        self.is_ok: bool = True  # False if an error occured during a write
+        self._lock = Lock()
+
+    def open(self) -> bool:
+        """
+        Open the sink. Must be called before the first write.
+        :return: True if the sink can be used, False otherwise.
+        """
+        return True
+
+    def write(self, assets_data: list) -> bool:
+        """
+        Write a page of parsed assets data.
+        :param assets_data: list of parsed assets data.
+        :return: True if the data have been written, False otherwise.
+        """
+        if not assets_data:
+            return True
+        with self._lock:
+            is_ok = self._write(assets_data)
+            self.is_ok = self.is_ok and is_ok
+            return is_ok
+
+    @abstractmethod
+    def _write(self, assets_data: list) -> bool:
+        """
+        Write a page of parsed assets data. Called by write() with the lock held.
+        :param assets_data: list of parsed assets data.
+        :return: True if the data have been written, False otherwise.
+        """
+
+    def close(self, last_run_content: dict = None) -> bool:
+        """
+        Close the sink.
+        :param last_run_content: data of the last run to save. None if the scraping has been cancelled.
+        :return: True if OK, False otherwise.
+        """
+        return self.is_ok
+
+
+class DatabaseSink(ScrapedDataSink):
+    """
+    Write the parsed data into the database of the scraper.
+    :param caller: UEAssetScraper object.
+
+    Notes:
+        If the scraper is set to clean the database, the pages are saved in a temporary staging table and the existing assets are only replaced when the
+        sink is closed at the end of a successful scraping, in a single transaction.
+        So the existing data can be read while parsing and a cancelled scraping leaves the database unchanged.
+    """
+    staging_table_name = 'assets_staging'
+
+    def open(self) -> bool:
+        """
+        Open the sink and create the staging table if the database is cleaned.
+        :return: True if the sink can be used, False otherwise.
+        """
+        if self.caller.clean_database:
+            return self.caller.asset_db_handler.create_staging_table(self.staging_table_name)
+        return True
+
+    def _write(self, assets_data: list) -> bool:
+        self.items_count += len(assets_data)
+        table_name = self.staging_table_name if self.caller.clean_database else 'assets'
+        return self.caller.asset_db_handler.set_assets(assets_data, update_progress=False, table_name=table_name)
+
+    def close(self, last_run_content: dict = None) -> bool:
+        """
+        Close the sink and save the last run data in the database.
+        :param last_run_content: data of the last run to save. None if the scraping has been cancelled.
+        :return: True if OK, False otherwise.
+        """
+        if self.caller.clean_database:
+            if last_run_content is None:
+                self.caller.asset_db_handler.drop_staging_table(self.staging_table_name)
+            else:
+                # if confirmed, all the assets in the database will be deleted
+                delete_existing = box_yesno(
+                    'Current settings and params are set to delete all existing data before rebuilding. All user fields values will be lost. Are you sure your want to do that ?'
+                )
+                self.is_ok = self.caller.asset_db_handler.save_staged_assets(
+                    self.staging_table_name, delete_existing=delete_existing, keep_added_manually=True
+                ) and self.is_ok
+        if last_run_content is not None:
+            # convert the list of ids to a string for the database only
+            last_run_content = last_run_content.copy()
+            last_run_content['scraped_ids'] = check_and_convert_list_to_str(last_run_content.get('scraped_ids', ''))
+            self.caller.asset_db_handler.save_last_run(last_run_content)
+        return self.is_ok
+
+
+# noinspection PyProtectedMember
+class FileSink(ScrapedDataSink):
+    """
+    Write the parsed data into a CSV or a JSON file. The data already in the file are merged with the new ones.
+    The data are written in a temporary file that replaces the file when the sink is closed at the end of the scraping.
+    :param caller: UEAssetScraper object.
+    :param filename: name of the file to save the data to.
+    :param save_to_format: format of the file to save the data. Sould be 'csv','tcsv' or 'json'.
+    """
+
+    def __init__(self, caller, filename: str, save_to_format: str = 'csv'):
+        super().__init__(caller)
+        self.filename: str = filename
+        self.save_to_format: str = save_to_format
+        self._temp_filename: str = filename + '.tmp'
+        self._output = None
+        self._writer = None
+        self._csv_field_name_list: list = []
+        self._assets_in_file: dict = {}
+        self._written_ids: set = set()  # ids of the assets already written, to avoid duplicates due to different UE versions
+
+    def open(self) -> bool:
+        """
+        Read the data already in the file and open it for writing.
+        :return: True if the sink can be used, False otherwise.
+        """
+        filename = self.filename
+        if self.save_to_format == 'tcsv' or self.save_to_format == 'csv':
+            # If the output file exists, we read its content to keep some data
+            try:
+                with open(filename, 'r', encoding='utf-8') as output:
+                    csv_file_content = csv.DictReader(output)
+                    # get the data (it's a dict)
+                    for csv_record in csv_file_content:
+                        # noinspection PyTypeChecker
+                        csv_record = dict(csv_record)
+                        if 'urlSlug' in csv_record:
+                            del (csv_record['urlSlug'])  # we remove the duplicate field to avoid future mistakes
+                        asset_id = csv_record['Asset_id']
+                        self._assets_in_file[asset_id] = csv_record
+            except (FileExistsError, OSError, UnicodeDecodeError, StopIteration):
+                self.caller._log(f'Could not read CSV record from the file {filename}', level='warning')
+            # open the temporary file for writing
+            self._output = open(self._temp_filename, 'w', encoding='utf-8')
+            self._writer = csv.writer(self._output, dialect='excel-tab' if self.save_to_format == 'tcsv' else 'excel', lineterminator='\n')
+
+            # get final the csv fields name list by
+            csv_field_name_list = get_csv_field_name_list()
+            columns_infos = gui_g.s.get_column_infos(DataSourceType.FILE)
+            sorted_cols_by_pos = dict(sorted(columns_infos.items(), key=lambda item: item[1]['pos']))
+            new_csv_field_name_list = []
+            # add the csv fields in the same order as in the columns_infos
+            for col_name in sorted_cols_by_pos:
+                if col_name in csv_field_name_list:
+                    new_csv_field_name_list.append(col_name)
+            # add the csv fields that could be missing in the columns_infos
+            for col_name in csv_field_name_list:
+                if col_name not in csv_field_name_list:
+                    new_csv_field_name_list.append(col_name)
+
+            # remove the "index copy" field from the list
+            if gui_g.s.index_copy_col_name in new_csv_field_name_list:
+                new_csv_field_name_list.remove(gui_g.s.index_copy_col_name)
+
+            self._csv_field_name_list = new_csv_field_name_list
+            self._writer.writerow(new_csv_field_name_list)
+        elif self.save_to_format == 'json':
+            # If the output file exists, we read its content to keep some data
+            try:
+                with open(filename, 'r', encoding='utf-8') as output:
+                    self._assets_in_file = json.load(output)
+            except (FileExistsError, OSError, UnicodeDecodeError, StopIteration, json.decoder.JSONDecodeError):
+                self.caller._log(f'Could not read Json record from the file {filename}', level='warning')
+            # open the temporary file for writing
+            # the json content is written asset by asset, so the whole content is never stored in memory
+            self._output = open(self._temp_filename, 'w', encoding='utf-8')
+            self._output.write('{')
+        else:
+            self.caller._log(f'The format {self.save_to_format} is not supported', level='error')
+            return False
+        return True
+
+    def _write(self, assets_data: list) -> bool:
+        if self._output is None:
+            return False
+        for asset_data in assets_data:
+            asset_id = asset_data['asset_id']
+            if asset_id in self._written_ids:
+                continue
+            self._written_ids.add(asset_id)
+            asset_data = convert_data_to_csv(sql_asset_data=asset_data)
+            if self._writer is not None:
+                for key in list(asset_data.keys()):
+                    # clean the asset data by removing the columns that are not in the csv field name list
+                    ignore_in_csv = is_on_state(csv_field_name=key, states=[CSVFieldState.ASSET_ONLY], default=False)
+                    if ignore_in_csv:
+                        self.caller._log(f'{key} must be ignored in CSV. Removing it from the asset data', 'debug')
+                        del (asset_data[key])
+
+                csv_record = []  # values must be sorted by the csv field name
+                for csv_field in self._csv_field_name_list:
+                    csv_record.append(asset_data.get(csv_field, gui_g.no_text_data))
+
+                if len(self._assets_in_file) > 0:
+                    csv_record_merged = self.caller._update_and_merge_csv_record_data(
+                        _asset_id=asset_data['Asset_id'],
+                        _csv_field_name_list=self._csv_field_name_list,
+                        _csv_record=csv_record,
+                        _assets_in_file=self._assets_in_file
+                    )
+                else:
+                    csv_record_merged = csv_record
+                self._writer.writerow(csv_record_merged)
+            else:
+                if len(self._assets_in_file) > 0:
+                    json_record_merged = self.caller._update_and_merge_json_record_data(
+                        (asset_id, asset_data), self._assets_in_file, gui_g.no_float_data, gui_g.no_bool_false_data
+                    )
+                else:
+                    json_record_merged = asset_data
+                try:
+                    separator = ',' if self.items_count > 0 else ''
+                    # same format as json.dump(content, indent=2) for the whole content
+                    json_record = json.dumps(json_record_merged, indent=2).replace('\n', '\n  ')
+                    self._output.write(f'{separator}\n  {json.dumps(json_record_merged["Asset_id"])}: {json_record}')
+                except (OSError, UnicodeEncodeError, TypeError) as error:
+                    message = f'Could not write Json record for {asset_id} into {self.filename}\nError:{error!r}'
+                    self.caller._log(message, level='error')
+                    continue
+            self.items_count += 1
+        return True
+
+    def close(self, last_run_content: dict = None) -> bool:
+        """
+        Close the file.
+        :param last_run_content: data of the last run. None if the scraping has been cancelled. In that case, the existing file is kept unchanged.
+        :return: True if OK, False otherwise.
+        """
+        if self._output is None:
+            return False
+        if self._writer is None:
+            self._output.write('\n}\n')
+        self._output.close()
+        self._output = None
+        if last_run_content is None:
+            os.remove(self._temp_filename)
+            return False
+        os.replace(self._temp_filename, self.filename)
+        self.caller._log(
+            f'\n======\n{self.items_count} assets have been saved (without duplicates due to different UE versions)\nOperation Finished\n======\n'
+        )
+        return self.is_ok
+
+
+class IngestLFS:
+    """
+    Read-only replacement of the UEVMLFS object in a worker process of the ingest, with the data used to parse the assets.
+    :param installed_assets: installed assets data, by app_name.
+    :param asset_sizes: sizes of the assets, by app_name.
+    """
+    get_app_name_from_asset_data = staticmethod(UEVMLFS.get_app_name_from_asset_data)
+
+    def __init__(self, installed_assets: dict, asset_sizes: dict):
+        self._installed_assets: dict = installed_assets
+        self._asset_sizes: dict = asset_sizes
+
+    def get_asset_size(self, app_name: str, default=0) -> int:
+        """
+        Get the size of an asset.
+        :param app_name: asset name.
+        :param default: default value to return if the asset is not found.
+        :return: size of the asset, default if not found.
+        """
+        return self._asset_sizes.get(app_name, default) if app_name else default
+
+    def get_installed_asset(self, app_name: str) -> Optional[InstalledAsset]:
+        """
+        Get the installed asset data.
+        :param app_name: asset name.
+        :return: installed asset or None if not found.
+        """
+        json_data = self._installed_assets.get(app_name) if app_name else None
+        return InstalledAsset.from_json(json_data) if json_data else None
+
+
+class IngestCore:
+    """
+    Minimal replacement of the AppCore object in a worker process of the ingest, with only what is needed to parse the assets.
+    :param installed_assets: installed assets data of the main process, by app_name.
+    :param asset_sizes: sizes of the assets of the main process, by app_name.
+
+    Notes:
+        The AppCore object is not sent to the workers: it can only be created on Windows and holds sessions, writers and executors that can't all be pickled.
+        Creating a new one in each worker would also write the config and the backup files.
+    """
+
+    def __init__(self, installed_assets: dict, asset_sizes: dict):
+        self.uevmlfs = IngestLFS(installed_assets, asset_sizes)
+        self.egs = EPCAPI()  # only used to build the urls and to extract the prices, no request is sent
+        self.ignored_logger = None  # the ignored assets are returned to the main process, that logs them
+        self.verbose_mode = False
+
+
+# scraper used to parse the assets in a worker process of the ingest (see load_from_json_files())
+_ingest_scraper = None
+
+
+def init_ingest_worker(
+    datasource_filename: str, use_database: bool, filter_category: str, engine_version_for_obsolete_assets: str, installed_assets: dict, asset_sizes: dict
+) -> None:
+    """
+    Initialize a worker process of the ingest of the asset store.
+    :param datasource_filename: name of the database of the main scraper.
+    :param use_database: whether the main scraper uses a database.
+    :param filter_category: category to filter the data.
+    :param engine_version_for_obsolete_assets: engine version used by the main scraper to check if an asset is obsolete.
+    :param installed_assets: installed assets data of the main process, by app_name.
+    :param asset_sizes: sizes of the assets of the main process, by app_name.
+
+    Notes:
+        Each worker has its own scraper and database connection. The database is only read by the workers.
+        The scraper uses an IngestCore object built from the data of the main process, instead of an AppCore object.
+    """
+    global _ingest_scraper
+    _ingest_scraper = UEAssetScraper(
+        datasource_filename=datasource_filename,
+        use_database=use_database,
+        max_threads=0,
+        load_from_files=True,
+        store_ids=True,
+        offline_mode=True,
+        core=IngestCore(installed_assets, asset_sizes),
+        filter_category=filter_category,
+    )
+    _ingest_scraper.engine_version_for_obsolete_assets = engine_version_for_obsolete_assets
+    if _ingest_scraper.use_database:
+        _ingest_scraper.asset_db_handler.load_tags_cache()
+
+
+def ingest_assets_batch(rows: list) -> (list, list, list, dict):
+    """
+    Decode and parse a batch of assets of the asset store, in a worker process of the ingest.
+    :param rows: list of (app_name, encoded json data).
+    :return: (list of parsed assets data, list of ignored app_names, list of scraped ids, dict of the new tags by id).
+    """
+    scraper = _ingest_scraper
+    scraper._ignored_asset_names = []
+    scraper._scraped_ids = []
+    parsed_assets_data = []
+    for _, blob in rows:
+        parsed_assets_data.extend(scraper._parse_data(AssetStore.decode(blob)))
+    new_tags = scraper.asset_db_handler.pop_tags_to_save() if scraper.use_database else {}
+    return parsed_assets_data, scraper._ignored_asset_names, scraper._scraped_ids, new_tags
+
+
 class UEAssetScraper:
     """
     A class that handles scraping data from the Unreal Engine Marketplace.
@@ -103,7 +504,7 @@ class UEAssetScraper:
     :param assets_per_page: number of items to retrieve per request. Defaults to 100.
     :param sort_by: field to sort by. Defaults to 'effectiveDate'.
     :param sort_order: sort order. Defaults to 'ASC'.
-    :param max_threads: maximum number of threads to use. Defaults to 8. Set to 0 to disable multithreading.
+    :param max_threads: maximum number of threads to use. Defaults to 8. Set to 0 to disable multithreading. Also limits the number of processes used to parse the assets when load_from_files is True.
     :param save_parsed_to_files: True to store data in json file. Defaults to True. Could create lots of files (1 file per asset).
     :param load_from_files: True to load the data from files instead of scraping it. Defaults to False. If set to True, save_parsed_to_files will be set to False and use_database will be set to True.
     :param keep_intermediate_files: True to keep the intermediate json files. Defaults to None. If None, the files will be kept only if debug_mode is True.
@@ -115,6 +516,11 @@ class UEAssetScraper:
     :param core: AppCore object. Defaults to None. If None, a new AppCore object will be created.
     :param timeout: timeout for the request. Could be a float or a tuple of float (connect timeout, read timeout).
     :param filter_category: category to filter the data. Defaults to '' (no filter).
+    :param incremental_sync: True to only scrap the assets added or updated since the last sync. Defaults to False. Needs use_database to be True.
+    :param collect_data: True to keep all the parsed data in the scraped_data property when running save(). Defaults to False. Could be memory consuming.
+
+    Notes:
+        When running save(), each parsed page is written in the database or in the file as soon as it's available, and then released.
     """
 
     logger = logging.getLogger(__name__.split('.')[-1])  # keep only the class name
@@ -140,20 +546,28 @@ class UEAssetScraper:
         progress_window=None,  # don't use a typed annotation here to avoid import
         core: AppCore = None,
         timeout: (float, float) = (7, 7),
-        filter_category: str = ''
+        filter_category: str = '',
+        incremental_sync: bool = False,
+        collect_data: bool = False
     ) -> None:
         self._last_run_filename: str = 'last_run.json'
+        self._ingest_batch_size: int = 200  # number of assets parsed by a process at once in load_from_json_files()
         self._urls_list_filename: str = 'urls_list.txt'
         self._threads_count: int = 0
         self._files_count: int = 0
         self._thread_executor = None
-        self._scraped_data = []  # the scraper scraped_data. Increased on each call to get_data_from_url(). Could be huge !!
+        self._scraped_data = []  # the scraper scraped_data. Increased on each call to get_data_from_url() if no sink is opened or if collect_data is True
+        self._sink: ScrapedDataSink = None  # where the parsed data are written during save()
+        self._items_count: int = 0  # number of parsed assets since the start of save()
+        self._last_parsed_asset: dict = {}
+        self._data_lock = Lock()
         self._ignored_asset_names = []
 
         self._data_source: str = datasource_filename
         self._scraped_ids = []  # store IDs of all items
         self._owned_asset_ids = []  # store IDs of all owned items
         self._urls = []  # list of all urls to scrap
+        self._sync_watermark: str = ''  # effectiveDate of the most recent asset found during an incremental sync
 
         self.use_database: bool = use_database
         self.start: int = start
@@ -175,9 +589,13 @@ class UEAssetScraper:
             self.core.egs.debug_mode = debug_mode
         self.timeout = timeout
         self.filter_category = filter_category
+        self.incremental_sync: bool = incremental_sync
+        self.collect_data: bool = collect_data
 
         self.asset_db_handler = None
         self.has_been_cancelled = False
+        # if not None, engine version used to check if an asset is obsolete instead of the one of the application (set in the worker processes)
+        self.engine_version_for_obsolete_assets: Optional[str] = None
 
         if not datasource_filename:
             message = 'Database mode is used but no database filename has been provided' if use_database else 'File mode is used but no filename has been provided'
@@ -186,16 +604,22 @@ class UEAssetScraper:
         if self.load_from_files:
             self.save_parsed_to_files = False  # no need to save if the source are the files , they won't be changes
             # self.use_database = True
+        if self.incremental_sync and not self.use_database:
+            self.incremental_sync = False
+            self._log('The incremental sync needs a database. A full scraping will be done instead', 'warning')
+        if self.incremental_sync:
+            self.clean_database = False  # the existing data are needed to detect the changes
 
         if (assets_per_page > 100) or (assets_per_page < 1):
             self.assets_per_page = 100
             self._log(f'assets_per_page must be between 1 and 100. Set to 100', 'error')
 
         message = f'UEAssetScraper initialized with max_threads= {max_threads}, start= {start}, stop= {stop}, assets_per_page= {assets_per_page}, sort_by= {sort_by}, sort_order= {sort_order}'
-        message += f'\nData will be load from files in {gui_g.s.assets_data_folder}' if self.load_from_files else ''
-        message += f'\nAsset Data will be saved in files in {gui_g.s.assets_data_folder}' if self.save_parsed_to_files else ''
-        message += f'\nOwned Asset Data will be saved in files in {gui_g.s.owned_assets_data_folder}' if self.save_parsed_to_files else ''
+        message += f'\nData will be load from the asset store in {gui_g.s.assets_data_folder}' if self.load_from_files else ''
+        message += f'\nAsset Data will be saved in the asset store in {gui_g.s.assets_data_folder}' if self.save_parsed_to_files else ''
+        message += f'\nOwned Asset Data will be saved in the asset store in {gui_g.s.owned_assets_data_folder}' if self.save_parsed_to_files else ''
         message += f'\nAsset Ids will be saved in {self._last_run_filename} or in database' if self.store_ids else ''
+        message += f'\nOnly the assets added or updated since the last sync will be scraped' if self.incremental_sync else ''
         if self.use_database:
             self.asset_db_handler = UEAssetDbHandler(self._data_source)
             message += f'\nData will be saved in DATABASE in {self._data_source}'
@@ -285,6 +709,16 @@ class UEAssetScraper:
 
         asset_db_handler = self.asset_db_handler
         use_database = self.use_database and asset_db_handler
+        preserved_fields = get_sql_preserved_fields()
+        existing_data = {}
+        if use_database:
+            # read the existing data of all the assets of the page in one query
+            uids = [asset.get('id', '') for asset in assets_json_data_from_egs if asset.get('id', '')]
+            try:
+                existing_data = asset_db_handler.get_assets_data(preserved_fields, uids)
+            except (Exception, ):
+                self._log(f'An error occurs with database when calling the get_assets_data method. Assets are skipped', level='error')
+                return returned_assets_json_data_parsed
         for one_asset_json_data_from_egs_ori in assets_json_data_from_egs:
             # !! ALL DATA HERE ARE STORED IN are already in json format. no need to decode them !!
             # WARNING: asset_data_ori WILL ALSO BE MODIFIED OUTSIDE the method and changed WILL BE SAVED in the json files
@@ -296,14 +730,7 @@ class UEAssetScraper:
                 # this should never occur
                 self._log(f'No id found for current asset. Passing to next asset', level='warning')
             else:
-                asset_existing_data = {}
-                if use_database:
-                    try:
-                        existing_data = asset_db_handler.get_assets_data(get_sql_preserved_fields(), uid)
-                    except (Exception, ):
-                        self._log(f'An error occurs with database when calling the get_assets_data method. Asset is skipped', level='error')
-                        continue
-                    asset_existing_data = existing_data.get(uid, {})
+                asset_existing_data = existing_data.get(uid, {})
                 categories = one_asset_json_data_from_egs_ori.get('categories', [])
 
                 # releases
@@ -476,13 +903,7 @@ class UEAssetScraper:
                 one_asset_json_data_parsed['date_added'] = asset_existing_data.get('date_added', date_now)
 
                 # obsolete
-                try:
-                    engine_version_for_obsolete_assets = (
-                        gui_g.UEVM_cli_ref.core.engine_version_for_obsolete_assets or gui_g.s.engine_version_for_obsolete_assets
-                    )
-                except (Exception, ):
-                    engine_version_for_obsolete_assets = None
-                one_asset_json_data_parsed['obsolete'] = is_asset_obsolete(supported_versions, engine_version_for_obsolete_assets)
+                one_asset_json_data_parsed['obsolete'] = is_asset_obsolete(supported_versions, self.get_engine_version_for_obsolete_assets())
 
                 # grab_result and old_grab_result
                 # old_grab_result = asset_existing_data.get(
@@ -502,7 +923,7 @@ class UEAssetScraper:
 
                 if asset_existing_data and use_database:
                     # for field in get_sql_user_fields():
-                    for field in get_sql_preserved_fields():
+                    for field in preserved_fields:
                         existing_value = asset_existing_data.get(field, None)
                         if existing_value:
                             one_asset_json_data_parsed[field] = existing_value
@@ -555,24 +976,36 @@ class UEAssetScraper:
         # end for asset_data in json_data['data']['elements']:
         return returned_assets_json_data_parsed
 
-    def _save_final_in_db(self, last_run_content: dict) -> bool:
+    def get_engine_version_for_obsolete_assets(self) -> Optional[str]:
         """
-        Stores the asset data in the database.
+        Get the engine version used to check if an asset is obsolete.
+        :return: engine version, or None if it can't be found.
         """
-        if not self.use_database:
-            return False
-        # convert the list of ids to a string for the database only
-        last_run_content['scraped_ids'] = check_and_convert_list_to_str(self._scraped_ids) if self.store_ids else ''
-
-        if self.clean_database:
-            # next line will delete all assets in the database
-            if box_yesno(
-                'Current settings and params are set to delete all existing data before rebuilding. All user fields values will be lost. Are you sure your want to do that ?'
-            ):
-                self.asset_db_handler.delete_all_assets(keep_added_manually=True)
-        is_ok = self.asset_db_handler.set_assets(self._scraped_data)
-        self.asset_db_handler.save_last_run(last_run_content)
-        return is_ok
+        if self.engine_version_for_obsolete_assets is not None:
+            return self.engine_version_for_obsolete_assets
+        try:
+            return gui_g.UEVM_cli_ref.core.engine_version_for_obsolete_assets or gui_g.s.engine_version_for_obsolete_assets
+        except (Exception, ):
+            return None
+
+    def _add_parsed_data(self, assets_data: list) -> None:
+        """
+        Write a page of parsed data into the sink (if opened) and keep it in the scraped_data property if needed.
+        :param assets_data: list of parsed assets data.
+        """
+        if not assets_data:
+            return
+        with self._data_lock:
+            self._items_count += len(assets_data)
+            self._last_parsed_asset = assets_data[-1]
+        if self._sink is not None:
+            self._sink.write(assets_data)
+            if self.collect_data:
+                # during save(), the data are collected in a flat list of assets
+                self._scraped_data.extend(assets_data)
+            return
+        # outside save(), the data are kept by page (see pop_last_scraped_data())
+        self._scraped_data.append(assets_data)
 
     def _update_and_merge_csv_record_data(self, _asset_id: str, _csv_field_name_list: [], _csv_record: [], _assets_in_file) -> list:
         """
@@ -681,126 +1114,6 @@ class UEAssetScraper:
 
     # end def update_and_merge_json_record_data
 
-    def _save_final_in_file(self, filename: str = '', save_to_format: str = 'csv') -> bool:
-        """
-        Save the scraped data into a file.
-        :param filename: name of the file to save the data to. Used only when use_database is False.
-        :param save_to_format: format of the file to save the data. Sould be 'csv','tcsv' or 'json'. Used only when use_database is False.
-        :return: True if the data have been saved, False otherwise.
-        """
-        assets_to_output = {}
-        asset_count = 0
-        assets_in_file = {}
-        output = None
-        self.progress_window.reset(new_value=0, new_text="Converting data to csv...It could take some time", new_max_value=len(self._scraped_data))
-        for asset_data in self._scraped_data:
-            if not self.progress_window.update_and_continue(increment=1):
-                return False
-            asset_id = asset_data['asset_id']
-            assets_to_output[asset_id] = convert_data_to_csv(sql_asset_data=asset_data)
-
-        if save_to_format == 'tcsv' or save_to_format == 'csv':
-            # If the output file exists, we read its content to keep some data
-            try:
-                with open(filename, 'r', encoding='utf-8') as output:
-                    csv_file_content = csv.DictReader(output)
-                    # get the data (it's a dict)
-                    for csv_record in csv_file_content:
-                        # noinspection PyTypeChecker
-                        csv_record = dict(csv_record)
-                        if 'urlSlug' in csv_record:
-                            del (csv_record['urlSlug'])  # we remove the duplicate field to avoid future mistakes
-                        asset_id = csv_record['Asset_id']
-                        assets_in_file[asset_id] = csv_record
-                    output.close()
-            except (FileExistsError, OSError, UnicodeDecodeError, StopIteration):
-                self._log(f'Could not read CSV record from the file {filename}', level='warning')
-            # reopen file for writing
-            output = open(filename, 'w', encoding='utf-8')
-            writer = csv.writer(output, dialect='excel-tab' if save_to_format == 'tcsv' else 'excel', lineterminator='\n')
-
-            # get final the csv fields name list by
-            csv_field_name_list = get_csv_field_name_list()
-            columns_infos = gui_g.s.get_column_infos(DataSourceType.FILE)
-            sorted_cols_by_pos = dict(sorted(columns_infos.items(), key=lambda item: item[1]['pos']))
-            new_csv_field_name_list = []
-            # add the csv fields in the same order as in the columns_infos
-            for col_name in sorted_cols_by_pos:
-                if col_name in csv_field_name_list:
-                    new_csv_field_name_list.append(col_name)
-            # add the csv fields that could be missing in the columns_infos
-            for col_name in csv_field_name_list:
-                if col_name not in csv_field_name_list:
-                    new_csv_field_name_list.append(col_name)
-
-            # remove the "index copy" field from the list
-            if gui_g.s.index_copy_col_name in new_csv_field_name_list:
-                new_csv_field_name_list.remove(gui_g.s.index_copy_col_name)
-
-            writer.writerow(new_csv_field_name_list)
-            self.progress_window.reset(new_value=0, new_text="Writing assets into csv file...", new_max_value=len(assets_to_output.items()))
-            for asset_id, asset_data in assets_to_output.items():
-                if not self.progress_window.update_and_continue(increment=1):
-                    return False
-                for key in asset_data.keys():
-                    # clean the asset data by removing the columns that are not in the csv field name list
-                    ignore_in_csv = is_on_state(csv_field_name=key, states=[CSVFieldState.ASSET_ONLY], default=False)
-                    if ignore_in_csv:
-                        self._log(f'{key} must be ignored in CSV. Removing it from the asset data', 'debug')
-                        del (asset_data[key])
-
-                csv_record = []  # values must be sorted by the csv field name
-                for csv_field in new_csv_field_name_list:
-                    csv_record.append(asset_data.get(csv_field, gui_g.no_text_data))
-
-                if len(assets_in_file) > 0:
-                    csv_record_merged = self._update_and_merge_csv_record_data(
-                        _asset_id=asset_data['Asset_id'],
-                        _csv_field_name_list=new_csv_field_name_list,
-                        _csv_record=csv_record,
-                        _assets_in_file=assets_in_file
-                    )
-                else:
-                    csv_record_merged = csv_record
-                asset_count += 1
-                writer.writerow(csv_record_merged)
-
-        elif save_to_format == 'json':
-            # TODO: test the json result file
-            # If the output file exists, we read its content to keep some data
-            try:
-                with open(filename, 'r', encoding='utf-8') as output:
-                    assets_in_file = json.load(output)
-            except (FileExistsError, OSError, UnicodeDecodeError, StopIteration, json.decoder.JSONDecodeError):
-                self._log(f'Could not read Json record from the file {filename}', level='warning')
-            # reopen file for writing
-            output = open(filename, 'w', encoding='utf-8')
-            json_content = {}
-            self.progress_window.reset(new_value=0, new_text="Writing assets into json file...", new_max_value=len(assets_to_output.items()))
-            for asset_id, asset_data in assets_to_output:
-                if not self.progress_window.update_and_continue(increment=1):
-                    return False
-                if len(assets_in_file) > 0:
-                    json_record_merged = self._update_and_merge_json_record_data(
-                        asset_data, assets_in_file, gui_g.no_float_data, gui_g.no_bool_false_data
-                    )
-                else:
-                    json_record_merged = asset_data
-                try:
-                    asset_id = json_record_merged['Asset_id']
-                    json_content[asset_id] = json_record_merged
-                    asset_count += 1
-                except (OSError, UnicodeEncodeError, TypeError) as error:
-                    message = f'Could not write Json record for {asset_id} into {filename}\nError:{error!r}'
-                    self._log(message, level='error')
-            json.dump(json_content, output, indent=2)
-
-        # close the opened file
-        if output is not None:
-            output.close()
-        self._log(f'\n======\n{asset_count} assets have been saved (without duplicates due to different UE versions)\nOperation Finished\n======\n')
-        return True
-
     def _stop_executor(self) -> None:
         """
         Cancel all outstanding tasks and shut down the executor.
@@ -816,6 +1129,137 @@ class UEAssetScraper:
         #     self.progress_window.close_window()  # must be done here because we will never return to the caller
         #     self._stop_executor()
 
+    async def _scrap_urls_async(self) -> None:
+        """
+        Scrap all the urls using an asyncio pipeline.
+
+        Notes:
+            The urls are downloaded in the threads of self._thread_executor, at most self._threads_count at once
+            and at most gui_g.s.scraping_requests_per_second per second.
+            The downloaded data are parsed in a separated thread, so the parsing of a page is done while the next ones are downloaded.
+            The results are handled (and the progress window updated) in the order the urls are completed, not in the order they are submitted.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self._threads_count)
+        rate_limiter = TokenBucket(rate=gui_g.s.scraping_requests_per_second, capacity=self._threads_count)
+        parse_queue = asyncio.Queue()
+        # only one thread for parsing because it uses the database connection
+        parse_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='Asset_Parser')
+
+        def _log_task_error(message: str) -> None:
+            self._log(message, 'warning')
+            if self.core.scrap_asset_logger:
+                self.core.scrap_asset_logger.warning(message)
+
+        def _update_progress(url: str) -> bool:
+            if self.has_been_cancelled:
+                return False
+            if not self.progress_window.update_and_continue(increment=1, text=f'Scraping {gui_fn.shorten_text(url, limit=60)}'):
+                self.progress_window.stop_execution()
+                self.has_been_cancelled = True
+                return False
+            return True
+
+        async def _fetch(url: str) -> (str, GetDataResult, dict):
+            async with semaphore:
+                await rate_limiter.acquire()
+                if self.has_been_cancelled or not self.progress_window.continue_execution:
+                    return url, GetDataResult.CANCELLED, {}
+                try:
+                    result, json_data = await asyncio.wait_for(
+                        loop.run_in_executor(self._thread_executor, self._fetch_json_data, url), timeout=gui_g.s.timeout_for_scraping
+                    )
+                except asyncio.TimeoutError:
+                    _log_task_error(f'A Timeout error occured with url {url}')
+                    return url, GetDataResult.TIMEOUT, {}
+                return url, result, json_data
+
+        async def _parse_worker() -> None:
+            while True:
+                item = await parse_queue.get()
+                if item is None:
+                    return
+                url, json_data = item
+                if self.has_been_cancelled:
+                    continue
+                result = await loop.run_in_executor(parse_executor, self._process_json_data, url, json_data)
+                if result != GetDataResult.OK:
+                    _log_task_error(f'The data from url {url} could not be processed ({result.name})')
+                _update_progress(url)
+
+        parse_task = asyncio.create_task(_parse_worker())
+        fetch_tasks = [asyncio.create_task(_fetch(url)) for url in self._urls]
+        try:
+            for next_done in asyncio.as_completed(fetch_tasks):
+                url, result, json_data = await next_done
+                if result == GetDataResult.OK:
+                    await parse_queue.put((url, json_data))
+                else:
+                    if result != GetDataResult.CANCELLED:
+                        _log_task_error(f'Could not get data from url {url} ({result.name})')
+                    _update_progress(url)
+                if self.has_been_cancelled:
+                    break
+        finally:
+            for task in fetch_tasks:
+                task.cancel()
+            await parse_queue.put(None)
+            await parse_task
+            parse_executor.shutdown(wait=True)
+            if self.has_been_cancelled:
+                self._stop_executor()
+
+    def _scrap_incremental(self) -> int:
+        """
+        Scrap only the assets added or updated since the last sync, walking the marketplace listing from the most recent asset.
+        :return: number of pages read or -1 if the process has been interrupted or if an error occured.
+
+        Notes:
+            The listing is sorted by effectiveDate DESC. The process stops at the first page where all the assets are already in the database
+            and have not been updated since the watermark saved by the previous sync (see the last_run table).
+            Only the new or updated assets are parsed and stored in the scraped_data property.
+        """
+        if self.offline_mode:
+            self._log('The offline mode is active. No online data could be retreived')
+            return -1
+        watermark = self.asset_db_handler.get_last_sync_watermark()
+        self._sync_watermark = watermark
+        egs_available_assets_count = self.core.egs.get_available_assets_count()
+        if self.stop <= 0 < egs_available_assets_count:
+            self.stop = egs_available_assets_count
+        pages_max = max(1, -(-(self.stop - self.start) // self.assets_per_page))
+        self._urls = []
+        self._files_count = 0
+        self._log(f'Incremental sync from the watermark "{watermark}"' if watermark else 'No previous sync found. All the pages will be scraped')
+        self.progress_window.reset(new_value=0, new_text='Synchronizing with the marketplace', new_max_value=pages_max)
+        pages_count = 0
+        for start in range(self.start, self.stop, self.assets_per_page):
+            if not self.progress_window.update_and_continue(value=pages_count, text=f'Synchronizing page {pages_count + 1} (max {pages_max})'):
+                self.has_been_cancelled = True
+                return -1
+            url = self.core.egs.get_scrap_url(start, self.assets_per_page, 'effectiveDate', 'DESC')
+            self._urls.append(url)
+            pages_count += 1
+            result, json_data_from_egs_url = self._fetch_json_data(url)
+            if result != GetDataResult.OK:
+                self._log(f'Could not get data from url {url} ({result.name}). The sync is stopped', 'error')
+                return -1
+            elements = json_data_from_egs_url['data']['elements']
+            existing_ids = self.asset_db_handler.get_assets_data(['id'], [element.get('id', '') for element in elements])
+            changed_elements = [
+                element for element in elements if element.get('id', '') not in existing_ids or element.get('effectiveDate', '') > watermark
+            ]
+            for element in elements:
+                self._sync_watermark = max(self._sync_watermark, element.get('effectiveDate', ''))
+            if not changed_elements:
+                self._log(f'All the assets of page {pages_count} are up to date. The sync is complete')
+                break
+            self._log(f'{len(changed_elements)} new or updated assets found in page {pages_count}')
+            json_data_from_egs_url['data']['elements'] = changed_elements
+            if self._process_json_data(url, json_data_from_egs_url) != GetDataResult.OK:
+                return -1
+        return pages_count
+
     def gather_all_assets_urls(self, egs_available_assets_count: int = -1, empty_list_before=True, save_result=True) -> int:
         """
         Gather all the URLs (with pagination) to be parsed and stores them in a list for further use.
@@ -877,16 +1321,28 @@ class UEAssetScraper:
         if self.offline_mode:
             self._log('The offline mode is active. No online data could be retreived')
             return GetDataResult.BAD_CONTEXT
+        if self._threads_count > 1:
+            # add a delay when multiple threads are used
+            time.sleep(random.uniform(0.5, 1.5))
+        result, json_data_from_egs_url = self._fetch_json_data(url)
+        if result != GetDataResult.OK:
+            return result
+        return self._process_json_data(url, json_data_from_egs_url)
+
+    def _fetch_json_data(self, url: str) -> (GetDataResult, dict):
+        """
+        Get the json data from the given url. This is the "network" part of get_data_from_url().
+        :param url: url to grab the data from.
+        :return: (GetDataResult value depending on the result, json data).
+        """
         thread_data = ''
         no_error = False
         json_data_from_egs_url = {}
         try:
             if self._threads_count > 1:
-                # add a delay when multiple threads are used
-                time.sleep(random.uniform(0.5, 1.5))
                 thread = current_thread()
                 thread_data = f' ==> By Thread name={thread.name}'
-            message = f'--- START scraping data from {url}{thread_data}{thread_state}'
+            message = f'--- START scraping data from {url}{thread_data} RUNNING...'
             self._log(message)
             if self.core.scrap_asset_logger:
                 self.core.scrap_asset_logger.info('\n' + message)
@@ -930,11 +1386,11 @@ class UEAssetScraper:
                 if error_code == GetDataResult.TIMEOUT:
                     # mainly occurs because the timeout is too short for the number of asset to scrap
                     # the caller will try a bigger timeout
-                    return error_code
+                    return error_code, {}
                 elif 'common.server_error' in error_code:
                     # mainly occurs because the number of asset to scrap is too big
                     # the caller will try a smaller number
-                    return GetDataResult.ERROR_431
+                    return GetDataResult.ERROR_431, {}
                 elif error_code == GetDataResult.JSON_DECODE:
                     message = f'Json data can not be read from from url {url}'
                     self._log(message, 'error')
@@ -947,7 +1403,7 @@ class UEAssetScraper:
                     self._log(message, 'error')
                     if self.core.scrap_asset_logger:
                         self.core.scrap_asset_logger.warning(message)
-                return GetDataResult.ERROR
+                return GetDataResult.ERROR, {}
             try:
                 # when multiple assets are returned, the data is in the 'elements' key
                 count = len(json_data_from_egs_url['data']['elements'])
@@ -956,6 +1412,23 @@ class UEAssetScraper:
                 # when only one asset is returned, the data is in the 'data' key
                 self._log(f'==> parsed url {url} for one asset')
                 json_data_from_egs_url['data']['elements'] = [json_data_from_egs_url['data']['data']]
+        except (Exception, ) as error:
+            message = f'An Error occurs when getting data from url {url}: {error!r}'
+            self._log(message, 'warning')
+            if self.core.scrap_asset_logger:
+                self.core.scrap_asset_logger.warning(message)
+            return GetDataResult.ERROR, {}
+        return GetDataResult.OK, json_data_from_egs_url
+
+    def _process_json_data(self, url: str, json_data_from_egs_url: dict) -> GetDataResult:
+        """
+        Save and parse the json data got from the given url, and stores the result in the scraped_data property.
+        This is the "CPU" part of get_data_from_url().
+        :param url: url the data come from.
+        :param json_data_from_egs_url: json data to process.
+        :return: GetDataResult value depending on the result
+        """
+        try:
             if json_data_from_egs_url:
                 if self.keep_intermediate_files:
                     # store the GLOBAL result file in the raw format
@@ -970,7 +1443,8 @@ class UEAssetScraper:
                     self.save_to_file(filename=filename, data=json_data_from_egs_url, is_global=True)
 
                 if self.save_parsed_to_files:
-                    # store the RAW DATA of each asset in a file
+                    # store the RAW DATA of each asset in the asset store
+                    asset_store = AssetStore.get_store(gui_g.s.assets_data_folder)
                     for index, asset_data in enumerate(json_data_from_egs_url['data']['elements']):
                         filename, app_name = self.core.uevmlfs.get_filename_from_asset_data(asset_data)
                         if app_name in self._ignored_asset_names:
@@ -979,8 +1453,10 @@ class UEAssetScraper:
                             #     self.core.ignored_logger.info(app_name)
                             continue
                         asset_data['app_name'] = app_name
-                        self.save_to_file(filename=filename, data=asset_data, is_owned=False)
+                        # the key is the name the json file had, so the data of the assets without appId are still stored separately
+                        asset_store.put(os.path.splitext(filename)[0], asset_data)
                         self._files_count += 1
+                    asset_store.commit()
                 try:
                     parsed_assets_data = self._parse_data(json_data_from_egs_url)  # could return a dict or a list of dict
                 except (Exception, ) as error:
@@ -989,10 +1465,7 @@ class UEAssetScraper:
                     if self.core.scrap_asset_logger:
                         self.core.scrap_asset_logger.warning(message)
                     return GetDataResult.ERROR
-                if isinstance(parsed_assets_data, list):
-                    self._scraped_data.append(parsed_assets_data)
-                else:
-                    self._scraped_data.append([parsed_assets_data])
+                self._add_parsed_data(parsed_assets_data if isinstance(parsed_assets_data, list) else [parsed_assets_data])
 
                 if self.core.scrap_asset_logger:
                     self.core.scrap_asset_logger.info(f'--- END scraping from {url}: {len(json_data_from_egs_url)} asset ADDED to scraped_data')
@@ -1043,57 +1516,48 @@ class UEAssetScraper:
 
     def load_from_json_files(self, owned_assets_only=False) -> int:
         """
-        Load all JSON data retrieved from the Unreal Engine Marketplace API to paginated files.
+        Load all JSON data retrieved from the Unreal Engine Marketplace API and saved in the asset store.
         :param owned_assets_only: whether to only the owned assets are scraped.
-        :return: number of files loaded or -1 if the process has been interrupted.
+        :return: number of assets loaded or -1 if the process has been interrupted.
+
+        Notes:
+            The json files of the former versions are imported into the asset store at startup (see UEVMLFS.migrate_assets_data_files()).
+            If the threads are enabled, the assets are decoded and parsed in a pool of processes (see _ingest_in_processes()).
         """
         start_time = time.time()
         text_saved = self.progress_window.get_text()
         self._files_count = 0
         self._scraped_ids = []
         self._scraped_data = []
+        self._items_count = 0
         folder = gui_g.s.owned_assets_data_folder if owned_assets_only else gui_g.s.assets_data_folder
-        files = os.listdir(folder)
-        files_count = len(files)
+        asset_store = AssetStore.get_store(folder)
+        files_count = len(asset_store)
         # Note: this data have the same structure as the table last_run inside the method UEAsset.create_tables()
-        self._log(f'Loading {files_count} files from {folder}')
-        self.progress_window.reset(new_value=0, new_text='Loading asset data from json files', new_max_value=files_count)
-        for filename in files:
-            if filename.endswith('.json') and filename != self._last_run_filename:
-                # self._log(f'Loading {filename}','debug')
-                with open(path_join(folder, filename), 'r', encoding='utf-8') as file:
-                    try:
-                        json_data_from_egs_file = json.load(file)
-                    except json.decoder.JSONDecodeError as error:
-                        self._log(f'The following error occured when loading data from {filename}:{error!r}', 'warning')
-                        continue
-                    parsed_assets_data = self._parse_data(json_data_from_egs_file)  # could return a dict or a list of dict
-                    if isinstance(parsed_assets_data, list):
-                        for parsed_asset_data in parsed_assets_data:
-                            self._scraped_data.append(parsed_asset_data)
-                    else:
-                        self._scraped_data.append(parsed_assets_data)
-                self._files_count += 1
-                if not self.progress_window.update_and_continue(increment=1):
-                    return -1
-                if gui_g.s.testing_switch == 1 and self._files_count >= max(int(gui_g.s.testing_assets_limit / 10), 1000):
-                    break
-                # if self.progress_window.is_fake:
-                #    self._log(f'{self._files_count}/{files_count} files loaded', 'info')  # could flood the console
+        self._log(f'Loading {files_count} assets from {asset_store.db_path}')
+        self.progress_window.reset(new_value=0, new_text='Loading asset data from the asset store', new_max_value=files_count)
+        max_count = max(int(gui_g.s.testing_assets_limit / 10), 1000) if gui_g.s.testing_switch == 1 else files_count
+        processes_count = min(self.max_threads, os.cpu_count() or 1, math.ceil(max_count / self._ingest_batch_size))
+        if processes_count > 1:
+            is_ok = self._ingest_in_processes(asset_store, max_count, processes_count)
+        else:
+            is_ok = self._ingest(asset_store, max_count)
+        if not is_ok:
+            return -1
 
-        message = f'It took {(time.time() - start_time):.3f} seconds to load the data from {self._files_count} files'
+        message = f'It took {(time.time() - start_time):.3f} seconds to load the data of {self._files_count} assets'
         self._log(message)
 
         # debug an instance of asset (here the last one). MUST BE RUN OUTSIDE THE LOOP ON ALL ASSETS
-        if (self.core.verbose_mode or gui_g.s.debug_mode) and self._scraped_data:
-            debug_parsed_data(self._scraped_data[-1], DataSourceType.DATABASE)
+        if (self.core.verbose_mode or gui_g.s.debug_mode) and self._last_parsed_asset:
+            debug_parsed_data(self._last_parsed_asset, DataSourceType.DATABASE)
 
         # save results in the last_run file
         content = {
             'date': str(datetime.now()),
             'mode': 'load_owned' if owned_assets_only else 'load',
             'files_count': self._files_count,
-            'items_count': len(self._scraped_data),
+            'items_count': self._items_count,
             'scraped_ids': self._scraped_ids if self.store_ids else ''
         }
         filename = path_join(folder, self._last_run_filename)
@@ -1104,6 +1568,101 @@ class UEAssetScraper:
         # self._save_in_db(last_run_content=content) # duplicate with a caller
         return self._files_count
 
+    def _ingest(self, asset_store: AssetStore, max_count: int) -> bool:
+        """
+        Parse the assets of the asset store in the current thread.
+        :param asset_store: asset store to read.
+        :param max_count: maximal number of assets to parse.
+        :return: False if the process has been interrupted, True otherwise.
+        """
+        for app_name, json_data_from_egs_file in asset_store.iter_data():
+            # self._log(f'Loading {app_name}','debug')
+            parsed_assets_data = self._parse_data(json_data_from_egs_file)  # could return a dict or a list of dict
+            self._add_parsed_data(parsed_assets_data if isinstance(parsed_assets_data, list) else [parsed_assets_data])
+            self._files_count += 1
+            if not self.progress_window.update_and_continue(increment=1):
+                return False
+            if self._files_count >= max_count:
+                break
+            # if self.progress_window.is_fake:
+            #    self._log(f'{self._files_count}/{files_count} assets loaded', 'info')  # could flood the console
+        return True
+
+    def _ingest_in_processes(self, asset_store: AssetStore, max_count: int, processes_count: int) -> bool:
+        """
+        Parse the assets of the asset store in a pool of processes.
+        :param asset_store: asset store to read.
+        :param max_count: maximal number of assets to parse.
+        :param processes_count: number of processes to use.
+        :return: False if the process has been interrupted, True otherwise.
+
+        Notes:
+            The main thread reads the encoded data from the store by batches and sends them to the processes (see ingest_assets_batch()).
+            The processes decode and parse the data, reading the database if needed. Only 2 batches by process are in flight, to limit the memory used.
+            The results are merged, in the order of the store, and written in the sink in a single bulk write once all the batches are parsed.
+            If the processes can't be used, nothing has been written yet, so the assets are parsed in the current thread instead.
+        """
+        self._log(f'Parsing the assets in {processes_count} processes')
+        batches = asset_store.iter_raw_batches(self._ingest_batch_size)
+        results = {}
+        futures = {}
+        batch_index = 0
+        submitted_count = 0
+        is_ok = True
+        has_failed = False
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes_count,
+            initializer=init_ingest_worker,
+            initargs=(
+                self._data_source, self.use_database, self.filter_category, self.get_engine_version_for_obsolete_assets() or '',
+                self.core.uevmlfs.get_installed_assets(), self.core.uevmlfs.asset_sizes or {}
+            )
+        )
+        try:
+            while is_ok:
+                while len(futures) < processes_count * 2 and submitted_count < max_count:
+                    rows = next(batches, None)
+                    if not rows:
+                        break
+                    rows = rows[:max_count - submitted_count]
+                    futures[executor.submit(ingest_assets_batch, rows)] = (batch_index, len(rows))
+                    batch_index += 1
+                    submitted_count += len(rows)
+                if not futures:
+                    break
+                done, _ = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    index, rows_count = futures.pop(future)
+                    results[index] = future.result()
+                    self._files_count += rows_count
+                    if not self.progress_window.update_and_continue(increment=rows_count):
+                        is_ok = False
+        except (Exception, ) as error:
+            self._log(f'The assets could not be parsed in several processes: {error!r}. They will be parsed in the current thread', 'warning')
+            self._files_count = 0
+            has_failed = True
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if has_failed:
+            return self._ingest(asset_store, max_count)
+        if not is_ok:
+            return False
+
+        all_assets_data = []
+        for index in sorted(results):
+            parsed_assets_data, ignored_asset_names, scraped_ids, new_tags = results[index]
+            all_assets_data.extend(parsed_assets_data)
+            for app_name in ignored_asset_names:
+                self._ignored_asset_names.append(app_name)
+                if self.core.ignored_logger:
+                    self.core.ignored_logger.info(app_name)
+            if self.store_ids:
+                self._scraped_ids.extend(scraped_ids)
+            for uid, name in new_tags.items():
+                self.asset_db_handler.save_tag({'id': uid, 'name': name})
+        self._add_parsed_data(all_assets_data)
+        return True
+
     def save(self, owned_assets_only=False, save_last_run_file=True, save_to_format: str = 'csv') -> bool:
         """
         Save all JSON data retrieved from the Unreal Engine Marketplace API to paginated files.
@@ -1116,8 +1675,35 @@ class UEAssetScraper:
             Execute the scraper. Load from files or downloads the items from the URLs and stores them in the scraped_data property.
             The execution is done in parallel using threads.
             If self.urls is None or empty, gather_urls() will be called first.
+            During the execution, the tags are kept in memory and saved in the database at once at the end.
+        """
+        if self.use_database:
+            self.asset_db_handler.load_tags_cache()
+        try:
+            return self._save(owned_assets_only=owned_assets_only, save_last_run_file=save_last_run_file, save_to_format=save_to_format)
+        finally:
+            if self._sink is not None:
+                # the process has been interrupted, the sink is closed without saving the last run data
+                self._sink.close()
+                self._sink = None
+            if self.use_database:
+                self.asset_db_handler.flush_tags_cache()
+
+    def _save(self, owned_assets_only=False, save_last_run_file=True, save_to_format: str = 'csv') -> bool:
+        """
+        Execute the scraper and save the data. See save() for details.
+        :param owned_assets_only: whether to only the owned assets are scraped.
+        :param save_last_run_file: whether the last_run file is saved.
+        :param save_to_format: format of the file to save the data.
+        :return: True if OK, False if no.
         """
         asset_loaded = 0
+        self._items_count = 0
+        self._last_parsed_asset = {}
+        self._sink = DatabaseSink(self) if self.use_database else FileSink(self, self.data_source_filename, save_to_format)
+        if not self._sink.open():
+            self._sink = None
+            return False
         if self.load_from_files:
             asset_loaded = self.load_from_json_files()
             if asset_loaded == -1:
@@ -1130,7 +1716,15 @@ class UEAssetScraper:
         else:
             tags_count_saved, rating_count_saved = 0, 0
 
-        if asset_loaded <= 0:
+        if asset_loaded <= 0 and self.incremental_sync:
+            self.load_from_files = False
+            self.save_parsed_to_files = True
+            start_time = time.time()
+            pages_count = self._scrap_incremental()
+            if pages_count == -1:
+                return False
+            self._log(f'It took {(time.time() - start_time):.3f} seconds to sync {pages_count} pages and get {self._items_count} new or updated assets')
+        elif asset_loaded <= 0:
             # no data, ie no files loaded, so we have to save them
             self.load_from_files = False
             self.save_parsed_to_files = True
@@ -1187,7 +1781,15 @@ class UEAssetScraper:
             #                     quit_on_close=False)
             # pw.set_activation(False)
             self.has_been_cancelled = False
-            if self.max_threads > 0 and url_count > 0:
+            if self.max_threads > 0 and url_count > 0 and gui_g.s.use_async_scraping:
+                self._threads_count = min(self.max_threads, url_count)
+                # async processing COULD be stopped by the progress window
+                self.progress_window.show_btn_stop()
+                self._thread_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self._threads_count, thread_name_prefix='Asset_Scaper')
+                self.progress_window.reset(new_value=0, new_text='Scraping data from URLs', new_max_value=url_count)
+                asyncio.run(self._scrap_urls_async())
+                self._thread_executor.shutdown(wait=False)
+            elif self.max_threads > 0 and url_count > 0:
                 self._threads_count = min(self.max_threads, url_count)
                 # threading processing COULD be stopped by the progress window
                 self.progress_window.show_btn_stop()
@@ -1227,14 +1829,13 @@ class UEAssetScraper:
             else:
                 message = f'It took {(time.time() - start_time):.3f} seconds to download {len(self._urls)} urls'
             self._log(message)
-            # format the list to be 1 long list rather than multiple lists nested in a list - [['1'], ['2'], ...] -> ['1','2', ...]
-            self._scraped_data = list(chain.from_iterable(self._scraped_data))
 
             # debug an instance of asset (here the last one). MUST BE RUN OUTSIDE THE LOOP ON ALL ASSETS
-            if (self.core.verbose_mode or gui_g.s.debug_mode) and self._scraped_data:
-                debug_parsed_data(self._scraped_data[-1], DataSourceType.DATABASE)
+            if (self.core.verbose_mode or gui_g.s.debug_mode) and self._last_parsed_asset:
+                debug_parsed_data(self._last_parsed_asset, DataSourceType.DATABASE)
 
         if self.use_database:
+            self.asset_db_handler.flush_tags_cache(disable_cache=False)
             tags_count = self.asset_db_handler.get_rows_count('tags')
             rating_count = self.asset_db_handler.get_rows_count('ratings')
             self._log(f'{tags_count - tags_count_saved} tags and {rating_count - rating_count_saved} ratings have been added to the database.')
@@ -1245,10 +1846,11 @@ class UEAssetScraper:
         # Note: this data have the same structure as the table last_run inside the method UEAsset.create_tables()
         content = {
             'date': str(datetime.now()),
-            'mode': 'save_owned' if owned_assets_only else 'save',
+            'mode': 'sync' if self.incremental_sync else 'save_owned' if owned_assets_only else 'save',
             'files_count': self._files_count,
-            'items_count': len(self._scraped_data),
-            'scraped_ids': self._scraped_ids if self.store_ids else ''
+            'items_count': self._items_count,
+            'scraped_ids': self._scraped_ids if self.store_ids else '',
+            'sync_watermark': self._sync_watermark if self.incremental_sync else ''
         }
         # self.progress_window.reset(new_value=0, new_text='Saving assets into files', new_max_value=len(self._scraped_data))
         # self._files_count = 0
@@ -1267,12 +1869,10 @@ class UEAssetScraper:
                 json.dump(content, file)
 
         start_time = time.time()
-        if self.use_database:
-            self.progress_window.reset(new_value=0, new_text='Saving into database. It could take some time...', new_max_value=None)
-            is_ok = self._save_final_in_db(last_run_content=content)
-        else:
-            self.progress_window.reset(new_value=0, new_text='Saving into file. It could take some time...', new_max_value=None)
-            is_ok = self._save_final_in_file(self.data_source_filename, save_to_format)
+        # the data have already been written page by page, we only need to close the sink
+        self.progress_window.reset(new_value=0, new_text='Finalizing the data saving...', new_max_value=None)
+        is_ok = self._sink.close(last_run_content=content)
+        self._sink = None
         message = f'It took {(time.time() - start_time):.3f} seconds to save the data in {self.data_source_filename}'
         self._log(message)
         return is_ok
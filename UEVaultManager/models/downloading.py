@@ -9,12 +9,14 @@ Implementation for:
 - FileTask: Task describing some operation on the filesystem.
 - WriterTask: Task for FileWriter worker process, describing an operation on the filesystem.
 - WriterTaskResult: Result from the FileWriter worker.
+- CDNStats: Download statistics of a CDN host.
 - UIUpdate: Status update object sent from the manager to the CLI/GUI to update status indicators.
 - AnalysisResult: Result of processing a manifest for downloading.
 - ConditionCheckResult: Result of install condition checks.
+- VerificationResult: Result of the verification of the installed files.
 - TerminateWorkerTask: Universal task to signal a worker to exit.
 """
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import auto, Flag
 from typing import Optional
 
@@ -43,6 +45,12 @@ class DownloaderTask:
     url: str
     chunk_guid: int
     shm: SharedMemorySegment
+    # base url of the CDN used for the url, to attribute the statistics of the download
+    base_url: str = ''
+    # expected SHA-1 hash of the decompressed chunk, if set the worker checks the chunk before sending the result
+    sha_hash: Optional[bytes] = None
+    # expected rolling hash of the decompressed chunk, checked only if sha_hash is not set (some manifests don't have the SHA-1 hashes)
+    rolling_hash: Optional[int] = None
 
 
 @dataclass
@@ -50,9 +58,14 @@ class DownloaderTaskResult(DownloaderTask):
     """
     Result of DownloaderTask provided by download workers.
     """
-    success: bool
+    success: bool = False
     size_downloaded: Optional[int] = None
     size_decompressed: Optional[int] = None
+    # whether the hash of the chunk has been checked, and whether it failed (the chunk must be downloaded again)
+    verified: bool = False
+    hash_mismatch: bool = False
+    # time in seconds taken by the request (including the retries), used to measure the throughput of the CDN
+    download_time: Optional[float] = None
 
 
 @dataclass
@@ -67,6 +80,14 @@ class ChunkTask:
     cleanup: bool = False
     # Path to the file the chunk is read from (if not from memory)
     chunk_file: Optional[str] = None
+    # Name of the file of the disk cache the chunk is read from (if not from memory), or written to if cache_chunk is True
+    cache_file: Optional[str] = None
+    # Whether the chunk must be written to the disk cache (spilled) because the shared memory is too small to keep it
+    cache_chunk: bool = False
+    # Offset of the chunk part in the file it's written to
+    file_offset: int = 0
+    # Path of the file of the chunk in the chunk store, if it's read from there instead of being downloaded
+    store_file: Optional[str] = None
 
 
 class TaskFlags(Flag):
@@ -82,6 +103,11 @@ class TaskFlags(Flag):
     RELEASE_MEMORY = auto()
     MAKE_EXECUTABLE = auto()
     SILENT = auto()
+    CACHE_CHUNK = auto()
+    RESUME_FILE = auto()
+    STORE_CHUNK = auto()
+    COPY_FILE = auto()
+    JOURNAL_CHUNK = auto()
 
 
 @dataclass
@@ -91,7 +117,7 @@ class FileTask:
     """
     filename: str
     flags: TaskFlags
-    # If rename is true, this is the name of the file to be renamed
+    # If rename is true, this is the name of the file to be renamed. If copy is true, this is the path of the file to copy
     old_file: Optional[str] = None
 
 
@@ -113,6 +139,12 @@ class WriterTask:
     # File to read old chunk from, disk chunk cache or old file
     old_file: Optional[str] = None
     cache_file: Optional[str] = None
+    # Size of the whole chunk to write to the disk cache file (with the CACHE_CHUNK flag) or to the chunk store (with the STORE_CHUNK flag)
+    cache_chunk_size: int = 0
+    # File of the chunk in the chunk store, to read the chunk from, or to write it to (with the STORE_CHUNK flag)
+    store_file: Optional[str] = None
+    # Offset of the chunk part in the file, the chunk parts already written by an interrupted download are skipped (with the RESUME_FILE flag)
+    file_offset: int = 0
 
 
 @dataclass
@@ -124,6 +156,23 @@ class WriterTaskResult(WriterTask):
     size: int = 0
 
 
+@dataclass
+class CDNStats:
+    """
+    Download statistics of a CDN host.
+    """
+    host: str
+    # average throughput of the requests in bytes/s (exponentially weighted)
+    speed: float = 0.0
+    # rate of the failed requests (exponentially weighted)
+    failure_rate: float = 0.0
+    num_requests: int = 0
+    num_failures: int = 0
+    bytes_downloaded: int = 0
+    # whether the host only gets a small share of the requests because it's slow or failing
+    demoted: bool = False
+
+
 @dataclass
 class UIUpdate:
     """
@@ -135,6 +184,11 @@ class UIUpdate:
     read_speed: float
     memory_usage: float
     current_filename: Optional[str] = None
+    # number of chunks verified after decompression, and of chunks downloaded again because of a bad hash
+    chunks_verified: int = 0
+    chunks_corrupted: int = 0
+    # statistics of the CDN hosts used by the download
+    cdn_stats: list = field(default_factory=list)
 
 
 @dataclass
@@ -153,6 +207,9 @@ class AnalysisResult:
     min_memory: int = 0
     num_chunks: int = 0
     num_chunks_cache: int = 0
+    num_chunks_spilled: int = 0
+    disk_cache_size: int = 0
+    num_chunks_stored: int = 0
     num_files: int = 0
     removed: int = 0
     added: int = 0
@@ -171,6 +228,27 @@ class ConditionCheckResult:
     warnings: Optional[set] = None
 
 
+@dataclass
+class VerificationResult:
+    """
+    Result of the verification of the installed files.
+    """
+    checked: int = 0
+    missing: list = field(default_factory=list)
+    mismatched: list = field(default_factory=list)
+    failed: list = field(default_factory=list)  # files that could not be read
+
+    @property
+    def bad_files(self) -> list:
+        """ Get the files that must be repaired. """
+        return self.missing + self.mismatched + self.failed
+
+    @property
+    def is_ok(self) -> bool:
+        """ Get if all the files are valid. """
+        return not self.bad_files
+
+
 class TerminateWorkerTask:
     """
     Universal task to signal a worker to exit.
@@ -5,12 +5,15 @@ Implementation for:
 - ManifestMeta: Manifest Meta
 - CDL: Chunk Data List
 - FML: File Manifest List
+- CompactCDL: Chunk Data List stored in arrays.
+- CompactFML: File Manifest List stored in arrays.
 - CustomFields: Custom Fields
 - ChunkInfo: Chunk Info
 - ChunkPart: Chunk Part
 - FileManifest: File Manifest
 - ManifestComparison: Manifest comparison
 - read_fstring(): Read a string from a binary file.
+- read_fstring_from_buffer(): Read a string from a buffer.
 - write_fstring(): Write a string to a binary file.
 - get_chunk_dir(): Get the chunk directory name based on the manifest version.
 """
@@ -20,12 +23,21 @@ import hashlib
 import logging
 import struct
 import zlib
+from array import array
 from base64 import b64encode
+from collections.abc import Sequence
 from io import BytesIO
 from typing import Optional
 
 logger = logging.getLogger('Manifest')
 
+# precompiled structures used to read the manifests from a buffer
+_int32_struct = struct.Struct('<i')
+_uint32_struct = struct.Struct('<I')
+_list_header_struct = struct.Struct('<IBI')  # size, version, count
+_chunk_part_struct = struct.Struct('<I4III')  # size of the chunk part, guid, offset, size
+_chunk_parts_structs = {}  # structures used to read all the chunk parts of a file at once, by number of parts
+
 
 def read_fstring(bio) -> str:
     """
@@ -51,6 +63,63 @@ def read_fstring(bio) -> str:
     return s
 
 
+def read_fstring_from_buffer(buffer, pos: int) -> (str, int):
+    """
+    Read a string from a buffer.
+    :param buffer: buffer (bytes or memoryview) to read from.
+    :param pos: position of the string in the buffer.
+    :return: (string, position after the string).
+    """
+    length = _int32_struct.unpack_from(buffer, pos)[0]
+    pos += 4
+    # see read_fstring() for the details
+    if length < 0:
+        length *= -2
+        return str(buffer[pos:pos + length - 2], 'utf-16'), pos + length
+    elif length > 0:
+        return str(buffer[pos:pos + length - 1], 'ascii'), pos + length
+    return '', pos
+
+
+def _unpack_column(buffer, pos: int, type_code: str, count: int) -> (tuple, int):
+    """
+    Read a column of values (i.e. the same field of all the elements of a list) from a buffer in a single call.
+    :param buffer: buffer to read from.
+    :param pos: position of the column in the buffer.
+    :param type_code: struct type code of the field.
+    :param count: number of values to read.
+    :return: (values, position after the column).
+    """
+    column_struct = struct.Struct(f'<{count}{type_code}')
+    return column_struct.unpack_from(buffer, pos), pos + column_struct.size
+
+
+def _read_fstring_column(buffer, pos: int, count: int) -> (list, int):
+    """
+    Read a column of strings from a buffer.
+    :param buffer: buffer to read from.
+    :param pos: position of the column in the buffer.
+    :param count: number of strings to read.
+    :return: (strings, position after the column).
+    """
+    strings = []
+    append = strings.append
+    unpack_from = _int32_struct.unpack_from
+    for _ in range(count):
+        length = unpack_from(buffer, pos)[0]
+        pos += 4
+        if length > 0:
+            # most of the strings are ascii, avoid the function call for them
+            append(str(buffer[pos:pos + length - 1], 'ascii'))
+            pos += length
+        elif length < 0:
+            string, pos = read_fstring_from_buffer(buffer, pos - 4)
+            append(string)
+        else:
+            append('')
+    return strings, pos
+
+
 def write_fstring(bio, string: str) -> None:
     """
     Write a string to a binary file.
@@ -117,13 +186,23 @@ class Manifest:
         return self.stored_as & 0x1
 
     @classmethod
-    def read_all(cls, data):
+    def read_all(cls, data, compact: bool = False):
+        """
+        Read a manifest and all its lists.
+        :param data: manifest data.
+        :param compact: whether the chunk and file lists are stored in arrays (CompactCDL and CompactFML) to use less memory.
+        :return: manifest.
+        """
         _m = cls.read(data)
         _tmp = BytesIO(_m.data)
 
         _m.meta = ManifestMeta.read(_tmp)
-        _m.chunk_data_list = CDL.read(_tmp, _m.meta.feature_level)
-        _m.file_manifest_list = FML.read(_tmp)
+        if compact:
+            _m.chunk_data_list = CompactCDL.read(_tmp, _m.meta.feature_level)
+            _m.file_manifest_list = CompactFML.read(_tmp)
+        else:
+            _m.chunk_data_list = CDL.read(_tmp, _m.meta.feature_level)
+            _m.file_manifest_list = FML.read(_tmp)
         _m.custom_fields = CustomFields.read(_tmp)
 
         if unhandled_data := _tmp.read():
@@ -437,9 +516,94 @@ class CDL:
             raise ValueError(f'Invalid GUID! {hex(guid_int)}')
         return self.elements[index]
 
-    # noinspection DuplicatedCode
+    def get_chunk_sizes(self) -> dict:
+        """
+        Get the sizes of all the chunks.
+        :return: dict of (window size, file size) by chunk guid number.
+        """
+        return {chunk.guid_num: (chunk.window_size, chunk.file_size) for chunk in self.elements}
+
     @classmethod
     def read(cls, bio, manifest_version=18):
+        """
+        Read a chunk data list.
+        :param bio: binary stream. If it's a BytesIO, the list is read directly from its buffer (faster).
+        :param manifest_version: version of the manifest.
+        :return: chunk data list.
+        """
+        if not isinstance(bio, BytesIO):
+            return cls.read_stream(bio, manifest_version)
+        with bio.getbuffer() as buffer:
+            _cdl, pos = cls.read_buffer(buffer, bio.tell(), manifest_version)
+        bio.seek(pos)
+        return _cdl
+
+    @classmethod
+    def read_buffer(cls, buffer, pos: int, manifest_version=18) -> (CDL, int):
+        """
+        Read a chunk data list from a buffer, column by column.
+        :param buffer: buffer (bytes or memoryview) to read from.
+        :param pos: position of the list in the buffer.
+        :param manifest_version: version of the manifest.
+        :return: (chunk data list, position after the list).
+        """
+        _cdl = cls()
+        _cdl._manifest_version = manifest_version
+        guids, hashes, sha_hashes, group_nums, window_sizes, file_sizes, pos = _cdl._read_columns(buffer, pos)
+
+        elements = _cdl.elements
+        for index in range(_cdl.count):
+            chunk = ChunkInfo(manifest_version=manifest_version)
+            chunk.guid = guids[index * 4:index * 4 + 4]
+            chunk.hash = hashes[index]
+            chunk.sha_hash = sha_hashes[index * 20:index * 20 + 20]
+            chunk.group_num = group_nums[index]
+            chunk.window_size = window_sizes[index]
+            chunk.file_size = file_sizes[index]
+            elements.append(chunk)
+
+        return _cdl, pos
+
+    def _read_columns(self, buffer, pos: int) -> tuple:
+        """
+        Read the header and the columns of a chunk data list from a buffer.
+        :param buffer: buffer (bytes or memoryview) to read from.
+        :param pos: position of the list in the buffer.
+        :return: (guids (4 values per chunk), hashes, sha hashes (20 bytes per chunk), group numbers, window sizes, file sizes, position after the list).
+        """
+        cdl_start = pos
+        self.size, self.version, self.count = _list_header_struct.unpack_from(buffer, pos)
+        pos += _list_header_struct.size
+        count = self.count
+
+        # see read_stream() for the details on the fields
+        guids, pos = _unpack_column(buffer, pos, 'I', count * 4)
+        hashes, pos = _unpack_column(buffer, pos, 'Q', count)
+        sha_hashes = bytes(buffer[pos:pos + count * 20])
+        pos += count * 20
+        group_nums = bytes(buffer[pos:pos + count])
+        pos += count
+        window_sizes, pos = _unpack_column(buffer, pos, 'I', count)
+        file_sizes, pos = _unpack_column(buffer, pos, 'q', count)
+
+        if (size_read := pos - cdl_start) != self.size:
+            logger.warning(f'Did not read entire chunk data list! Version: {self.version}, '
+                           f'{self.size - size_read} bytes missing, skipping...')
+            pos = cdl_start + self.size
+            # downgrade version to prevent issues during serialisation
+            self.version = 0
+
+        return guids, hashes, sha_hashes, group_nums, window_sizes, file_sizes, pos
+
+    # noinspection DuplicatedCode
+    @classmethod
+    def read_stream(cls, bio, manifest_version=18):
+        """
+        Read a chunk data list from a stream, field by field.
+        :param bio: binary stream.
+        :param manifest_version: version of the manifest.
+        :return: chunk data list.
+        """
         cdl_start = bio.tell()
         _cdl = cls()
         _cdl._manifest_version = manifest_version
@@ -515,6 +679,7 @@ class ChunkInfo:
     """
     Chunk Info
     """
+    __slots__ = ('guid', 'hash', 'sha_hash', 'window_size', 'file_size', '_manifest_version', '_group_num', '_guid_str', '_guid_num')
 
     def __init__(self, manifest_version=18):
         self.guid = None
@@ -594,9 +759,152 @@ class FML:
             raise ValueError(f'Invalid path! {path}')
         return self.elements[index]
 
-    # noinspection DuplicatedCode
+    def get_file_hashes(self) -> dict:
+        """
+        Get the SHA-1 hashes of all the files.
+        :return: dict of hashes by filename.
+        """
+        return {fm.filename: fm.hash for fm in self.elements}
+
+    def get_file_sizes(self) -> dict:
+        """
+        Get the sizes of all the files.
+        :return: dict of sizes by filename.
+        """
+        return {fm.filename: fm.file_size for fm in self.elements}
+
     @classmethod
     def read(cls, bio):
+        """
+        Read a file manifest list.
+        :param bio: binary stream. If it's a BytesIO, the list is read directly from its buffer (faster).
+        :return: file manifest list.
+        """
+        if not isinstance(bio, BytesIO):
+            return cls.read_stream(bio)
+        with bio.getbuffer() as buffer:
+            _fml, pos = cls.read_buffer(buffer, bio.tell())
+        bio.seek(pos)
+        return _fml
+
+    @classmethod
+    def read_buffer(cls, buffer, pos: int) -> (FML, int):
+        """
+        Read a file manifest list from a buffer, column by column.
+        :param buffer: buffer (bytes or memoryview) to read from.
+        :param pos: position of the list in the buffer.
+        :return: (file manifest list, position after the list).
+
+        Notes:
+            The ChunkPart objects of a file are only created when its chunk_parts property is read.
+        """
+        _fml = cls()
+        columns, pos = _fml._read_columns(buffer, pos)
+        elements = _fml.elements = [FileManifest() for _ in range(_fml.count)]
+        for index, fm in enumerate(elements):
+            fm.filename = columns['filenames'][index]
+            fm.symlink_target = columns['symlink_targets'][index]
+            fm.hash = columns['hashes'][index * 20:index * 20 + 20]
+            fm.flags = columns['flags'][index]
+            fm.set_raw_chunk_parts(columns['chunk_parts'][index])
+        for index, tags in columns['install_tags'].items():
+            elements[index].install_tags = tags
+        for index, hash_md5 in columns['hashes_md5'].items():
+            elements[index].hash_md5 = hash_md5
+        if mime_types := columns['mime_types']:
+            for fm, mime_type in zip(elements, mime_types):
+                fm.mime_type = mime_type
+        if hashes_sha256 := columns['hashes_sha256']:
+            for index, fm in enumerate(elements):
+                fm.hash_sha256 = hashes_sha256[index * 32:index * 32 + 32]
+
+        return _fml, pos
+
+    def _read_columns(self, buffer, pos: int) -> (dict, int):
+        """
+        Read the header and the columns of a file manifest list from a buffer.
+        :param buffer: buffer (bytes or memoryview) to read from.
+        :param pos: position of the list in the buffer.
+        :return: (columns by name, position after the list).
+
+        Notes:
+            The install tags and the md5 hashes are rarely set, so they are returned as dicts by index of the file.
+            The hashes are returned as a single bytes object (20 or 32 bytes per file).
+        """
+        fml_start = pos
+        self.size, self.version, self.count = _list_header_struct.unpack_from(buffer, pos)
+        pos += _list_header_struct.size
+        count = self.count
+        columns = {'install_tags': {}, 'hashes_md5': {}, 'mime_types': [], 'hashes_sha256': b''}
+
+        # see read_stream() for the details on the fields
+        columns['filenames'], pos = _read_fstring_column(buffer, pos, count)
+        columns['symlink_targets'], pos = _read_fstring_column(buffer, pos, count)
+        columns['hashes'] = bytes(buffer[pos:pos + count * 20])
+        pos += count * 20
+        columns['flags'] = bytes(buffer[pos:pos + count])
+        pos += count
+
+        uint32_unpack_from = _uint32_struct.unpack_from
+        for index in range(count):
+            tags_count = uint32_unpack_from(buffer, pos)[0]
+            pos += 4
+            if tags_count:
+                columns['install_tags'][index], pos = _read_fstring_column(buffer, pos, tags_count)
+
+        part_size = _chunk_part_struct.size
+        chunk_parts = columns['chunk_parts'] = []
+        for _ in range(count):
+            parts_count = uint32_unpack_from(buffer, pos)[0]
+            pos += 4
+            # all the chunk parts of the file are read in a single call, as a flat tuple of 7 values per part
+            if (parts_struct := _chunk_parts_structs.get(parts_count)) is None:
+                parts_struct = _chunk_parts_structs[parts_count] = struct.Struct(f'<{parts_count * 7}I')
+            raw_parts = parts_struct.unpack_from(buffer, pos)
+            if raw_parts[0::7].count(part_size) == parts_count:
+                pos += parts_struct.size
+            else:
+                # at least one chunk part has a different size, read them one by one
+                raw_parts = ()
+                for _ in range(parts_count):
+                    raw_part = _chunk_part_struct.unpack_from(buffer, pos)
+                    raw_parts += raw_part
+                    if (diff := part_size - raw_part[0]) > 0:
+                        logger.warning(f'Did not read {diff} bytes from chunk part!')
+                    # skip the unknown fields of the bigger chunk parts
+                    pos += max(raw_part[0], part_size)
+            chunk_parts.append(raw_parts)
+
+        if self.version >= 1:
+            for index in range(count):
+                has_md5 = uint32_unpack_from(buffer, pos)[0]
+                pos += 4
+                if has_md5 != 0:
+                    columns['hashes_md5'][index] = bytes(buffer[pos:pos + 16])
+                    pos += 16
+            columns['mime_types'], pos = _read_fstring_column(buffer, pos, count)
+
+        if self.version >= 2:
+            columns['hashes_sha256'] = bytes(buffer[pos:pos + count * 32])
+            pos += count * 32
+
+        if (size_read := pos - fml_start) != self.size:
+            logger.warning(f'Did not read entire file data list! Version: {self.version}, '
+                           f'{self.size - size_read} bytes missing, skipping...')
+            pos = fml_start + self.size
+            # downgrade version to prevent issues during serialisation
+            self.version = 0
+
+        return columns, pos
+
+    # noinspection DuplicatedCode
+    @classmethod
+    def read_stream(cls, bio):
+        """
+        Read a file manifest list from a stream, field by field.
+        :param bio: binary stream.
+        :return: file manifest list.
+        """
         fml_start = bio.tell()
         _fml = cls()
         _fml.size = struct.unpack('<I', bio.read(4))[0]
@@ -727,17 +1035,54 @@ class FileManifest:
     File Manifest
     """
 
+    __slots__ = (
+        'filename', 'symlink_target', 'hash', 'flags', 'install_tags', 'file_size', 'hash_md5', 'mime_type', 'hash_sha256', '_chunk_parts',
+        '_raw_chunk_parts'
+    )
+
     def __init__(self):
         self.filename = ''
         self.symlink_target = ''
         self.hash = b''
         self.flags = 0
         self.install_tags = []
-        self.chunk_parts = []
         self.file_size = 0
         self.hash_md5 = b''
         self.mime_type = ''
         self.hash_sha256 = b''
+        self._chunk_parts = []
+        # raw values of the chunk parts (see set_raw_chunk_parts()), converted to ChunkPart objects on first access
+        self._raw_chunk_parts = None
+
+    @property
+    def chunk_parts(self) -> list:
+        """ Get the chunk parts of the file. """
+        if self._raw_chunk_parts is not None:
+            chunk_parts = []
+            file_offset = 0
+            raw_chunk_parts = self._raw_chunk_parts
+            for index in range(0, len(raw_chunk_parts), 7):
+                offset, size = raw_chunk_parts[index + 5:index + 7]
+                chunk_parts.append(ChunkPart(tuple(raw_chunk_parts[index + 1:index + 5]), offset, size, file_offset))
+                file_offset += size
+            self._chunk_parts = chunk_parts
+            self._raw_chunk_parts = None
+        return self._chunk_parts
+
+    @chunk_parts.setter
+    def chunk_parts(self, value: list) -> None:
+        """ Set the chunk parts of the file. """
+        self._chunk_parts = value
+        self._raw_chunk_parts = None
+
+    def set_raw_chunk_parts(self, raw_chunk_parts: tuple) -> None:
+        """
+        Set the chunk parts of the file from their raw values. The ChunkPart objects will be created on first access.
+        :param raw_chunk_parts: flat tuple (or array) of 7 values (size of the part, guid x 4, offset, size) per chunk part, as read in the manifest.
+        """
+        self._raw_chunk_parts = raw_chunk_parts
+        self._chunk_parts = []
+        self.file_size = sum(raw_chunk_parts[6::7])
 
     @property
     def read_only(self):
@@ -772,6 +1117,7 @@ class ChunkPart:
     """
     Chunk Part
     """
+    __slots__ = ('guid', 'offset', 'size', 'file_offset', '_guid_str', '_guid_num')
 
     def __init__(self, guid=None, offset=0, size=0, file_offset=0):
         self.guid = guid
@@ -799,6 +1145,230 @@ class ChunkPart:
         return '<ChunkPart (guid={}, offset={}, size={}, file_offset={})>'.format(guid_readable, self.offset, self.size, self.file_offset)
 
 
+class _ElementViews(Sequence):
+    """
+    Read-only list of the elements of a compact list, created on demand.
+    :param count: number of elements.
+    :param get_element: function that creates the element at a given index.
+    """
+
+    def __init__(self, count: int, get_element: callable):
+        self._count = count
+        self._get_element = get_element
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get_element(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('element index out of range')
+        return self._get_element(index)
+
+
+class CompactCDL(CDL):
+    """
+    Chunk Data List storing the values of the chunks in arrays.
+
+    Notes:
+        The elements are ChunkInfo objects created on demand, changing them does not change the list.
+        Use CDL for a manifest that will be modified.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.guids = array('I')  # 4 values by chunk
+        self.hashes = array('Q')
+        self.sha_hashes = b''  # 20 bytes by chunk
+        self.group_nums = b''
+        self.window_sizes = array('I')
+        self.file_sizes = array('q')
+        self.elements = _ElementViews(0, self._get_element)
+
+    def _get_element(self, index: int) -> ChunkInfo:
+        """
+        Create the ChunkInfo object of a chunk.
+        :param index: index of the chunk.
+        :return: chunk.
+        """
+        chunk = ChunkInfo(manifest_version=self._manifest_version)
+        chunk.guid = tuple(self.guids[index * 4:index * 4 + 4])
+        chunk.hash = self.hashes[index]
+        chunk.sha_hash = self.sha_hashes[index * 20:index * 20 + 20]
+        chunk.group_num = self.group_nums[index]
+        chunk.window_size = self.window_sizes[index]
+        chunk.file_size = self.file_sizes[index]
+        return chunk
+
+    def _get_guid_nums(self) -> list:
+        """
+        Get the guid numbers of all the chunks, computed from the guids array.
+        :return: list of guid numbers.
+        """
+        guids = self.guids
+        return [(g0 << 96) + (g1 << 64) + (g2 << 32) + g3 for g0, g1, g2, g3 in zip(guids[0::4], guids[1::4], guids[2::4], guids[3::4])]
+
+    def get_chunk_by_guid_num(self, guid_int):
+        if not self.guid_int_map:
+            self.guid_int_map = {guid_num: index for index, guid_num in enumerate(self._get_guid_nums())}
+        return super().get_chunk_by_guid_num(guid_int)
+
+    def get_chunk_sizes(self) -> dict:
+        """
+        Get the sizes of all the chunks.
+        :return: dict of (window size, file size) by chunk guid number.
+        """
+        return dict(zip(self._get_guid_nums(), zip(self.window_sizes, self.file_sizes)))
+
+    @classmethod
+    def read(cls, bio, manifest_version=18):
+        """
+        Read a chunk data list.
+        :param bio: binary stream.
+        :param manifest_version: version of the manifest.
+        :return: chunk data list.
+        """
+        if not isinstance(bio, BytesIO):
+            # read the whole list in a buffer, its size is the first value
+            start = bio.tell()
+            size = _uint32_struct.unpack(bio.read(4))[0]
+            bio.seek(start)
+            bio = BytesIO(bio.read(size))
+        return super().read(bio, manifest_version)
+
+    @classmethod
+    def read_buffer(cls, buffer, pos: int, manifest_version=18) -> (CompactCDL, int):
+        """
+        Read a chunk data list from a buffer, column by column.
+        :param buffer: buffer (bytes or memoryview) to read from.
+        :param pos: position of the list in the buffer.
+        :param manifest_version: version of the manifest.
+        :return: (chunk data list, position after the list).
+        """
+        _cdl = cls()
+        _cdl._manifest_version = manifest_version
+        guids, hashes, _cdl.sha_hashes, _cdl.group_nums, window_sizes, file_sizes, pos = _cdl._read_columns(buffer, pos)
+        _cdl.guids = array('I', guids)
+        _cdl.hashes = array('Q', hashes)
+        _cdl.window_sizes = array('I', window_sizes)
+        _cdl.file_sizes = array('q', file_sizes)
+        _cdl.elements = _ElementViews(_cdl.count, _cdl._get_element)
+        return _cdl, pos
+
+
+class CompactFML(FML):
+    """
+    File Manifest List storing the values of the files and of their chunk parts in arrays.
+
+    Notes:
+        The elements are FileManifest objects created on demand, changing them does not change the list.
+        Use FML for a manifest that will be modified.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.filenames = []
+        self.symlink_targets = []
+        self.hashes = b''  # 20 bytes by file
+        self.flags = b''
+        self.install_tags = {}  # by index of file, only for the files with tags
+        self.hashes_md5 = {}  # by index of file, only for the files with a md5 hash
+        self.mime_types = []
+        self.hashes_sha256 = b''  # 32 bytes by file
+        self.file_sizes = array('Q')
+        self.chunk_parts = array('I')  # 7 values by chunk part (see FileManifest.set_raw_chunk_parts())
+        self.chunk_parts_start = array('I')  # index in chunk_parts of the first part of each file, plus the end of the array
+        self.elements = _ElementViews(0, self._get_element)
+
+    def _get_element(self, index: int) -> FileManifest:
+        """
+        Create the FileManifest object of a file.
+        :param index: index of the file.
+        :return: file manifest.
+        """
+        fm = FileManifest()
+        fm.filename = self.filenames[index]
+        fm.symlink_target = self.symlink_targets[index]
+        fm.hash = self.hashes[index * 20:index * 20 + 20]
+        fm.flags = self.flags[index]
+        fm.install_tags = list(self.install_tags.get(index, []))
+        fm.hash_md5 = self.hashes_md5.get(index, b'')
+        if self.mime_types:
+            fm.mime_type = self.mime_types[index]
+        if self.hashes_sha256:
+            fm.hash_sha256 = self.hashes_sha256[index * 32:index * 32 + 32]
+        fm.set_raw_chunk_parts(self.chunk_parts[self.chunk_parts_start[index]:self.chunk_parts_start[index + 1]])
+        return fm
+
+    def get_file_by_path(self, path):
+        if not self._path_map:
+            self._path_map = {filename: index for index, filename in enumerate(self.filenames)}
+        return super().get_file_by_path(path)
+
+    def get_file_hashes(self) -> dict:
+        """
+        Get the SHA-1 hashes of all the files.
+        :return: dict of hashes by filename.
+        """
+        return {filename: self.hashes[index * 20:index * 20 + 20] for index, filename in enumerate(self.filenames)}
+
+    def get_file_sizes(self) -> dict:
+        """
+        Get the sizes of all the files.
+        :return: dict of sizes by filename.
+        """
+        return dict(zip(self.filenames, self.file_sizes))
+
+    @classmethod
+    def read(cls, bio):
+        """
+        Read a file manifest list.
+        :param bio: binary stream.
+        :return: file manifest list.
+        """
+        if not isinstance(bio, BytesIO):
+            # read the whole list in a buffer, its size is the first value
+            start = bio.tell()
+            size = _uint32_struct.unpack(bio.read(4))[0]
+            bio.seek(start)
+            bio = BytesIO(bio.read(size))
+        return super().read(bio)
+
+    @classmethod
+    def read_buffer(cls, buffer, pos: int) -> (CompactFML, int):
+        """
+        Read a file manifest list from a buffer, column by column.
+        :param buffer: buffer (bytes or memoryview) to read from.
+        :param pos: position of the list in the buffer.
+        :return: (file manifest list, position after the list).
+        """
+        _fml = cls()
+        columns, pos = _fml._read_columns(buffer, pos)
+        _fml.filenames = columns['filenames']
+        _fml.symlink_targets = columns['symlink_targets']
+        _fml.hashes = columns['hashes']
+        _fml.flags = columns['flags']
+        _fml.install_tags = columns['install_tags']
+        _fml.hashes_md5 = columns['hashes_md5']
+        # the mime types are mostly the same, share the strings
+        mime_types = {}
+        _fml.mime_types = [mime_types.setdefault(mime_type, mime_type) for mime_type in columns['mime_types']]
+        _fml.hashes_sha256 = columns['hashes_sha256']
+        chunk_parts = _fml.chunk_parts
+        chunk_parts_start = _fml.chunk_parts_start
+        file_sizes = _fml.file_sizes
+        for raw_parts in columns['chunk_parts']:
+            chunk_parts_start.append(len(chunk_parts))
+            chunk_parts.extend(raw_parts)
+            file_sizes.append(sum(raw_parts[6::7]))
+        chunk_parts_start.append(len(chunk_parts))
+        _fml.elements = _ElementViews(_fml.count, _fml._get_element)
+        return _fml, pos
+
+
 class CustomFields:
     """
     Custom Fields
@@ -886,20 +1456,21 @@ class ManifestComparison:
     def create(cls, manifest, old_manifest=None):
         comp = cls()
 
+        file_hashes = manifest.file_manifest_list.get_file_hashes()
         if not old_manifest:
-            comp.added = set(fm.filename for fm in manifest.file_manifest_list.elements)
+            comp.added = set(file_hashes)
             return comp
 
-        old_files = {fm.filename: fm.hash for fm in old_manifest.file_manifest_list.elements}
+        old_files = old_manifest.file_manifest_list.get_file_hashes()
 
-        for fm in manifest.file_manifest_list.elements:
-            if old_file_hash := old_files.pop(fm.filename, None):
-                if fm.hash == old_file_hash:
-                    comp.unchanged.add(fm.filename)
+        for filename, file_hash in file_hashes.items():
+            if old_file_hash := old_files.pop(filename, None):
+                if file_hash == old_file_hash:
+                    comp.unchanged.add(filename)
                 else:
-                    comp.changed.add(fm.filename)
+                    comp.changed.add(filename)
             else:
-                comp.added.add(fm.filename)
+                comp.added.add(filename)
 
         # any remaining old files were removed
         if old_files:
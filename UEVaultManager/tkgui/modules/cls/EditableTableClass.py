@@ -5,6 +5,7 @@ Implementation for:
 """
 import io
 import os
+import tempfile
 import tkinter as tk
 import warnings
 import webbrowser
@@ -19,6 +20,7 @@ import UEVaultManager.models.csv_sql_fields as gui_t  # using the shortest varia
 import UEVaultManager.tkgui.modules.functions as gui_f  # using the shortest variable name for globals for convenience
 import UEVaultManager.tkgui.modules.functions_no_deps as gui_fn  # using the shortest variable name for globals for convenience
 import UEVaultManager.tkgui.modules.globals as gui_g  # using the shortest variable name for globals for convenience
+from UEVaultManager.lfs.AssetStoreClass import AssetStore
 from UEVaultManager.lfs.utils import path_join
 from UEVaultManager.models.types import DateFormat
 from UEVaultManager.models.UEAssetClass import UEAsset
@@ -2271,8 +2273,9 @@ class EditableTable(Table):
                 if not asset_id or asset_id == gui_g.s.empty_cell:
                     self.notify('Asset_id value is empty for this asset')
                     return
-            file_name = path_join(gui_g.s.assets_data_folder, asset_id + '.json')
-            if os.path.isfile(file_name):
+            # the data are packed in the asset store, they are exported to a temporary file to be opened
+            file_name = path_join(tempfile.gettempdir(), f'UEVM_{asset_id}.json')
+            if AssetStore.get_store(gui_g.s.assets_data_folder).export_to_file(asset_id, file_name):
                 self.logger.info(f'Opening {file_name} in default application')
                 os.system(f'start {file_name}')
 
@@ -473,6 +473,26 @@ class GUISettings:
         """ Setter for timeout_for_scraping """
         self.config_vars['timeout_for_scraping'] = value
 
+    @property
+    def use_async_scraping(self) -> bool:
+        """ Getter for use_async_scraping """
+        return gui_fn.convert_to_bool(self.config_vars['use_async_scraping'])
+
+    @use_async_scraping.setter
+    def use_async_scraping(self, value):
+        """ Setter for use_async_scraping """
+        self.config_vars['use_async_scraping'] = value
+
+    @property
+    def scraping_requests_per_second(self) -> int:
+        """ Getter for scraping_requests_per_second """
+        return gui_fn.convert_to_int(self.config_vars['scraping_requests_per_second'])
+
+    @scraping_requests_per_second.setter
+    def scraping_requests_per_second(self, value):
+        """ Setter for scraping_requests_per_second """
+        self.config_vars['scraping_requests_per_second'] = value
+
     @property
     def scraped_assets_per_page(self) -> int:
         """ Getter for scraped_assets_per_page """
@@ -606,6 +626,15 @@ class GUISettings:
                 'timeout in second when scraping several assets in once. This value should not be too low to limit timeout issues and scraping cancellation.',
                 'value': 30
             },
+            'use_async_scraping': {
+                'comment':
+                'Set to True to scrap the urls using an asyncio pipeline (rate limited downloads and parsing done in parallel) instead of a pool of threads. Used only if use_threads is True',
+                'value': 'False'
+            },
+            'scraping_requests_per_second': {
+                'comment': 'Maximum number of urls requested per second when use_async_scraping is True',
+                'value': 4
+            },
             'scraped_assets_per_page': {
                 'comment': 'Number of grouped assets to scrap with one url. Since 2023-10-31 a value bigger than 75 COULD be refused by UE API',
                 'value': 75
@@ -779,6 +808,8 @@ class GUISettings:
             'debug_mode': self.config.getboolean('UEVaultManager', 'debug_mode'),
             'use_threads': self.config.getboolean('UEVaultManager', 'use_threads'),
             'timeout_for_scraping': self.config.getint('UEVaultManager', 'timeout_for_scraping'),
+            'use_async_scraping': self.config.getboolean('UEVaultManager', 'use_async_scraping'),
+            'scraping_requests_per_second': self.config.getint('UEVaultManager', 'scraping_requests_per_second'),
             'scraped_assets_per_page': self.config.get('UEVaultManager', 'scraped_assets_per_page'),
             'keep_invalid_scans': self.config.getboolean('UEVaultManager', 'keep_invalid_scans'),
             'reopen_last_file': self.config.getboolean('UEVaultManager', 'reopen_last_file'),
@@ -8,6 +8,7 @@ import json
 import os
 import sqlite3
 import tkinter as tk
+from typing import Iterator
 from tkinter import messagebox
 from tkinter import ttk
 
@@ -15,6 +16,7 @@ from ttkbootstrap import WARNING
 
 import UEVaultManager.tkgui.modules.functions_no_deps as gui_fn  # using the shortest variable name for globals for convenience
 import UEVaultManager.tkgui.modules.globals as gui_g  # using the shortest variable name for globals for convenience
+from UEVaultManager.lfs.AssetStoreClass import AssetStore
 from UEVaultManager.lfs.utils import path_join
 from UEVaultManager.tkgui.modules.globals import UEVM_log_ref
 
@@ -207,10 +209,28 @@ class JsonToolWindow(tk.Toplevel):
             self.progress_bar['value'] = 0
             self.update()
 
+    def _iter_json_files(self, file_paths: list) -> Iterator[tuple]:
+        """
+        Iterate over the data of JSON files. The invalid files are skipped.
+        :param file_paths: paths of the JSON files.
+        :return: iterator of (file_path, json data).
+        """
+        for file_path in file_paths:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                try:
+                    json_data = json.load(file)
+                except json.decoder.JSONDecodeError:
+                    self.frm_control.add_result(f'{file_path} is invalid')
+                    continue
+            yield file_path, json_data
+
     def process_json_files(self, data_type='') -> None:
         """
-        Process JSON files and stores data in the database.
+        Process JSON data and stores data in the database.
         :param data_type: type of data to process. Can be 'tags' or 'ratings'.
+
+        Notes:
+            The tags are read from the asset store of the folder for tags, the ratings from the JSON files of the folder for ratings.
         """
         folder = ''
         query = ''
@@ -226,8 +246,15 @@ class JsonToolWindow(tk.Toplevel):
             self.frm_control.activate_processing(False)
             return
 
-        file_paths = [path_join(folder, filename) for filename in os.listdir(folder) if filename.endswith('.json')]
-        if not file_paths:
+        if data_type == 'tags':
+            asset_store = AssetStore.get_store(folder)
+            total_files = len(asset_store)
+            json_items = asset_store.iter_data()
+        else:
+            file_paths = [path_join(folder, filename) for filename in os.listdir(folder) if filename.endswith('.json')]
+            total_files = len(file_paths)
+            json_items = self._iter_json_files(file_paths)
+        if not total_files:
             self.frm_control.activate_processing(False)
             return
 
@@ -235,7 +262,6 @@ class JsonToolWindow(tk.Toplevel):
         cursor = conn.cursor()
         cursor.execute(query)
 
-        total_files = len(file_paths)
         self.updated = 0
         self.added = 0
         self.frm_control.progress_bar['value'] = 0
@@ -243,22 +269,16 @@ class JsonToolWindow(tk.Toplevel):
         self.frm_control.processing = True
         try:
             conn.execute('BEGIN TRANSACTION')
-            for i, file_path in enumerate(file_paths, start=1):
+            for i, (name, json_data) in enumerate(json_items, start=1):
                 if not self.frm_control.processing:
                     break
                 self.frm_control.progress_bar['value'] = i
                 self.update()
-                self._log(f'Processing file {i} of {total_files}: {file_path}')
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    try:
-                        json_data = json.load(file)
-                    except json.decoder.JSONDecodeError:
-                        self.frm_control.add_result(f'{file_path} is invalid')
-                    else:
-                        if data_type == 'tags':
-                            self.extract_and_save_tags(cursor, json_data)
-                        elif data_type == 'ratings':
-                            self.extract_and_save_ratings(cursor, json_data)
+                self._log(f'Processing item {i} of {total_files}: {name}')
+                if data_type == 'tags':
+                    self.extract_and_save_tags(cursor, json_data)
+                elif data_type == 'ratings':
+                    self.extract_and_save_ratings(cursor, json_data)
             conn.commit()
             status_text = f'{data_type.title()} has been stored in the database. Updated: {self.updated}, Added: {self.added}'
             self.frm_control.add_result(status_text, True)
@@ -155,6 +155,16 @@ class UEVMGuiOptionFrame(ttk.Frame):
         # new row
         cur_row += 1
         cur_col = 0
+        self.add_widget(
+            'use_async_scraping', 'bool', 'Use async scraping', lblf_gui_settings, cur_row, cur_col, grid_ew_options, colspan=max_col
+        )
+        # new row
+        cur_row += 1
+        cur_col = 0
+        self.add_widget('scraping_requests_per_second', 'int', 'Scraping requests per second', lblf_gui_settings, cur_row, cur_col, grid_ew_options)
+        # new row
+        cur_row += 1
+        cur_col = 0
         self.add_widget('debug_mode', 'bool', 'Debug mode (GUI)', lblf_gui_settings, cur_row, cur_col, grid_ew_options, colspan=max_col)
         # new row
         cur_row += 1
@@ -4,6 +4,8 @@ The rolling hash Epic uses, it appears to be a variation on CRC-64-ECMA.
 """
 hash_poly = 0xC96C5795D7870F42
 hash_table = []
+# size of the data under which the byte by byte version is faster
+min_size_for_fast_hash = 256
 
 
 def _init():
@@ -20,11 +22,25 @@ def _init():
         hash_table.append(i)
 
 
-def get_hash(data) -> int:
+def _rotate_left(value: int, count: int) -> int:
     """
-    Calculates the rolling hash of a string.
+    Rotates a 64 bits value to the left.
+    :param value: value to rotate.
+    :param count: number of bits to rotate.
+    :return: rotated value.
+    """
+    count %= 64
+    return ((value << count) | (value >> (64 - count))) & 0xffffffffffffffff
+
+
+def get_hash_by_byte(data) -> int:
+    """
+    Calculates the rolling hash of a string, byte by byte.
     :param data: string to hash.
     :return: hash of the string.
+
+    Notes:
+        Reference version of the hash. Slow for big data, use get_hash() instead.
     """
     if not hash_table:
         _init()
@@ -33,3 +49,37 @@ def get_hash(data) -> int:
     for i in range(len(data)):
         h = ((h << 1 | h >> 63) ^ hash_table[data[i]]) & 0xffffffffffffffff
     return h
+
+
+def get_hash(data) -> int:
+    """
+    Calculates the rolling hash of a string.
+    :param data: string to hash.
+    :return: hash of the string.
+
+    Notes:
+        Each step of the hash is "h = rotate_left(h, 1) ^ hash_table[byte]", so the result is the XOR of the hash_table values of all the bytes,
+        each rotated by its distance to the end of the data (modulo 64).
+        As the hash_table is linear (hash_table[a ^ b] == hash_table[a] ^ hash_table[b]), the bytes with the same distance modulo 64 can be XORed first,
+        and looked up and rotated only once. The XOR of the bytes is done on a big integer, that runs at C speed.
+    """
+    if len(data) < min_size_for_fast_hash:
+        return get_hash_by_byte(data)
+    if not hash_table:
+        _init()
+
+    # as a big endian integer, the byte at index i is at position (len(data) - 1 - i), i.e. its distance to the end of the data
+    value = int.from_bytes(data, 'big')
+    size = len(data) * 8
+    fold_size = 64 * 8
+    # fold the value on itself, keeping the positions of the bytes modulo 64
+    while size > fold_size:
+        half = max(1, size // fold_size // 2) * fold_size
+        value = (value >> half) ^ (value & ((1 << half) - 1))
+        size = max(size - half, half)
+
+    h = 0
+    for distance, byte in enumerate(value.to_bytes(64, 'little')):
+        if byte:
+            h ^= _rotate_left(hash_table[byte], distance)
+    return h
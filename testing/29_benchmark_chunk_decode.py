@@ -0,0 +1,97 @@
+"""
+Benchmark of the chunk decoding in DLWorker: old way (Chunk.read_buffer + bytes(chunk.data)) vs new way (Chunk.read_view + decompress_into).
+Chunks are served by a local HTTP server to simulate the CDN.
+"""
+import os
+import threading
+import time
+import tracemalloc
+import urllib.request
+from hashlib import sha1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import shared_memory
+
+from UEVaultManager.models.ChunkClass import Chunk
+
+chunk_count = 50
+chunk_size = 1024 * 1024  # uncompressed size of a chunk (same as in the manifests)
+
+
+def make_chunk_data() -> bytes:
+    """
+    Create a chunk with half random and half repeated data, to have a realistic compression ratio.
+    :return: chunk data as written by the CDN.
+    """
+    chunk = Chunk()
+    chunk.data = os.urandom(chunk_size // 2) + b'UEVM' * (chunk_size // 8)
+    return chunk.write()
+
+
+class ChunkHandler(BaseHTTPRequestHandler):
+    """ HTTP handler that always returns the same chunk. """
+    chunk_data = make_chunk_data()
+
+    def do_GET(self):
+        """ Send the chunk. """
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(self.chunk_data)))
+        self.end_headers()
+        self.wfile.write(self.chunk_data)
+
+    def log_message(self, *args):
+        """ Disable the logs. """
+        pass
+
+
+def decode_old(content: bytes, shm_buf) -> int:
+    """ Old way: several copies of the data are created. """
+    chunk = Chunk.read_buffer(content)
+    size = len(chunk.data)
+    shm_buf[0:size] = bytes(chunk.data)
+    return size
+
+
+def decode_new(content: bytes, shm_buf) -> int:
+    """ New way: the data is decompressed directly into the shared memory. """
+    chunk = Chunk.read_view(content)
+    with shm_buf[0:chunk_size] as target:
+        return chunk.decompress_into(target)
+
+
+def decode_new_verified(content: bytes, shm_buf) -> int:
+    """ New way with the check of the SHA-1 hash of the chunk, done in place in the shared memory. """
+    chunk = Chunk.read_view(content)
+    with shm_buf[0:chunk_size] as target:
+        size = chunk.decompress_into(target)
+        with target[:size] as data:
+            sha1(data).digest()
+    return size
+
+
+def run(name: str, decode_func: callable, url: str, shm) -> None:
+    """ Download and decode the chunks, and print the results. """
+    tracemalloc.start()
+    start = time.perf_counter()
+    total = 0
+    for _ in range(chunk_count):
+        with urllib.request.urlopen(url) as response:
+            total += decode_func(response.read(), shm.buf)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name}: {total / duration / 1024 / 1024:.1f} MiB/s, peak memory {peak / 1024 / 1024:.1f} MiB')
+
+
+if __name__ == '__main__':
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ChunkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    chunk_url = f'http://127.0.0.1:{server.server_port}/chunk'
+    memory = shared_memory.SharedMemory(create=True, size=chunk_size)
+    try:
+        run('read_buffer + bytes(data)', decode_old, chunk_url, memory)
+        run('read_view + decompress_into', decode_new, chunk_url, memory)
+        run('read_view + decompress_into + sha1', decode_new_verified, chunk_url, memory)
+    finally:
+        memory.close()
+        memory.unlink()
+        server.shutdown()
@@ -0,0 +1,22 @@
+"""
+Benchmark of the rolling hash: byte by byte version (get_hash_by_byte) vs folded version (get_hash).
+"""
+import os
+import time
+
+from UEVaultManager.utils.rolling_hash import get_hash, get_hash_by_byte
+
+data_sizes = [100, 1000, 64 * 1024, 1024 * 1024]  # 1 MiB is the size of a chunk in the manifests
+
+if __name__ == '__main__':
+    for size in data_sizes:
+        data = os.urandom(size)
+        start = time.perf_counter()
+        reference = get_hash_by_byte(data)
+        slow_duration = time.perf_counter() - start
+        start = time.perf_counter()
+        result = get_hash(data)
+        fast_duration = time.perf_counter() - start
+        if result != reference:
+            raise ValueError(f'Hash mismatch for {size} bytes: {result:#x} != {reference:#x}')
+        print(f'{size} bytes: {slow_duration * 1000:.3f} ms -> {fast_duration * 1000:.3f} ms (x{slow_duration / fast_duration:.1f})')
@@ -0,0 +1,120 @@
+"""
+Benchmark of the manifest parsing: old way (CDL/FML.read_stream, field by field) vs new way (CDL/FML.read_buffer, column by column).
+A synthetic manifest is used by default. The path of a real binary manifest can be given as argument.
+Usage: python 31_benchmark_manifest_parser.py [path_to_manifest]
+"""
+import gc
+import os
+import random
+import sys
+import time
+from io import BytesIO
+
+from UEVaultManager.models.manifest import CDL, ChunkInfo, ChunkPart, CustomFields, FileManifest, FML, Manifest, ManifestMeta
+
+file_count = 50000
+chunk_count = 20000
+chunk_size = 1024 * 1024
+
+
+def make_manifest() -> bytes:
+    """
+    Create a synthetic manifest with random files and chunks.
+    :return: manifest data as stored by the CDN.
+    """
+    random.seed(0)
+    manifest = Manifest()
+    manifest.meta = ManifestMeta()
+    manifest.meta.feature_level = 20
+    manifest.chunk_data_list = CDL()
+    manifest.file_manifest_list = FML()
+    manifest.file_manifest_list.version = 2
+    manifest.custom_fields = CustomFields()
+    for index in range(chunk_count):
+        chunk = ChunkInfo()
+        chunk.guid = tuple(random.getrandbits(32) for _ in range(4))
+        chunk.hash = random.getrandbits(64)
+        chunk.sha_hash = os.urandom(20)
+        chunk.group_num = index % 100
+        chunk.window_size = chunk_size
+        chunk.file_size = random.randint(1000, chunk_size)
+        manifest.chunk_data_list.elements.append(chunk)
+    for index in range(file_count):
+        fm = FileManifest()
+        fm.filename = f'Content/Folder_{index % 97}/File_{index}.uasset'
+        fm.hash = os.urandom(20)
+        fm.hash_md5 = os.urandom(16)
+        fm.mime_type = 'application/octet-stream'
+        fm.hash_sha256 = os.urandom(32)
+        for _ in range(random.randint(1, 4)):
+            chunk = random.choice(manifest.chunk_data_list.elements)
+            fm.chunk_parts.append(ChunkPart(chunk.guid, random.randint(0, 1000), random.randint(1, 100000)))
+        manifest.file_manifest_list.elements.append(fm)
+    return manifest.write()
+
+
+def parse(data: bytes, use_buffer: bool) -> (CDL, FML):
+    """
+    Parse the chunk and file lists of a manifest.
+    :param data: uncompressed data of the manifest.
+    :param use_buffer: whether the new reader is used.
+    :return: (chunk data list, file manifest list).
+    """
+    bio = BytesIO(data)
+    meta = ManifestMeta.read(bio)
+    if use_buffer:
+        cdl = CDL.read(bio, meta.feature_level)
+        fml = FML.read(bio)
+    else:
+        cdl = CDL.read_stream(bio, meta.feature_level)
+        fml = FML.read_stream(bio)
+    return cdl, fml
+
+
+def run(name: str, data: bytes, use_buffer: bool, repeat: int = 5) -> (CDL, FML):
+    """ Parse the manifest several times and print the best durations. """
+    best_read = best_total = float('inf')
+    result = None
+    gc.disable()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse(data, use_buffer)
+        read_duration = time.perf_counter() - start
+        # the chunk parts are created lazily by the new reader, so include their creation to compare
+        for fm in result[1].elements:
+            _ = fm.chunk_parts
+        best_read = min(best_read, read_duration)
+        best_total = min(best_total, time.perf_counter() - start)
+    gc.enable()
+    print(f'{name}: {best_read:.3f}s to read, {best_total:.3f}s with all the chunk parts')
+    return result
+
+
+def check_equal(old: (CDL, FML), new: (CDL, FML)) -> None:
+    """ Check that both readers return the same values. """
+    old_cdl, old_fml = old
+    new_cdl, new_fml = new
+    for old_chunk, new_chunk in zip(old_cdl.elements, new_cdl.elements, strict=True):
+        assert (old_chunk.guid, old_chunk.hash, old_chunk.sha_hash, old_chunk.group_num, old_chunk.window_size, old_chunk.file_size) == \
+               (new_chunk.guid, new_chunk.hash, new_chunk.sha_hash, new_chunk.group_num, new_chunk.window_size, new_chunk.file_size)
+    for old_fm, new_fm in zip(old_fml.elements, new_fml.elements, strict=True):
+        assert (old_fm.filename, old_fm.symlink_target, old_fm.hash, old_fm.flags, old_fm.install_tags, old_fm.file_size, old_fm.hash_md5,
+                old_fm.mime_type, old_fm.hash_sha256) == (new_fm.filename, new_fm.symlink_target, new_fm.hash, new_fm.flags, new_fm.install_tags,
+                                                          new_fm.file_size, new_fm.hash_md5, new_fm.mime_type, new_fm.hash_sha256)
+        assert [(c.guid, c.offset, c.size, c.file_offset) for c in old_fm.chunk_parts
+                ] == [(c.guid, c.offset, c.size, c.file_offset) for c in new_fm.chunk_parts]
+    print('Both readers return the same values')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as file:
+            manifest_data = file.read()
+        print(f'Manifest: {sys.argv[1]}')
+    else:
+        manifest_data = make_manifest()
+        print(f'Synthetic manifest: {file_count} files, {chunk_count} chunks')
+    manifest_data = Manifest.read(manifest_data).data
+    old_result = run('read_stream', manifest_data, use_buffer=False)
+    new_result = run('read_buffer', manifest_data, use_buffer=True)
+    check_equal(old_result, new_result)
@@ -0,0 +1,55 @@
+"""
+Benchmark of the memory used by a manifest: objects lists (CDL/FML) vs arrays (CompactCDL/CompactFML).
+A synthetic manifest is used by default. The path of a real binary manifest can be given as argument.
+Usage: python 32_benchmark_compact_manifest.py [path_to_manifest]
+"""
+import importlib
+import sys
+import tracemalloc
+
+from UEVaultManager.models.manifest import Manifest, ManifestComparison
+
+# the synthetic manifest of the parser benchmark is reused
+make_manifest = importlib.import_module('31_benchmark_manifest_parser').make_manifest
+
+
+def load(data: bytes, compact: bool) -> Manifest:
+    """ Load the manifest and print the memory it uses. """
+    tracemalloc.start()
+    manifest = Manifest.read_all(data, compact=compact)
+    if not compact:
+        # the chunk parts are created on first access, as done by the download manager
+        for fm in manifest.file_manifest_list.elements:
+            _ = fm.chunk_parts
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'compact={compact}: {size / 1024 / 1024:.1f} MiB')
+    return manifest
+
+
+def check_equal(manifest: Manifest, compact_manifest: Manifest) -> None:
+    """ Check that both manifests have the same values and are compared the same way. """
+    for chunk, compact_chunk in zip(manifest.chunk_data_list.elements, compact_manifest.chunk_data_list.elements, strict=True):
+        assert (chunk.guid, chunk.hash, chunk.sha_hash, chunk.window_size, chunk.file_size) == \
+               (compact_chunk.guid, compact_chunk.hash, compact_chunk.sha_hash, compact_chunk.window_size, compact_chunk.file_size)
+    for fm, compact_fm in zip(manifest.file_manifest_list.elements, compact_manifest.file_manifest_list.elements, strict=True):
+        assert (fm.filename, fm.hash, fm.flags, fm.install_tags, fm.file_size, fm.hash_md5, fm.mime_type, fm.hash_sha256) == \
+               (compact_fm.filename, compact_fm.hash, compact_fm.flags, compact_fm.install_tags, compact_fm.file_size, compact_fm.hash_md5,
+                compact_fm.mime_type, compact_fm.hash_sha256)
+        assert [(c.guid_num, c.offset, c.size, c.file_offset) for c in fm.chunk_parts
+                ] == [(c.guid_num, c.offset, c.size, c.file_offset) for c in compact_fm.chunk_parts]
+    comparison = ManifestComparison.create(manifest, compact_manifest)
+    assert not comparison.added and not comparison.removed and not comparison.changed
+    assert manifest.write() == compact_manifest.write()
+    print('Both manifests have the same values')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as file:
+            manifest_data = file.read()
+        print(f'Manifest: {sys.argv[1]}')
+    else:
+        manifest_data = make_manifest()
+        print('Synthetic manifest')
+    check_equal(load(manifest_data, compact=False), load(manifest_data, compact=True))
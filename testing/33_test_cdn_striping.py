@@ -0,0 +1,113 @@
+"""
+Test of the distribution of the chunk downloads between several CDNs (CDNBalancer), with the download workers (DLWorker).
+Three local HTTP servers are used as CDNs: a fast one, a slow one and one that fails half of the requests.
+The fast one should get most of the requests, the others should be demoted.
+"""
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Queue as MPQueue
+from multiprocessing.shared_memory import SharedMemory
+from queue import Empty
+
+from UEVaultManager.downloader.mp.CDNBalancerClass import CDNBalancer
+from UEVaultManager.downloader.mp.workers import DLWorker
+from UEVaultManager.models.ChunkClass import Chunk
+from UEVaultManager.models.downloading import DownloaderTask, SharedMemorySegment, TerminateWorkerTask
+
+chunk_count = 300
+worker_count = 4
+chunk_size = 1024 * 1024
+
+
+def make_handler(delay: float, failure_rate: float, chunk_data: bytes) -> type:
+    """
+    Create the handler of a CDN stand-in.
+    :param delay: delay in seconds before sending a chunk.
+    :param failure_rate: rate of the requests that fail with a 500 error.
+    :param chunk_data: data of the chunk sent for all the requests.
+    :return: handler class.
+    """
+
+    class ChunkHandler(BaseHTTPRequestHandler):
+        """ HTTP handler that always returns the same chunk. """
+        protocol_version = 'HTTP/1.1'  # keep the connections alive
+
+        def do_GET(self):
+            """ Send the chunk, or an error. """
+            if random.random() < failure_rate:
+                self.send_response(500)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(chunk_data)))
+            self.end_headers()
+            self.wfile.write(chunk_data)
+
+        def log_message(self, *args):
+            """ Disable the logs. """
+            pass
+
+    return ChunkHandler
+
+
+if __name__ == '__main__':
+    chunk = Chunk()
+    chunk.data = random.randbytes(chunk_size)
+    data = chunk.write()
+    servers = []
+    base_urls = []
+    for name, delay, failure_rate in (('fast', 0.0, 0.0), ('slow', 0.3, 0.0), ('failing', 0.0, 0.5)):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(delay, failure_rate, data))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        base_urls.append(f'http://127.0.0.1:{server.server_port}/{name}')
+
+    balancer = CDNBalancer(base_urls)
+    memory = SharedMemory(create=True, size=chunk_size * worker_count * 2)
+    segments = [SharedMemorySegment(offset=i * chunk_size, end=(i + 1) * chunk_size) for i in range(worker_count * 2)]
+    task_queue, result_queue, logging_queue = MPQueue(-1), MPQueue(-1), MPQueue(-1)
+    workers = [
+        DLWorker(f'DLWorker {i + 1}', task_queue, result_queue, memory.name, logging_queue=logging_queue, num_hosts=len(base_urls))
+        for i in range(worker_count)
+    ]
+    for worker in workers:
+        worker.start()
+    start = time.perf_counter()
+    try:
+        # same logic as the download job manager and the download result handler of DLManager
+        sent = done = 0
+        while done < chunk_count:
+            while segments and sent < chunk_count:
+                base_url = balancer.get_base_url()
+                task_queue.put(DownloaderTask(url=f'{base_url}/chunk_{sent}', chunk_guid=sent, shm=segments.pop(), base_url=base_url))
+                sent += 1
+            try:
+                result = result_queue.get(timeout=10)
+            except Empty:
+                break
+            balancer.add_result(result.base_url, result.success, result.size_downloaded or 0, result.download_time or 0.0)
+            if result.success:
+                done += 1
+            else:
+                # download it again, like a new chunk
+                sent -= 1
+            segments.append(result.shm)
+    finally:
+        for _ in workers:
+            task_queue.put(TerminateWorkerTask())
+        for worker in workers:
+            worker.join(timeout=10)
+        memory.close()
+        memory.unlink()
+        for server in servers:
+            server.shutdown()
+    print(f'{done} chunks downloaded in {time.perf_counter() - start:.1f}s')
+    for stats in balancer.get_stats():
+        print(
+            f'{stats.host}: {stats.speed / 1024 / 1024:.1f} MiB/s, {stats.num_requests} requests, {stats.num_failures} failures'
+            f'{" (demoted)" if stats.demoted else ""}'
+        )
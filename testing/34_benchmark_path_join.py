@@ -0,0 +1,76 @@
+"""
+Benchmark of path_join (string join) vs path_join_resolved (join + Path.resolve()) on a tree of 100k files.
+The loops reproduce the path handling of the FileWorker (install) and of the UEAssetScraper (save and load of the json files).
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from UEVaultManager.lfs.utils import path_join, path_join_resolved
+
+file_count = 100_000
+files_by_folder = 500
+base_folder = path_join(tempfile.gettempdir(), 'uevm_benchmark_path_join')
+
+
+def install(join_func, folder: str) -> float:
+    """
+    Create the files of an install, as the FileWorker does.
+    :param join_func: function used to join the paths.
+    :param folder: folder of the install.
+    :return: duration in seconds.
+    """
+    start = time.perf_counter()
+    for index in range(file_count):
+        sub_folder = f'Content/Folder{index // files_by_folder}'
+        if not os.path.exists(join_func(folder, sub_folder)):
+            os.makedirs(join_func(folder, sub_folder), exist_ok=True)
+        with open(join_func(folder, sub_folder, f'File{index}.uasset'), 'wb') as file:
+            file.write(b'UEVM')
+    return time.perf_counter() - start
+
+
+def scrape(join_func, folder: str) -> float:
+    """
+    Save and load a json file by asset, as the UEAssetScraper does.
+    :param join_func: function used to join the paths.
+    :param folder: folder of the json files.
+    :return: duration in seconds.
+    """
+    start = time.perf_counter()
+    os.makedirs(folder, exist_ok=True)
+    for index in range(file_count):
+        with open(join_func(folder, f'asset_{index}.json'), 'w', encoding='utf-8') as file:
+            json.dump({'id': index}, file)
+    for filename in os.listdir(folder):
+        with open(join_func(folder, filename), 'r', encoding='utf-8') as file:
+            json.load(file)
+    return time.perf_counter() - start
+
+
+def join_only(join_func) -> float:
+    """
+    Only join the paths, without any file access.
+    :param join_func: function used to join the paths.
+    :return: duration in seconds.
+    """
+    start = time.perf_counter()
+    for index in range(file_count):
+        join_func(base_folder, 'Content', f'Folder{index // files_by_folder}', f'File{index}.uasset')
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    print(f'{file_count} files in "{base_folder}"')
+    for name, join_func in (('path_join_resolved', path_join_resolved), ('path_join', path_join)):
+        shutil.rmtree(base_folder, ignore_errors=True)
+        duration_join = join_only(join_func)
+        duration_install = install(join_func, path_join(base_folder, 'install'))
+        duration_scrape = scrape(join_func, path_join(base_folder, 'scrap'))
+        print(
+            f'{name:>20}: join {file_count / duration_join:10.0f} paths/s, install {file_count / duration_install:8.0f} files/s, '
+            f'scrape {file_count / duration_scrape:8.0f} assets/s'
+        )
+    shutil.rmtree(base_folder, ignore_errors=True)
@@ -0,0 +1,85 @@
+"""
+Benchmark of the scan of a vault cache folder: os.walk (previous implementation) vs VaultCacheScanner (first scan, then with its index).
+The vault cache is a tree of 1000 asset folders, each one with a manifest and 50 data files,
+and a folder with manifests in its subfolders, up to a depth above max_depth.
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from UEVaultManager.lfs.utils import path_join
+from UEVaultManager.lfs.VaultCacheScannerClass import VaultCacheScanner
+
+asset_count = 1000
+files_by_asset = 50
+manifest_filename = 'manifest'
+max_depth = 3
+base_folder = path_join(tempfile.gettempdir(), 'uevm_benchmark_vault_cache')
+vault_cache_folder = path_join(base_folder, 'VaultCache')
+index_filename = path_join(base_folder, 'vault_cache_index.json')
+
+
+def create_vault_cache() -> None:
+    """
+    Create the files of the vault cache.
+    """
+    for index in range(asset_count):
+        asset_folder = path_join(vault_cache_folder, f'Asset{index}')
+        os.makedirs(path_join(asset_folder, 'data', 'Content'), exist_ok=True)
+        with open(path_join(asset_folder, manifest_filename), 'wb') as file:
+            file.write(b'{}')
+        for file_index in range(files_by_asset):
+            with open(path_join(asset_folder, 'data', 'Content', f'File{file_index}.uasset'), 'wb') as file:
+                file.write(b'UEVM' * file_index)
+    # manifests in the subfolders of an asset folder. The last one is too deep to be found
+    folder = path_join(vault_cache_folder, 'Nested')
+    for depth in range(max_depth + 2):
+        folder = path_join(folder, f'Depth{depth + 1}')
+        os.makedirs(folder, exist_ok=True)
+        with open(path_join(folder, manifest_filename), 'wb') as file:
+            file.write(b'{}')
+
+
+def scan_with_walk() -> dict:
+    """
+    Scan the vault cache as the previous implementation of UEVMLFS.get_downloaded_assets_data() did.
+    :return: dict {asset_id: manifest path}.
+    """
+    downloaded_assets = {}
+    for root, dirs, files in os.walk(vault_cache_folder):
+        depth = root[len(vault_cache_folder) + len(os.path.sep):].count(os.path.sep)
+        if depth == max_depth:
+            del dirs[:]
+        for file in files:
+            if os.path.splitext(file)[0].lower() == manifest_filename:
+                downloaded_assets[os.path.basename(root)] = os.path.join(root, file)
+    return downloaded_assets
+
+
+def timed(func) -> tuple:
+    """
+    Call a function and get its duration.
+    :param func: function to call.
+    :return: (duration in seconds, result).
+    """
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    shutil.rmtree(base_folder, ignore_errors=True)
+    create_vault_cache()
+    print(f'{asset_count} assets with {files_by_asset} files in "{vault_cache_folder}"')
+    scanner = VaultCacheScanner(index_filename, manifest_filename, max_depth=max_depth)
+    duration_walk, walk_result = timed(scan_with_walk)
+    duration_first, first_result = timed(lambda: scanner.scan(vault_cache_folder))
+    duration_indexed, indexed_result = timed(lambda: scanner.scan(vault_cache_folder))
+    assert walk_result == {asset_id: path for asset_id, (path, _) in first_result.items()}
+    assert f'Depth{max_depth}' in walk_result and f'Depth{max_depth + 1}' not in walk_result
+    assert first_result == indexed_result
+    print(f'{"os.walk":>25}: {duration_walk:.3f}s (no size)')
+    print(f'{"scanner, first scan":>25}: {duration_first:.3f}s (with the size of the folders)')
+    print(f'{"scanner, with its index":>25}: {duration_indexed:.3f}s')
+    shutil.rmtree(base_folder, ignore_errors=True)
@@ -0,0 +1,98 @@
+"""
+Test of the DatabaseSink used by UEAssetScraper.save() when the database is cleaned before rebuilding:
+- a cancelled scraping leaves the database unchanged,
+- a successful scraping replaces the assets of the database (except those added manually) by the scraped ones,
+- if the deletion is not confirmed, the scraped assets are added to the existing ones.
+"""
+import os
+import tempfile
+
+import UEVaultManager.models.UEAssetScraperClass as scraper_module
+from UEVaultManager.lfs.utils import path_join
+from UEVaultManager.models.UEAssetClass import UEAsset
+from UEVaultManager.models.UEAssetDbHandlerClass import UEAssetDbHandler
+
+database_name = path_join(tempfile.gettempdir(), 'uevm_test_database_sink.db')
+
+
+class FakeScraper:
+    """
+    The attributes of UEAssetScraper used by the sink.
+    """
+
+    def __init__(self, asset_db_handler: UEAssetDbHandler):
+        self.asset_db_handler = asset_db_handler
+        self.clean_database = True
+
+
+def create_asset_data(uid: str, title: str, added_manually: bool = False) -> dict:
+    """
+    Create the data of an asset.
+    :param uid: id of the asset.
+    :param title: title of the asset.
+    :param added_manually: True if the asset has been added manually.
+    :return: data of the asset.
+    """
+    asset_data = UEAsset().get_data()
+    asset_data.update({'id': uid, 'asset_id': uid, 'title': title, 'comment': f'comment of {uid}', 'added_manually': added_manually})
+    return asset_data
+
+
+def get_titles(db_handler: UEAssetDbHandler) -> dict:
+    """
+    Get the titles of the assets in the database.
+    :param db_handler: database handler.
+    :return: dict {id: title}.
+    """
+    return {uid: row['title'] for uid, row in db_handler.get_assets_data(['id', 'title']).items()}
+
+
+if __name__ == '__main__':
+    if os.path.exists(database_name):
+        os.remove(database_name)
+    db_handler = UEAssetDbHandler(database_name, reset_database=True)
+    db_handler.set_assets(
+        [create_asset_data('old_1', 'Old 1'), create_asset_data('old_2', 'Old 2'),
+         create_asset_data('manual', 'Manual', added_manually=True)],
+        update_progress=False
+    )
+    titles_before = get_titles(db_handler)
+    new_pages = [[create_asset_data('old_1', 'Old 1 updated'), create_asset_data('new_1', 'New 1')], [create_asset_data('new_2', 'New 2')]]
+    # the confirmation is asked in a dialog box by the sink
+    scraper_module.box_yesno = lambda *_args, **_kwargs: True
+
+    sink = scraper_module.DatabaseSink(FakeScraper(db_handler))
+    assert sink.open()
+    for page in new_pages:
+        assert sink.write(page)
+    assert get_titles(db_handler) == titles_before, 'the database has been changed during the scraping'
+    sink.close()  # cancelled scraping
+    assert get_titles(db_handler) == titles_before, 'the database has been changed by a cancelled scraping'
+    print('cancelled scraping: OK, the database is unchanged')
+
+    sink = scraper_module.DatabaseSink(FakeScraper(db_handler))
+    assert sink.open()
+    for page in new_pages:
+        assert sink.write(page)
+    assert sink.close(last_run_content={'date': '', 'mode': 'save', 'files_count': 0, 'items_count': 3, 'scraped_ids': []})
+    titles_after = get_titles(db_handler)
+    expected_titles = {'old_1': 'Old 1 updated', 'new_1': 'New 1', 'new_2': 'New 2', 'manual': 'Manual'}
+    assert titles_after == expected_titles, f'unexpected assets after the scraping: {titles_after}'
+    print('successful scraping: OK, the assets have been replaced by the scraped ones')
+
+    # the deletion of the existing assets is not confirmed: the scraped assets are added to them
+    scraper_module.box_yesno = lambda *_args, **_kwargs: False
+    db_handler.set_assets([create_asset_data('old_3', 'Old 3')], update_progress=False)
+    sink = scraper_module.DatabaseSink(FakeScraper(db_handler))
+    assert sink.open()
+    assert sink.write([{'id': 'new_1', 'asset_id': 'new_1', 'title': 'New 1 updated'}])
+    assert sink.close(last_run_content={'date': '', 'mode': 'save', 'files_count': 0, 'items_count': 1, 'scraped_ids': []})
+    titles_after = get_titles(db_handler)
+    expected_titles.update({'new_1': 'New 1 updated', 'old_3': 'Old 3'})
+    assert titles_after == expected_titles, f'unexpected assets after the scraping: {titles_after}'
+    comment = db_handler.get_assets_data(['id', 'comment'], uid='new_1')['new_1']['comment']
+    assert comment == 'comment of new_1', f'the fields not scraped have been erased: {comment}'
+    assert 'assets_staging' not in [row[0] for row in db_handler.run_query("SELECT name FROM sqlite_temp_master WHERE type = 'table'")]
+    print('not confirmed deletion: OK, the scraped assets have been added to the existing ones')
+    db_handler.close_connection()
+    os.remove(database_name)
@@ -0,0 +1,164 @@
+"""
+Test of the pool of tabs of the undetected Chrome browser (UCBrowserPool), used by EPCAPI.uc_get_content().
+A local HTTP server serves the pages. The browser is replaced by a fake one, with the same API as nodriver, that loads the pages from this server.
+Checks:
+- the tabs are reused,
+- the number of pages loaded at the same time is limited to max_tabs,
+- a tab is closed and replaced after max_uses_per_tab pages,
+- close() closes the tabs, stops the browser and the event loop of the pool.
+"""
+import asyncio
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# noinspection PyUnresolvedReferences
+import UEVaultManager.tkgui.modules.globals  # must be imported before the api module, as in the application, to avoid a circular import
+from UEVaultManager.api.egs import EPCAPI
+from UEVaultManager.models.UCBrowserPool import UCBrowserPool
+from UEVaultManager.models.UCResponse import UCResponse
+
+page_count = 60
+thread_count = 8
+max_tabs = 3
+max_uses_per_tab = 5
+page_delay = 0.05  # delay in seconds before the server sends a page, so the requests overlap
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """ HTTP handler that returns a page containing its path. """
+
+    def do_GET(self):
+        """ Send the page. """
+        time.sleep(page_delay)
+        content = f'<html><head><meta charset="utf-8"></head><body><p>{self.path}</p></body></html>'.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args) -> None:
+        """ Do not log the requests. """
+
+
+class FakeBrowserStats:
+    """
+    Statistics of the fake browser.
+    """
+
+    def __init__(self):
+        self.tabs_created: int = 0
+        self.tabs_closed: int = 0
+        self.loading_count: int = 0
+        self.max_loading_count: int = 0
+        self.max_uses: int = 0
+        self.is_stopped: bool = False
+
+
+class FakeTab:
+    """
+    Tab of the fake browser. Same API as a nodriver tab.
+    :param stats: statistics of the browser.
+    """
+
+    def __init__(self, stats: FakeBrowserStats):
+        self.stats = stats
+        self.content: str = ''
+        self.use_count: int = 0
+        self.is_closed: bool = False
+        stats.tabs_created += 1
+
+    async def get(self, url: str) -> 'FakeTab':
+        """ Load a page in the tab. """
+        assert not self.is_closed, 'a closed tab has been reused'
+        self.use_count += 1
+        self.stats.max_uses = max(self.stats.max_uses, self.use_count)
+        self.stats.loading_count += 1
+        self.stats.max_loading_count = max(self.stats.max_loading_count, self.stats.loading_count)
+        try:
+            self.content = await asyncio.to_thread(lambda: urllib.request.urlopen(url).read().decode('utf-8'))
+        finally:
+            self.stats.loading_count -= 1
+        return self
+
+    async def activate(self) -> None:
+        """ Activate the tab. """
+
+    async def get_content(self) -> str:
+        """ Get the content of the page loaded in the tab. """
+        return self.content
+
+    async def close(self) -> None:
+        """ Close the tab. """
+        self.is_closed = True
+        self.stats.tabs_closed += 1
+
+
+class FakeBrowser:
+    """
+    Fake browser. Same API as a nodriver browser.
+    :param stats: statistics of the browser.
+    """
+
+    def __init__(self, stats: FakeBrowserStats):
+        self.stats = stats
+
+    async def get(self, url: str, new_tab: bool = False) -> FakeTab:
+        """ Load a page in a new tab. """
+        assert new_tab, 'the pages must be loaded in a new tab'
+        return await FakeTab(self.stats).get(url)
+
+    def stop(self) -> None:
+        """ Stop the browser. """
+        self.stats.is_stopped = True
+
+
+if __name__ == '__main__':
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    stats = FakeBrowserStats()
+    browser_starts = []
+
+    async def start_browser() -> FakeBrowser:
+        """ Start the fake browser. """
+        browser_starts.append(1)
+        return FakeBrowser(stats)
+
+    pool = UCBrowserPool(start_browser, max_tabs=max_tabs, max_uses_per_tab=max_uses_per_tab)
+    egs = EPCAPI()
+    egs._uc_pool = pool  # the pool is created by init_uc_browser() with nodriver, replaced here by the pool using the fake browser
+
+    def get_page(index: int) -> None:
+        """ Get a page with EPCAPI.uc_get_content() and check its content. """
+        url = f'{base_url}/page/{index}'
+        response = UCResponse()
+        egs.uc_get_content(url, response)
+        assert response.status_code == 200, f'{url}: status code {response.status_code}'
+        assert f'/page/{index}<' in response.raw, f'{url}: unexpected content {response.raw}'
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=thread_count) as executor:
+        list(executor.map(get_page, range(page_count)))
+    duration = time.time() - start_time
+    print(
+        f'{page_count} pages in {duration:.2f}s: {stats.tabs_created} tabs created, {stats.tabs_closed} tabs closed, '
+        f'at most {stats.max_loading_count} pages loaded at the same time'
+    )
+    assert len(browser_starts) == 1, 'the browser has been started several times'
+    assert stats.max_loading_count <= max_tabs, f'more than {max_tabs} pages have been loaded at the same time'
+    assert stats.max_uses <= max_uses_per_tab, f'a tab has been used more than {max_uses_per_tab} times'
+    # each tab is used max_uses_per_tab times before being recycled, except the ones still idle at the end
+    assert stats.tabs_created == page_count // max_uses_per_tab, 'the tabs have not been reused'
+    assert stats.tabs_closed == stats.tabs_created - len(pool._idle_tabs), 'the used tabs have not been recycled'
+    print('reuse, concurrency cap and recycling of the tabs: OK')
+
+    pool.close()
+    assert stats.tabs_closed == stats.tabs_created, 'the idle tabs have not been closed'
+    assert stats.is_stopped, 'the browser has not been stopped'
+    assert not pool.is_running, 'the event loop of the pool is still running'
+    print('close: OK')
+    server.shutdown()
@@ -0,0 +1,97 @@
+"""
+Test of the parsing of the asset store in a pool of processes (UEAssetScraper.load_from_json_files()), with the "spawn" start method (default on Windows and macOS).
+Checks:
+- the assets are parsed in the processes, without falling back to the parsing in the current thread,
+- the parsed data are the same as the ones parsed in the current thread,
+- the data of the main process (here the size of an asset) are used by the processes.
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+
+import UEVaultManager.tkgui.modules.globals as gui_g  # using the shortest variable name for globals for convenience
+from UEVaultManager.lfs.AssetStoreClass import AssetStore
+from UEVaultManager.lfs.utils import path_join
+from UEVaultManager.models.UEAssetScraperClass import UEAssetScraper
+
+assets_count = 1000
+processes_count = 4
+data_folder = path_join(tempfile.gettempdir(), 'uevm_test_ingest_processes')
+database_name = path_join(data_folder, 'assets.db')
+sized_app_name = 'App7'
+sized_app_size = 1234
+
+
+def create_asset_store() -> None:
+    """
+    Create an asset store with random assets.
+    """
+    shutil.rmtree(data_folder, ignore_errors=True)
+    asset_store = AssetStore.get_store(data_folder)
+    rnd = random.Random(1)
+    for i in range(assets_count):
+        asset_store.put(
+            f'app{i}', {
+                'id': f'uid{i}',
+                'title': f'Asset {i}',
+                'urlSlug': f'slug-{i}',
+                'categories': [{'path': 'assets/props', 'name': 'Props'}],
+                'seller': {'name': f'seller{i % 50}'},
+                'longDescription': 'lorem ipsum ' * rnd.randint(50, 400),
+                'priceValue': rnd.randint(0, 5000),
+                'discountPriceValue': 100,
+                'discountPercentage': 90,
+                'releaseInfo': [{'appId': f'App{i}', 'compatibleApps': ['UE_5.1', 'UE_5.2'], 'dateAdded': '2023-01-01T00:00:00.000Z'}],
+                'tags': [{'id': rnd.randint(1, 300), 'name': f'tag{rnd.randint(1, 300)}'} for _ in range(5)],
+                'keyImages': [{'type': 'Thumbnail', 'url': 'https://example.com/thumbnail.png'}],
+                'rating': {'averageRating': 4.5, 'total': 10}
+            }
+        )
+    asset_store.commit()
+    AssetStore.close_all()
+
+
+def parse_asset_store(max_threads: int) -> list:
+    """
+    Parse the asset store.
+    :param max_threads: number of processes to use. If 0, the assets are parsed in the current thread.
+    :return: list of the parsed assets data, without the dates set when parsing.
+    """
+    if os.path.exists(database_name):
+        os.remove(database_name)
+    scraper = UEAssetScraper(datasource_filename=database_name, use_database=True, load_from_files=True, max_threads=max_threads, collect_data=True, offline_mode=True)
+    scraper.max_threads = max_threads
+    # only changed in memory, set_asset_size() would save it in the asset_sizes file of the user
+    scraper.core.uevmlfs.asset_sizes[sized_app_name] = sized_app_size
+    if max_threads:
+
+        def no_fallback(*_args) -> bool:
+            """ Fail if the assets are parsed in the current thread. """
+            raise AssertionError('the assets have not been parsed in the processes')
+
+        scraper._ingest = no_fallback
+    assert scraper.load_from_json_files() == assets_count, 'some assets have not been parsed'
+    scraper.asset_db_handler.close_connection()
+    # without a sink, the scraped data are kept by page
+    return [{key: value for key, value in asset_data.items() if key not in ('update_date', 'date_added')} for page in scraper.scraped_data for asset_data in page]
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('spawn', force=True)
+    gui_g.s.assets_data_folder = data_folder
+    gui_g.s.use_threads = True
+    create_asset_store()
+    data_in_thread = parse_asset_store(0)
+    if min(processes_count, os.cpu_count() or 1) < 2:
+        print('Only one cpu is available, the assets can not be parsed in several processes')
+    else:
+        data_in_processes = parse_asset_store(processes_count)
+        print(f'{len(data_in_processes)} assets parsed in {processes_count} processes')
+        assert data_in_processes == data_in_thread, 'the assets parsed in the processes differ from the ones parsed in the current thread'
+        sizes = [asset_data['downloaded_size'] for asset_data in data_in_processes if asset_data['asset_id'] == sized_app_name]
+        assert sizes == [sized_app_size], f'the size of {sized_app_name} set in the main process has not been used: {sizes}'
+        print('parsing in processes: OK, same data as in the current thread')
+    AssetStore.close_all()
+    shutil.rmtree(data_folder, ignore_errors=True)